@@ -6,6 +6,9 @@ from django.db.models import Count, Q
 from api.users.models import User, StudentProfile, TeacherProfile
 from api.classes.models import Class
 from api.users.serializers import UserDashboardSerializer
+from api.chatbot.answer_cache import metrics as answer_cache_metrics
+from api.chatbot.rate_limit import metrics as rate_limit_metrics
+from api.chatbot.instrumentation import report as llm_report
 
 class AdminDashboardViewSet(viewsets.ViewSet):
     permission_classes = [IsAuthenticated] # Should be IsAdminUser in prod, but for demo allowing auth user with 'admin' role check
@@ -36,6 +39,34 @@ class AdminDashboardViewSet(viewsets.ViewSet):
             "pending_verification": pending_verification
         })
 
+    @action(detail=False, methods=['get'], url_path='answer-cache')
+    def answer_cache(self, request):
+        if request.user.role != 'admin':
+             return Response({"detail": "Not authorized."}, status=status.HTTP_403_FORBIDDEN)
+
+        # Hit rate, latency yang dihemat & eviction dari cache jawaban chatbot
+        return Response(answer_cache_metrics())
+
+    @action(detail=False, methods=['get'], url_path='rate-limit')
+    def rate_limit(self, request):
+        if request.user.role != 'admin':
+             return Response({"detail": "Not authorized."}, status=status.HTTP_403_FORBIDDEN)
+
+        # Request AI yang diterima/ditolak & kedalaman antrian tunggu saat ini
+        return Response(rate_limit_metrics())
+
+    @action(detail=False, methods=['get'], url_path='llm-metrics')
+    def llm_metrics(self, request):
+        if request.user.role != 'admin':
+             return Response({"detail": "Not authorized."}, status=status.HTTP_403_FORBIDDEN)
+
+        # Latensi p50/p95/p99 & token harian per endpoint AI dan per kelas
+        try:
+            days = max(1, min(int(request.query_params.get('days', 7)), 90))
+        except ValueError:
+            return Response({"detail": "days harus berupa angka."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(llm_report(days))
+
     @action(detail=False, methods=['get'])
     def verifications(self, request):
         if request.user.role != 'admin':
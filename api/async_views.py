@@ -0,0 +1,33 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+# Helper bersama untuk view async (ASGI) dan Server-Sent Events, dipakai chatbot & materi.
+
+
+async def authenticate_async(request):
+    """
+    Autentikasi & parsing body untuk view async, memakai konfigurasi DRF yang sama dengan endpoint lain.
+    Mengembalikan (user, data, None) atau (None, None, respons error).
+    """
+    drf_request = Request(
+        request,
+        parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES],
+        authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+    )
+    try:
+        user, data = await sync_to_async(lambda: (drf_request.user, drf_request.data))()
+    except APIException as e:
+        return None, None, JsonResponse({"detail": e.detail}, status=e.status_code)
+    if not user.is_authenticated:
+        return None, None, JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+    return user, data, None
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
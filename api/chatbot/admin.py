@@ -1,3 +1,6 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import GenerationCache, LLMCallLog
+
+admin.site.register(GenerationCache)
+admin.site.register(LLMCallLog)
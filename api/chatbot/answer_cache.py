@@ -0,0 +1,159 @@
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+from . import metrics as counters
+
+# Cache jawaban chatbot untuk pertanyaan pertama / tanpa konteks percakapan.
+# Pertanyaan dinormalisasi (huruf kecil, tanpa tanda baca & kata pengisi) lalu dicocokkan:
+# 1. persis sama dengan teks ternormalisasi yang sudah ada, atau
+# 2. mirip secara vektor: n-gram karakter & kata di-hash ke vektor berdimensi tetap,
+#    semua entri disimpan sebagai satu matriks NumPy sehingga kemiripan kosinus dihitung
+#    dengan satu perkalian matriks. Angka di pertanyaan harus sama persis
+#    ("hukum newton 1" tidak boleh dijawab dengan jawaban "hukum newton 2").
+# Cache berada di memori tiap proses (LRU + TTL); metrik dijumlahkan di cache bersama.
+
+CACHE_SIZE = getattr(settings, 'CHAT_ANSWER_CACHE_SIZE', 1000)
+CACHE_TTL = getattr(settings, 'CHAT_ANSWER_CACHE_TTL', 60 * 60 * 24 * 7)
+SIMILARITY_THRESHOLD = getattr(settings, 'CHAT_ANSWER_CACHE_THRESHOLD', 0.85)
+VECTOR_DIM = 2048
+NGRAM = 3
+
+# Kata pengisi pertanyaan yang tidak mengubah maksud ("apa itu X" == "jelaskan X")
+FILLER_WORDS = frozenset(
+    'apa apakah itu sih dong ya yah kak kakak bu pak min tolong coba jelaskan jelasin terangkan '
+    'yang dimaksud maksud maksudnya adalah pengertian arti artinya definisi tentang mengenai'.split()
+)
+
+METRIC_NAMES = ('hits', 'exact_hits', 'semantic_hits', 'misses', 'stores', 'evictions', 'expirations', 'latency_saved_ms')
+
+
+def normalize_question(text):
+    text = unicodedata.normalize('NFKD', str(text)).encode('ascii', 'ignore').decode('ascii')
+    words = re.sub(r'[^a-z0-9]+', ' ', text.lower()).split()
+    content = [word for word in words if word not in FILLER_WORDS]
+    return ' '.join(content or words)
+
+
+def vectorize(normalized):
+    """Vektor hashed n-gram (kata + trigram karakter), dinormalisasi L2."""
+    words = normalized.split()
+    padded = f" {normalized} "
+    features = words + [padded[i:i + NGRAM] for i in range(max(len(padded) - NGRAM + 1, 0))]
+    vector = np.zeros(VECTOR_DIM, dtype=np.float32)
+    if not features:
+        return vector
+    idx = np.fromiter((zlib.crc32(f.encode()) % VECTOR_DIM for f in features), dtype=np.int64, count=len(features))
+    vector += np.bincount(idx, minlength=VECTOR_DIM).astype(np.float32)
+    np.log1p(vector, out=vector)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _numbers(normalized):
+    return frozenset(re.findall(r'\d+', normalized))
+
+
+def _record(name, amount=1):
+    counters.incr('answer-cache', name, amount)
+
+
+class AnswerCache:
+    def __init__(self, size, ttl, threshold):
+        self.size = size
+        self.ttl = ttl
+        self.threshold = threshold
+        self._matrix = np.zeros((size, VECTOR_DIM), dtype=np.float32)
+        self._valid = np.zeros(size, dtype=bool)
+        self._entries = {}          # slot -> entry
+        self._lru = OrderedDict()   # teks ternormalisasi -> slot, terlama di depan
+        self._lock = threading.Lock()
+
+    def _remove(self, slot):
+        entry = self._entries.pop(slot)
+        self._lru.pop(entry['question'], None)
+        self._valid[slot] = False
+
+    def get(self, question):
+        normalized = normalize_question(question)
+        if not normalized:
+            return None
+        now = time.monotonic()
+
+        with self._lock:
+            kind = 'exact_hits'
+            slot = self._lru.get(normalized)
+            if slot is None and self._valid.any():
+                kind = 'semantic_hits'
+                scores = self._matrix @ vectorize(normalized)
+                scores[~self._valid] = -1.0
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold and self._entries[best]['numbers'] == _numbers(normalized):
+                    slot = best
+
+            entry = self._entries.get(slot) if slot is not None else None
+            if entry is not None and now - entry['stored_at'] > self.ttl:
+                self._remove(slot)
+                _record('expirations')
+                entry = None
+            if entry is not None:
+                self._lru.move_to_end(entry['question'])
+
+        if entry is None:
+            _record('misses')
+            return None
+        _record('hits')
+        _record(kind)
+        _record('latency_saved_ms', int(entry['latency'] * 1000))
+        return entry['answer']
+
+    def set(self, question, answer, latency):
+        normalized = normalize_question(question)
+        if not normalized:
+            return
+        vector = vectorize(normalized)
+
+        with self._lock:
+            slot = self._lru.get(normalized)
+            if slot is None:
+                if len(self._lru) >= self.size:
+                    self._remove(next(iter(self._lru.values())))
+                    _record('evictions')
+                slot = int(np.flatnonzero(~self._valid)[0])
+            self._matrix[slot] = vector
+            self._valid[slot] = True
+            self._entries[slot] = {
+                'question': normalized,
+                'numbers': _numbers(normalized),
+                'answer': answer,
+                'latency': latency,
+                'stored_at': time.monotonic(),
+            }
+            self._lru[normalized] = slot
+            self._lru.move_to_end(normalized)
+        _record('stores')
+
+    def __len__(self):
+        return len(self._lru)
+
+
+answer_cache = AnswerCache(CACHE_SIZE, CACHE_TTL, SIMILARITY_THRESHOLD)
+
+
+def is_context_free(history):
+    """Pertanyaan pertama: belum ada pesan user (atau ringkasan) di history."""
+    return not any(item['role'] == 'user' for item in history or [])
+
+
+def metrics():
+    result = counters.read('answer-cache', METRIC_NAMES)
+    lookups = result['hits'] + result['misses']
+    result['hit_rate'] = round(result['hits'] / lookups, 4) if lookups else None
+    result['entries_in_process'] = len(answer_cache)
+    return result
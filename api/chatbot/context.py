@@ -0,0 +1,132 @@
+import logging
+import math
+
+from django.conf import settings
+
+from .gemini_service import asummarize_history, summarize_history
+from .models import ChatMessage, Conversation
+
+logger = logging.getLogger(__name__)
+
+# History yang dikirim ke Gemini dibatasi anggaran token:
+# - pesan terbaru dikirim utuh selama masih muat dalam HISTORY_TOKEN_BUDGET
+# - pesan yang lebih lama dilipat ke Conversation.summary (ringkasan bergulir) secara incremental,
+#   sehingga biaya dan jumlah query per giliran tetap walaupun percakapan sudah ratusan pesan.
+# Saat anggaran terlampaui, pesan terbaru dipangkas sampai HISTORY_KEEP_RATIO dari anggaran
+# agar peringkasan tidak terjadi di setiap giliran.
+
+HISTORY_TOKEN_BUDGET = getattr(settings, 'CHAT_HISTORY_TOKEN_BUDGET', 4000)
+HISTORY_KEEP_RATIO = getattr(settings, 'CHAT_HISTORY_KEEP_RATIO', 0.6)
+# Jumlah maksimal pesan terbaru yang dibaca per giliran
+HISTORY_FETCH_LIMIT = getattr(settings, 'CHAT_HISTORY_FETCH_LIMIT', 50)
+# Jumlah maksimal pesan yang dilipat ke ringkasan dalam satu kali peringkasan
+SUMMARY_BATCH_LIMIT = getattr(settings, 'CHAT_SUMMARY_BATCH_LIMIT', 100)
+
+
+def estimate_tokens(text):
+    """Perkiraan jumlah token (~4 karakter per token + overhead per pesan), tanpa memanggil count_tokens."""
+    return math.ceil(len(text) / 4) + 4
+
+
+def _unsummarized(convo):
+    messages = ChatMessage.objects.filter(conversation=convo)
+    if convo.summary_until is not None:
+        messages = messages.filter(id__gt=convo.summary_until)
+    return messages
+
+
+def _fold_candidates(convo, until_id):
+    return _unsummarized(convo).filter(id__lt=until_id).order_by('id').values_list('id', 'role', 'content')[:SUMMARY_BATCH_LIMIT]
+
+
+def _same_summary(convo):
+    # Update bersyarat: jika giliran lain sudah memajukan ringkasan lebih dulu, hasil ini dibuang
+    return Conversation.objects.filter(id=convo.id, summary_until=convo.summary_until)
+
+
+def fold_into_summary(convo, until_id):
+    """Lipat pesan yang belum diringkas (id < until_id) ke Conversation.summary."""
+    messages = list(_fold_candidates(convo, until_id))
+    if not messages:
+        return
+
+    try:
+        summary = summarize_history(convo.summary, [(role, content) for _, role, content in messages])
+    except Exception:
+        # Dicoba lagi di giliran berikutnya
+        logger.exception("Gagal meringkas percakapan %s", convo.id)
+        return
+
+    if _same_summary(convo).update(summary=summary, summary_until=messages[-1][0]):
+        convo.summary, convo.summary_until = summary, messages[-1][0]
+
+
+async def afold_into_summary(convo, until_id):
+    """Versi async dari fold_into_summary."""
+    messages = [row async for row in _fold_candidates(convo, until_id)]
+    if not messages:
+        return
+
+    try:
+        summary = await asummarize_history(convo.summary, [(role, content) for _, role, content in messages])
+    except Exception:
+        logger.exception("Gagal meringkas percakapan %s", convo.id)
+        return
+
+    if await _same_summary(convo).aupdate(summary=summary, summary_until=messages[-1][0]):
+        convo.summary, convo.summary_until = summary, messages[-1][0]
+
+
+def _recent(convo, before_id):
+    return _unsummarized(convo).filter(id__lt=before_id).order_by('-id').values_list('id', 'role', 'content')[:HISTORY_FETCH_LIMIT]
+
+
+def _select_recent(recent):
+    """
+    Pilih pesan terbaru (urut terbaru dulu) yang muat dalam anggaran.
+    Mengembalikan (pesan terpilih, perlu_diringkas).
+    """
+    kept, used = [], 0
+    for msg_id, role, content in recent:
+        cost = estimate_tokens(content)
+        if used + cost > HISTORY_TOKEN_BUDGET:
+            break
+        kept.append((msg_id, role, content, cost))
+        used += cost
+
+    # Ada pesan belum diringkas yang tidak ikut terkirim: pangkas sampai target, sisanya diringkas
+    overflow = len(kept) < len(recent) or len(recent) == HISTORY_FETCH_LIMIT
+    if overflow:
+        target = HISTORY_TOKEN_BUDGET * HISTORY_KEEP_RATIO
+        while kept and used > target:
+            used -= kept.pop()[3]
+    return kept, overflow
+
+
+def _format_history(convo, kept):
+    history = []
+    if convo.summary:
+        history.append({"role": "user", "parts": [f"Ringkasan percakapan kita sebelumnya:\n{convo.summary}"]})
+        history.append({"role": "model", "parts": ["Baik, saya lanjutkan dengan konteks tersebut."]})
+    for _, role, content, _ in reversed(kept):
+        history.append({"role": "user" if role == "user" else "model", "parts": [content]})
+    return history
+
+
+def build_history(convo, before_id):
+    """
+    History Gemini untuk pesan `before_id`: ringkasan percakapan (jika ada)
+    + pesan terbaru sebelum `before_id` yang muat dalam anggaran token.
+    """
+    kept, overflow = _select_recent(list(_recent(convo, before_id)))
+    if overflow:
+        fold_into_summary(convo, kept[-1][0] if kept else before_id)
+    return _format_history(convo, kept)
+
+
+async def abuild_history(convo, before_id):
+    """Versi async dari build_history (ORM & peringkasan async)."""
+    kept, overflow = _select_recent([row async for row in _recent(convo, before_id)])
+    if overflow:
+        await afold_into_summary(convo, kept[-1][0] if kept else before_id)
+    return _format_history(convo, kept)
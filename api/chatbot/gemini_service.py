@@ -1,8 +1,18 @@
-import google.generativeai as genai
-from django.conf import settings
+import logging
+import time
 
-# Konfigurasi API
-genai.configure(api_key=settings.GEMINI_API_KEY)
+from asgiref.sync import sync_to_async
+
+from .answer_cache import answer_cache, is_context_free
+from .generation_cache import cached_generation
+from .instrumentation import atrack_llm, mark_cache, track_llm
+from .llm_client import LONG_TIMEOUT, ModelProfile, get_llm_client
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = "gemini-2.5-flash-lite"
+# Naikkan setiap kali prompt materi diubah agar hasil cache lama tidak dipakai
+MATERIAL_PROMPT_VERSION = 1
 
 # SYSTEM PROMPT → AI akan selalu bertindak sebagai guru privat
 TEACHER_INSTRUCTION = """
@@ -62,58 +72,168 @@ safety_settings = [
 ]
 
 # Konfigurasi Generation Config
-generation_config = genai.types.GenerationConfig(
-    temperature=0.3, # Rendah agar lebih patuh pada instruksi, mengurangi halusinasi
-    candidate_count=1,
-    max_output_tokens=2048,
-)
+generation_config = {
+    "temperature": 0.3, # Rendah agar lebih patuh pada instruksi, mengurangi halusinasi
+    "candidate_count": 1,
+    "max_output_tokens": 2048,
+}
 
-model = genai.GenerativeModel(
-    model_name="gemini-2.5-flash-lite",
+# Semua panggilan model lewat client LLM bersama (timeout, retry, circuit breaker), lihat llm_client.py
+TEACHER_PROFILE = ModelProfile(
+    "teacher", MODEL_NAME,
     system_instruction=TEACHER_INSTRUCTION,
     safety_settings=safety_settings,
-    generation_config=generation_config
+    generation_config=generation_config,
+)
+
+# Model terpisah (tanpa persona guru) untuk meringkas history percakapan
+SUMMARY_PROFILE = ModelProfile(
+    "summary", MODEL_NAME,
+    generation_config={"temperature": 0.2, "max_output_tokens": 512},
 )
 
+SUMMARY_INSTRUCTION = """
+Perbarui ringkasan percakapan antara siswa dan Guruku AI di bawah ini.
+Pertahankan topik pelajaran, pertanyaan siswa, konsep/rumus yang sudah dijelaskan, dan hal yang belum dipahami siswa.
+Tulis dalam Bahasa Indonesia, maksimal 200 kata, tanpa pembuka atau penutup.
+"""
+
 def upload_to_gemini(path, mime_type=None):
     """Uploads the given file to Gemini."""
-    file = genai.upload_file(path, mime_type=mime_type)
-    return file
-
-def generate_material_content(file_path, mime_type):
-    """Generates educational content from a file using Gemini."""
-    try:
-        # Upload file
-        uploaded_file = upload_to_gemini(file_path, mime_type=mime_type)
-        
-        # Create prompt
-        prompt = """
-        Analyze this educational document.
-        Create a comprehensive lesson module in Markdown format based strictly on the content of this file.
-        
-        Requirements:
-        1. **Summary**: Brief summary of the topic.
-        2. **Key Concepts**: Explain main concepts clearly.
-        3. **Equations**: If there are mathematical formulas, convert them to LaTeX format enclosed in $$ (block) or $ (inline).
-        4. **Examples**: Provide examples if available in the text.
-        5. **Quiz/Practice**: Create 3 simple practice questions based on the content.
-        
-        Format the output as clean Markdown.
-        """
-        
-        chat = model.start_chat(history=[
-            {"role": "user", "parts": [uploaded_file, prompt]}
-        ])
-        
-        response = chat.send_message("Generate the content now.")
-        return response.text
-    except Exception as e:
-        return f"Error generating content: {str(e)}"
-
-def ask_gemini(prompt: str, history: list = None) -> str:
-    try:
-        chat = model.start_chat(history=history or [])
-        response = chat.send_message(prompt)
-        return response.text
-    except Exception as e:
-        return f"Error: {str(e)}"
+    return get_llm_client().upload(path, mime_type=mime_type)
+
+def generate_material_content(file_path, mime_type, class_id=None, raise_errors=False):
+    """
+    Generates educational content from a file using Gemini.
+    Secara default error dikembalikan sebagai teks; raise_errors=True untuk worker yang perlu menandai gagal.
+    """
+    with track_llm("material", class_id) as call:
+        try:
+            # File yang sama (SHA-256 isi file) tidak perlu di-upload dan di-generate ulang
+            params = {"prompt_version": MATERIAL_PROMPT_VERSION, "model": MODEL_NAME, "provider": get_llm_client().provider_name}
+            return cached_generation(
+                "material", file_path, params,
+                lambda: _generate_material(file_path, mime_type),
+            )
+        except Exception as e:
+            logger.exception("Gagal generate materi dari %s", file_path)
+            call.failed(e)
+            if raise_errors:
+                raise
+            return f"Error generating content: {str(e)}"
+
+def _generate_material(file_path, mime_type):
+    # Upload file
+    uploaded_file = upload_to_gemini(file_path, mime_type=mime_type)
+    
+    # Create prompt
+    prompt = """
+    Analyze this educational document.
+    Create a comprehensive lesson module in Markdown format based strictly on the content of this file.
+    
+    Requirements:
+    1. **Summary**: Brief summary of the topic.
+    2. **Key Concepts**: Explain main concepts clearly.
+    3. **Equations**: If there are mathematical formulas, convert them to LaTeX format enclosed in $$ (block) or $ (inline).
+    4. **Examples**: Provide examples if available in the text.
+    5. **Quiz/Practice**: Create 3 simple practice questions based on the content.
+    
+    Format the output as clean Markdown.
+    """
+    
+    return get_llm_client().generate(
+        TEACHER_PROFILE,
+        "Generate the content now.",
+        history=[{"role": "user", "parts": [uploaded_file, prompt]}],
+        timeout=LONG_TIMEOUT,
+    )
+
+def _cached_answer(prompt, cacheable):
+    if not cacheable:
+        return None
+    cached = answer_cache.get(prompt)
+    mark_cache("miss" if cached is None else "hit")
+    return cached
+
+async def _acached_answer(prompt, cacheable):
+    # Lookup dan counter metrik cache memakai I/O cache bersama yang sinkron: jalankan di thread
+    if not cacheable:
+        return None
+    return await sync_to_async(_cached_answer)(prompt, cacheable)
+
+def ask_gemini(prompt: str, history: list = None, class_id=None) -> str:
+    """`class_id` diisi untuk percakapan mode kelas (prompt sudah berisi materi kelas, lihat retrieval.py)."""
+    with track_llm("chatbot", class_id) as call:
+        # Pertanyaan tanpa konteks percakapan boleh dijawab dari cache (lihat answer_cache.py),
+        # kecuali mode kelas: jawabannya bergantung pada materi kelas
+        cacheable = class_id is None and is_context_free(history)
+        cached = _cached_answer(prompt, cacheable)
+        if cached is not None:
+            return cached
+
+        try:
+            started = time.perf_counter()
+            answer = get_llm_client().generate(TEACHER_PROFILE, prompt, history=history or [])
+            if cacheable:
+                answer_cache.set(prompt, answer, time.perf_counter() - started)
+            return answer
+        except Exception as e:
+            logger.exception("Gagal menjawab pesan chatbot")
+            call.failed(e)
+            return f"Error: {str(e)}"
+
+def _summary_prompt(previous_summary, messages):
+    transcript = "\n".join(
+        f"{'Siswa' if role == 'user' else 'Guruku AI'}: {content}" for role, content in messages
+    )
+    return (
+        f"{SUMMARY_INSTRUCTION}\n"
+        f"Ringkasan sebelumnya:\n{previous_summary or '(belum ada)'}\n\n"
+        f"Percakapan lanjutan:\n{transcript}"
+    )
+
+def summarize_history(previous_summary: str, messages: list) -> str:
+    """Gabungkan ringkasan lama dengan pesan-pesan [(role, content), ...] menjadi ringkasan baru."""
+    with track_llm("chat_summary"):
+        return get_llm_client().generate(SUMMARY_PROFILE, _summary_prompt(previous_summary, messages)).strip()
+
+async def asummarize_history(previous_summary: str, messages: list) -> str:
+    async with atrack_llm("chat_summary"):
+        return (await get_llm_client().agenerate(SUMMARY_PROFILE, _summary_prompt(previous_summary, messages))).strip()
+
+async def aask_gemini(prompt: str, history: list = None, class_id=None) -> str:
+    """Versi async dari ask_gemini: worker tidak tertahan selama menunggu Gemini."""
+    async with atrack_llm("chatbot", class_id) as call:
+        cacheable = class_id is None and is_context_free(history)
+        cached = await _acached_answer(prompt, cacheable)
+        if cached is not None:
+            return cached
+
+        try:
+            started = time.perf_counter()
+            answer = await get_llm_client().agenerate(TEACHER_PROFILE, prompt, history=history or [])
+            if cacheable:
+                await sync_to_async(answer_cache.set)(prompt, answer, time.perf_counter() - started)
+            return answer
+        except Exception as e:
+            logger.exception("Gagal menjawab pesan chatbot")
+            call.failed(e)
+            return f"Error: {str(e)}"
+
+async def stream_gemini(prompt: str, history: list = None, class_id=None):
+    """Jawaban Gemini dikirim per potongan teks begitu diterima (streaming, non-blocking)."""
+    async with atrack_llm("chatbot_stream", class_id):
+        cacheable = class_id is None and is_context_free(history)
+        cached = await _acached_answer(prompt, cacheable)
+        if cached is not None:
+            yield cached
+            return
+
+        started = time.perf_counter()
+        parts = []
+        async for text in get_llm_client().stream(TEACHER_PROFILE, prompt, history=history or []):
+            parts.append(text)
+            yield text
+
+        if cacheable and parts:
+            await sync_to_async(answer_cache.set)(prompt, "".join(parts), time.perf_counter() - started)
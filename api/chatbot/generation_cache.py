@@ -0,0 +1,98 @@
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .instrumentation import mark_cache
+from .models import GenerationCache
+
+logger = logging.getLogger(__name__)
+
+# Hasil generate disimpan selama TTL dan total ukurannya dibatasi;
+# jika melebihi batas, entri yang paling lama tidak dipakai dihapus lebih dulu.
+CACHE_TTL = timedelta(seconds=getattr(settings, 'GENERATION_CACHE_TTL', 60 * 60 * 24 * 30))
+CACHE_MAX_BYTES = getattr(settings, 'GENERATION_CACHE_MAX_BYTES', 50 * 1024 * 1024)
+
+
+def file_digest(file_path, chunk_size=1024 * 1024):
+    """SHA-256 dari isi file (dibaca per chunk)."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_key(kind, file_hash, **params):
+    """Kunci cache: jenis generate + hash file + parameter (num_questions, prompt version, model, ...)."""
+    raw = json.dumps({'kind': kind, 'file': file_hash, 'params': params}, sort_keys=True)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def get_cached(key):
+    now = timezone.now()
+    entry = GenerationCache.objects.filter(key=key).only('id', 'result', 'expires_at').first()
+    if entry is None:
+        return None
+    if entry.expires_at <= now:
+        entry.delete()
+        return None
+
+    GenerationCache.objects.filter(id=entry.id).update(last_used_at=now, hits=F('hits') + 1)
+    return entry.result
+
+
+def store(key, kind, result):
+    now = timezone.now()
+    size = len(json.dumps(result).encode('utf-8'))
+    GenerationCache.objects.update_or_create(
+        key=key,
+        defaults={
+            'kind': kind,
+            'result': result,
+            'size_bytes': size,
+            'last_used_at': now,
+            'expires_at': now + CACHE_TTL,
+        },
+    )
+    evict()
+
+
+def evict():
+    """Hapus entri kedaluwarsa, lalu entri LRU sampai total ukuran di bawah CACHE_MAX_BYTES."""
+    GenerationCache.objects.filter(expires_at__lte=timezone.now()).delete()
+
+    total = GenerationCache.objects.aggregate(total=Sum('size_bytes'))['total'] or 0
+    if total <= CACHE_MAX_BYTES:
+        return
+
+    to_delete = []
+    for entry_id, size in GenerationCache.objects.order_by('last_used_at').values_list('id', 'size_bytes').iterator():
+        if total <= CACHE_MAX_BYTES:
+            break
+        to_delete.append(entry_id)
+        total -= size
+    GenerationCache.objects.filter(id__in=to_delete).delete()
+
+
+def cached_generation(kind, file_path, params, generate):
+    """
+    Kembalikan hasil dari cache jika file + parameter yang sama pernah diproses,
+    selain itu panggil generate() dan simpan hasilnya.
+    generate() harus raise exception saat gagal agar error tidak ikut ter-cache.
+    """
+    key = make_key(kind, file_digest(file_path), **params)
+    result = get_cached(key)
+    if result is not None:
+        logger.info("Generation cache hit (%s) %s", kind, key[:12])
+        mark_cache("hit")
+        return result
+
+    mark_cache("miss")
+    result = generate()
+    store(key, kind, result)
+    return result
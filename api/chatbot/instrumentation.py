@@ -0,0 +1,238 @@
+import contextvars
+import logging
+import time
+from contextlib import asynccontextmanager, contextmanager
+from datetime import timedelta
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import LLMCallLog
+
+logger = logging.getLogger(__name__)
+
+# Instrumentasi operasi AI. Setiap entry point (ask_gemini, generate_material_content,
+# generate_quiz_from_file, ringkasan history) dibungkus track_llm()/atrack_llm():
+# - LLMClient menambahkan waktu upload, waktu generate (termasuk retry), token dari
+#   usage metadata respons, model & jumlah percobaan ke operasi yang sedang berjalan
+# - cache jawaban / cache generate menandai hit atau miss
+# - exception (atau error yang dikembalikan sebagai teks) dicatat sebagai jenis error
+# Satu baris LLMCallLog per operasi; laporan p50/p95/p99 & token harian lewat report().
+
+# Harga per 1 juta token (USD) untuk estimasi biaya
+TOKEN_PRICES = getattr(settings, 'LLM_TOKEN_PRICES', {
+    'gemini-2.5-flash-lite': {'prompt': 0.10, 'response': 0.40},
+})
+PERCENTILES = (50, 95, 99)
+
+_current = contextvars.ContextVar('llm_call', default=None)
+
+
+class LLMCall:
+    def __init__(self, endpoint, class_id=None):
+        self.endpoint = endpoint
+        self.class_id = class_id
+        self.provider = ''
+        self.model_name = ''
+        self.cache = ''
+        self.error_class = ''
+        self.attempts = 0
+        self.upload_ms = 0
+        self.generation_ms = 0
+        self.prompt_tokens = 0
+        self.response_tokens = 0
+        self.started = time.perf_counter()
+
+    def add_upload(self, provider, elapsed):
+        self.provider = provider
+        self.upload_ms += int(elapsed * 1000)
+
+    def add_generation(self, provider, profile, elapsed, attempts, usage):
+        self.provider = provider
+        self.model_name = profile.model_name
+        self.attempts += attempts
+        self.generation_ms += int(elapsed * 1000)
+        self.prompt_tokens += usage.get('prompt_tokens', 0)
+        self.response_tokens += usage.get('response_tokens', 0)
+
+    def failed(self, exc):
+        self.error_class = type(exc).__name__
+
+    def to_log(self):
+        return LLMCallLog(
+            endpoint=self.endpoint,
+            class_obj_id=self.class_id,
+            provider=self.provider,
+            model_name=self.model_name,
+            cache=self.cache,
+            status='error' if self.error_class else 'ok',
+            error_class=self.error_class,
+            attempts=self.attempts,
+            wall_ms=int((time.perf_counter() - self.started) * 1000),
+            upload_ms=self.upload_ms,
+            generation_ms=self.generation_ms,
+            prompt_tokens=self.prompt_tokens,
+            response_tokens=self.response_tokens,
+        )
+
+
+def current_call():
+    """Operasi AI yang sedang berjalan di konteks ini, atau None."""
+    return _current.get()
+
+
+def mark_cache(result):
+    """Tandai operasi yang sedang berjalan sebagai cache 'hit' atau 'miss'."""
+    call = current_call()
+    if call is not None:
+        call.cache = result
+
+
+def resolve_class_id(value):
+    """ID kelas (opsional, dari request) untuk atribusi metrik; None jika tidak valid."""
+    from api.classes.models import Class
+
+    try:
+        return Class.objects.filter(id=value).values_list('id', flat=True).first() if value else None
+    except (ValueError, ValidationError):
+        return None
+
+
+def _save(log):
+    # Metrik tidak boleh menggagalkan request
+    try:
+        log.save()
+    except Exception:
+        logger.exception("Gagal menyimpan metrik LLM (%s)", log.endpoint)
+
+
+@contextmanager
+def track_llm(endpoint, class_id=None):
+    call = LLMCall(endpoint, class_id)
+    token = _current.set(call)
+    try:
+        yield call
+    except Exception as e:
+        call.failed(e)
+        raise
+    finally:
+        _current.reset(token)
+        _save(call.to_log())
+
+
+@asynccontextmanager
+async def atrack_llm(endpoint, class_id=None):
+    """Versi async dari track_llm (penyimpanan log tidak menahan event loop)."""
+    call = LLMCall(endpoint, class_id)
+    token = _current.set(call)
+    try:
+        yield call
+    except Exception as e:
+        call.failed(e)
+        raise
+    finally:
+        _current.reset(token)
+        await sync_to_async(_save)(call.to_log())
+
+
+def estimate_cost(model_name, prompt_tokens, response_tokens):
+    price = TOKEN_PRICES.get(model_name)
+    if not price:
+        return None
+    return round((prompt_tokens * price['prompt'] + response_tokens * price['response']) / 1_000_000, 6)
+
+
+def _percentiles(values):
+    if not len(values):
+        return None
+    return dict(zip((f"p{p}" for p in PERCENTILES), np.percentile(values, PERCENTILES).round(1).tolist()))
+
+
+def _latency_summary(rows):
+    """rows: array terstruktur dengan kolom wall/upload/generation/error/hit."""
+    # Cache hit tidak memanggil model, jadi tidak ikut dihitung di persentil latensi
+    called = rows[~rows['hit']]
+    return {
+        'calls': int(len(rows)),
+        'cache_hits': int(rows['hit'].sum()),
+        'errors': int(rows['error'].sum()),
+        'wall_ms': _percentiles(called['wall']),
+        'upload_ms': _percentiles(called['upload'][called['upload'] > 0]),
+        'generation_ms': _percentiles(called['generation']),
+    }
+
+
+def _grouped_latency(logs, field):
+    values = list(logs.values_list(field, 'wall_ms', 'upload_ms', 'generation_ms', 'status', 'cache'))
+    if not values:
+        return {}
+    keys = np.array([str(v[0]) if v[0] is not None else '' for v in values])
+    rows = np.array(
+        [(v[1], v[2], v[3], v[4] == 'error', v[5] == 'hit') for v in values],
+        dtype=[('wall', 'i8'), ('upload', 'i8'), ('generation', 'i8'), ('error', '?'), ('hit', '?')],
+    )
+    order = np.argsort(keys, kind='stable')
+    keys, rows = keys[order], rows[order]
+    unique, starts = np.unique(keys, return_index=True)
+    bounds = list(starts[1:]) + [len(keys)]
+    return {key: _latency_summary(rows[start:end]) for key, start, end in zip(unique, starts, bounds)}
+
+
+def _daily_tokens(logs, field):
+    totals = {}
+    rows = (
+        logs.annotate(day=TruncDate('created_at'))
+        .values('day', field, 'model_name')
+        .annotate(calls=Count('id'), prompt_tokens=Sum('prompt_tokens'), response_tokens=Sum('response_tokens'))
+    )
+    # Biaya dihitung per model lalu dijumlahkan per hari + endpoint/kelas
+    for row in rows:
+        key = (row['day'], row[field])
+        total = totals.setdefault(key, {'day': row['day'], field: row[field], 'calls': 0, 'prompt_tokens': 0, 'response_tokens': 0, 'cost_usd': 0.0})
+        total['calls'] += row['calls']
+        total['prompt_tokens'] += row['prompt_tokens']
+        total['response_tokens'] += row['response_tokens']
+        total['cost_usd'] = round(total['cost_usd'] + (estimate_cost(row['model_name'], row['prompt_tokens'], row['response_tokens']) or 0), 6)
+    return sorted(totals.values(), key=lambda total: (total['day'], str(total[field])))
+
+
+def _errors(logs):
+    return {
+        (row['endpoint'], row['error_class']): row['count']
+        for row in logs.filter(status='error').values('endpoint', 'error_class').annotate(count=Count('id'))
+    }
+
+
+def report(days=7):
+    """p50/p95/p99 latensi & token harian per endpoint dan per kelas selama `days` hari terakhir."""
+    since = timezone.now() - timedelta(days=days)
+    logs = LLMCallLog.objects.filter(created_at__gte=since)
+    class_logs = logs.filter(class_obj__isnull=False)
+
+    class_names = {str(pk): name for pk, name in class_logs.values_list('class_obj_id', 'class_obj__name').distinct()}
+    by_class = _grouped_latency(class_logs, 'class_obj_id')
+    for class_id, summary in by_class.items():
+        summary['class_name'] = class_names.get(class_id)
+
+    errors = {}
+    for (endpoint, error_class), count in _errors(logs).items():
+        errors.setdefault(endpoint, {})[error_class or 'unknown'] = count
+
+    by_endpoint = _grouped_latency(logs, 'endpoint')
+    for endpoint, summary in by_endpoint.items():
+        summary['error_classes'] = errors.get(endpoint, {})
+
+    return {
+        'since': since,
+        'endpoints': by_endpoint,
+        'classes': by_class,
+        'daily_tokens': {
+            'endpoints': _daily_tokens(logs, 'endpoint'),
+            'classes': _daily_tokens(class_logs, 'class_obj_id'),
+        },
+    }
@@ -0,0 +1,504 @@
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+from django.conf import settings
+
+from .instrumentation import current_call
+
+logger = logging.getLogger(__name__)
+
+# Semua panggilan LLM (chatbot, materi, kuis) lewat client ini:
+# - deadline per panggilan (timeout total, termasuk retry)
+# - retry terbatas dengan exponential backoff + jitter, hanya untuk error sementara
+# - circuit breaker: setelah beberapa kegagalan beruntun, panggilan langsung ditolak
+#   selama BREAKER_RESET detik agar worker tidak ikut tertahan oleh region yang lambat
+# - semaphore per proses untuk membatasi jumlah panggilan bersamaan
+# - waktu, jumlah percobaan & token dicatat ke operasi AI yang sedang dilacak (instrumentation.py)
+# Provider dipilih dengan LLM_PROVIDER: 'gemini' (default) atau 'fake' (deterministik, tanpa jaringan).
+
+DEFAULT_TIMEOUT = getattr(settings, 'LLM_TIMEOUT', 30)
+# Generate dari file (materi/kuis) jauh lebih lama dari chat
+LONG_TIMEOUT = getattr(settings, 'LLM_LONG_TIMEOUT', 180)
+# Upload file (materi/kuis) sebelum generate; SDK tidak punya timeout sendiri
+UPLOAD_TIMEOUT = getattr(settings, 'LLM_UPLOAD_TIMEOUT', 120)
+UPLOAD_CONCURRENCY = getattr(settings, 'LLM_UPLOAD_CONCURRENCY', 8)
+MAX_RETRIES = getattr(settings, 'LLM_MAX_RETRIES', 2)
+RETRY_BASE_DELAY = getattr(settings, 'LLM_RETRY_BASE_DELAY', 0.5)
+# Cukup besar untuk ratusan chat async yang sedang menunggu model dalam satu proses
+MAX_CONCURRENCY = getattr(settings, 'LLM_MAX_CONCURRENCY', 200)
+BREAKER_FAILURES = getattr(settings, 'LLM_BREAKER_FAILURES', 5)
+BREAKER_RESET = getattr(settings, 'LLM_BREAKER_RESET', 30)
+
+
+class LLMError(Exception):
+    pass
+
+
+class LLMTimeout(LLMError):
+    pass
+
+
+class LLMUnavailable(LLMError):
+    """Circuit breaker terbuka atau kapasitas panggilan bersamaan penuh."""
+
+
+class ModelProfile:
+    """Konfigurasi model untuk satu jenis penggunaan (persona guru, ringkasan, generate kuis, ...)."""
+
+    def __init__(self, name, model_name, system_instruction=None, generation_config=None, safety_settings=None):
+        self.name = name
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.generation_config = generation_config or {}
+        self.safety_settings = safety_settings
+
+    @property
+    def wants_json(self):
+        return self.generation_config.get('response_mime_type') == 'application/json'
+
+
+class GeminiProvider:
+    name = 'gemini'
+
+    def __init__(self):
+        import google.generativeai as genai
+
+        self.genai = genai
+        genai.configure(api_key=settings.GEMINI_API_KEY)
+        self._models = {}
+        self._lock = threading.Lock()
+        self._uploads = concurrent.futures.ThreadPoolExecutor(UPLOAD_CONCURRENCY, thread_name_prefix='llm-upload')
+
+    def _model(self, profile):
+        with self._lock:
+            model = self._models.get(profile.name)
+            if model is None:
+                model = self.genai.GenerativeModel(
+                    model_name=profile.model_name,
+                    system_instruction=profile.system_instruction,
+                    safety_settings=profile.safety_settings,
+                    generation_config=profile.generation_config,
+                )
+                self._models[profile.name] = model
+            return model
+
+    @staticmethod
+    def _usage(response, usage):
+        metadata = getattr(response, 'usage_metadata', None)
+        if metadata:
+            usage['prompt_tokens'] = metadata.prompt_token_count or 0
+            usage['response_tokens'] = metadata.candidates_token_count or 0
+
+    def generate(self, profile, contents, history, timeout, usage):
+        model = self._model(profile)
+        request_options = {'timeout': timeout}
+        if history is None:
+            response = model.generate_content(contents, request_options=request_options)
+        else:
+            response = model.start_chat(history=history).send_message(contents, request_options=request_options)
+        self._usage(response, usage)
+        return response.text
+
+    async def agenerate(self, profile, contents, history, timeout, usage):
+        model = self._model(profile)
+        request_options = {'timeout': timeout}
+        if history is None:
+            response = await model.generate_content_async(contents, request_options=request_options)
+        else:
+            response = await model.start_chat(history=history).send_message_async(contents, request_options=request_options)
+        self._usage(response, usage)
+        return response.text
+
+    async def stream(self, profile, contents, history, timeout, usage):
+        chat = self._model(profile).start_chat(history=history or [])
+        response = await chat.send_message_async(contents, stream=True, request_options={'timeout': timeout})
+        async for chunk in response:
+            # Usage metadata kumulatif, potongan terakhir berisi total
+            self._usage(chunk, usage)
+            for part in chunk.parts:
+                if part.text:
+                    yield part.text
+
+    def upload(self, path, mime_type, timeout):
+        # genai.upload_file (googleapiclient) tidak menerima timeout: dijalankan di thread pool
+        # dan ditunggu maksimal `timeout`, agar worker tidak tertahan oleh upload yang macet
+        future = self._uploads.submit(self.genai.upload_file, path, mime_type=mime_type)
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError as exc:
+            future.cancel()
+            raise TimeoutError("upload file melewati deadline") from exc
+
+    def is_retryable(self, exc):
+        from google.api_core import exceptions
+
+        return isinstance(exc, (
+            exceptions.ServiceUnavailable, exceptions.DeadlineExceeded, exceptions.TooManyRequests,
+            exceptions.InternalServerError, exceptions.GatewayTimeout, TimeoutError, ConnectionError,
+        ))
+
+
+class FakeProvider:
+    """
+    Provider lokal deterministik untuk load test dan CI: jawaban yang sama untuk input yang sama.
+    LLM_FAKE_LATENCY menambahkan jeda (detik) per panggilan. Penanda di prompt untuk menguji jalur error:
+    `[[llm-fail]]` melempar error sementara, `[[llm-slow]]` melewati deadline.
+    """
+    name = 'fake'
+    FAIL_MARKER = '[[llm-fail]]'
+    SLOW_MARKER = '[[llm-slow]]'
+
+    def __init__(self, latency=None):
+        self.latency = getattr(settings, 'LLM_FAKE_LATENCY', 0) if latency is None else latency
+
+    @staticmethod
+    def _prompt_text(contents):
+        parts = contents if isinstance(contents, (list, tuple)) else [contents]
+        return "\n".join(part for part in parts if isinstance(part, str))
+
+    def _delay(self, prompt, timeout):
+        """Jeda simulasi; None berarti panggilan melewati deadline."""
+        if self.FAIL_MARKER in prompt:
+            raise ConnectionError("fake provider: kegagalan disimulasikan")
+        delay = timeout + 0.01 if self.SLOW_MARKER in prompt else self.latency
+        return None if delay > timeout else delay
+
+    @staticmethod
+    def _usage(prompt, history, reply, usage):
+        # Perkiraan kasar ~4 karakter per token, cukup untuk menguji instrumentasi
+        history_text = " ".join(str(part) for item in history or [] for part in item['parts'])
+        usage['prompt_tokens'] = (len(prompt) + len(history_text)) // 4 + 1
+        usage['response_tokens'] = len(reply) // 4 + 1
+
+    def _reply(self, profile, prompt, history):
+        digest = hashlib.sha256(f"{profile.name}\n{len(history or [])}\n{prompt}".encode('utf-8')).hexdigest()
+        if profile.wants_json:
+            return json.dumps([
+                {
+                    "text": f"Soal latihan {i + 1} ({digest[i * 4:i * 4 + 4]})",
+                    "options": ["Pilihan A", "Pilihan B", "Pilihan C", "Pilihan D"],
+                    "answer": "Pilihan A",
+                    "points": 10,
+                    "order": i + 1,
+                }
+                for i in range(5)
+            ])
+        summary = " ".join(prompt.split())[:120]
+        return f"[{profile.name}:{digest[:8]}] Jawaban simulasi untuk: {summary}"
+
+    def generate(self, profile, contents, history, timeout, usage):
+        prompt = self._prompt_text(contents)
+        delay = self._delay(prompt, timeout)
+        time.sleep(timeout if delay is None else delay)
+        if delay is None:
+            raise TimeoutError("fake provider: melewati deadline")
+        reply = self._reply(profile, prompt, history)
+        self._usage(prompt, history, reply, usage)
+        return reply
+
+    async def agenerate(self, profile, contents, history, timeout, usage):
+        prompt = self._prompt_text(contents)
+        delay = self._delay(prompt, timeout)
+        await asyncio.sleep(timeout if delay is None else delay)
+        if delay is None:
+            raise TimeoutError("fake provider: melewati deadline")
+        reply = self._reply(profile, prompt, history)
+        self._usage(prompt, history, reply, usage)
+        return reply
+
+    async def stream(self, profile, contents, history, timeout, usage):
+        text = await self.agenerate(profile, contents, history, timeout, usage)
+        for word in text.split(" "):
+            yield word + " "
+
+    def upload(self, path, mime_type, timeout):
+        name = os.path.basename(path)
+        delay = self._delay(name, timeout)
+        time.sleep(timeout if delay is None else delay)
+        if delay is None:
+            raise TimeoutError("fake provider: upload melewati deadline")
+        return f"fake-file:{name}"
+
+    def is_retryable(self, exc):
+        return isinstance(exc, (TimeoutError, ConnectionError))
+
+
+class CircuitBreaker:
+    def __init__(self, failures, reset_after):
+        self.failures = failures
+        self.reset_after = reset_after
+        self._count = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        'closed' atau 'half-open' jika panggilan boleh jalan, None jika ditolak. Panggilan percobaan
+        ('half-open') harus ditutup dengan end_trial() apa pun hasilnya.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            # Half-open: setelah reset_after hanya satu panggilan percobaan yang dilewatkan
+            if time.monotonic() - self._opened_at >= self.reset_after and not self._trial:
+                self._trial = True
+                return 'half-open'
+            return None
+
+    def success(self):
+        with self._lock:
+            self._count = 0
+            self._opened_at = None
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self._count += 1
+            if self._trial or self._count >= self.failures:
+                if self._opened_at is None or self._trial:
+                    logger.warning("Circuit breaker LLM terbuka setelah %s kegagalan", self._count)
+                self._opened_at = time.monotonic()
+                self._trial = False
+
+    def end_trial(self):
+        # Percobaan yang berakhir tanpa success()/failure() (error non-retryable, dibatalkan, dst.)
+        # dihitung gagal agar breaker tidak tertahan di half-open
+        with self._lock:
+            trial = self._trial
+        if trial:
+            self.failure()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if self._trial or time.monotonic() - self._opened_at >= self.reset_after:
+                return 'half-open'
+            return 'open'
+
+
+class LLMClient:
+    def __init__(self, provider, max_retries=MAX_RETRIES, max_concurrency=MAX_CONCURRENCY,
+                 breaker=None, default_timeout=DEFAULT_TIMEOUT):
+        self.provider = provider
+        self.max_retries = max_retries
+        self.default_timeout = default_timeout
+        self.breaker = breaker or CircuitBreaker(BREAKER_FAILURES, BREAKER_RESET)
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+
+    @property
+    def provider_name(self):
+        return self.provider.name
+
+    def _check_breaker(self):
+        """Mengembalikan True jika panggilan ini percobaan half-open (tutup dengan breaker.end_trial())."""
+        state = self.breaker.allow()
+        if state is None:
+            raise LLMUnavailable("Layanan AI sedang tidak tersedia, silakan coba beberapa saat lagi.")
+        return state == 'half-open'
+
+    def _acquire(self, deadline):
+        if not self._semaphore.acquire(timeout=max(deadline - time.monotonic(), 0)):
+            raise LLMUnavailable("Layanan AI sedang sibuk, silakan coba beberapa saat lagi.")
+
+    async def _aacquire(self, deadline):
+        # Tanpa thread tambahan: event loop tetap bebas selama menunggu slot
+        while not self._semaphore.acquire(blocking=False):
+            if time.monotonic() >= deadline:
+                raise LLMUnavailable("Layanan AI sedang sibuk, silakan coba beberapa saat lagi.")
+            await asyncio.sleep(0.01)
+
+    def _backoff(self, attempt, deadline):
+        """Jeda full jitter sebelum retry; None jika sisa waktu tidak cukup."""
+        delay = random.uniform(0, RETRY_BASE_DELAY * (2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+    def _record(self, profile, started, attempts, usage):
+        # Ditambahkan ke operasi AI yang sedang dilacak (lihat instrumentation.py)
+        call = current_call()
+        if call is not None:
+            call.add_generation(self.provider_name, profile, time.perf_counter() - started, attempts, usage)
+
+    def _failed(self, exc, attempt, deadline):
+        """Catat kegagalan dan kembalikan jeda retry, atau lempar ulang jika tidak di-retry."""
+        retryable = self.provider.is_retryable(exc)
+        if retryable:
+            self.breaker.failure()
+        delay = self._backoff(attempt, deadline) if retryable and attempt < self.max_retries else None
+        if delay is None:
+            if (retryable and time.monotonic() >= deadline) or isinstance(exc, TimeoutError):
+                raise LLMTimeout("Layanan AI tidak merespons tepat waktu.") from exc
+            raise exc
+        logger.warning("Panggilan LLM gagal (%s), retry ke-%s dalam %.2f s", exc, attempt + 1, delay)
+        return delay
+
+    def generate(self, profile, contents, history=None, timeout=None):
+        """
+        Panggil model dan kembalikan teks jawaban. `history` (format Gemini) membuat panggilan
+        berupa chat; tanpa history berupa generate_content biasa.
+        """
+        deadline = time.monotonic() + (timeout or self.default_timeout)
+        started, usage = time.perf_counter(), {}
+        attempt = 0
+        try:
+            while True:
+                trial = self._check_breaker()
+                try:
+                    self._acquire(deadline)
+                    try:
+                        text = self.provider.generate(profile, contents, history, max(deadline - time.monotonic(), 0.1), usage)
+                    except Exception as exc:
+                        delay = self._failed(exc, attempt, deadline)
+                    else:
+                        self.breaker.success()
+                        return text
+                    finally:
+                        self._semaphore.release()
+                finally:
+                    if trial:
+                        self.breaker.end_trial()
+                time.sleep(delay)
+                attempt += 1
+        finally:
+            self._record(profile, started, attempt + 1, usage)
+
+    async def agenerate(self, profile, contents, history=None, timeout=None):
+        """Versi async dari generate(): tidak menahan thread selama menunggu model."""
+        deadline = time.monotonic() + (timeout or self.default_timeout)
+        started, usage = time.perf_counter(), {}
+        attempt = 0
+        try:
+            while True:
+                trial = self._check_breaker()
+                try:
+                    await self._aacquire(deadline)
+                    try:
+                        remaining = max(deadline - time.monotonic(), 0.1)
+                        text = await asyncio.wait_for(self.provider.agenerate(profile, contents, history, remaining, usage), remaining)
+                    except asyncio.TimeoutError:
+                        delay = self._failed(TimeoutError("deadline panggilan terlewati"), attempt, deadline)
+                    except Exception as exc:
+                        delay = self._failed(exc, attempt, deadline)
+                    else:
+                        self.breaker.success()
+                        return text
+                    finally:
+                        self._semaphore.release()
+                finally:
+                    if trial:
+                        self.breaker.end_trial()
+                await asyncio.sleep(delay)
+                attempt += 1
+        finally:
+            self._record(profile, started, attempt + 1, usage)
+
+    async def stream(self, profile, contents, history=None, timeout=None):
+        """
+        Streaming jawaban per potongan teks. Retry hanya dilakukan sebelum potongan pertama terkirim;
+        deadline berlaku untuk seluruh stream.
+        """
+        deadline = time.monotonic() + (timeout or self.default_timeout)
+        started_at, usage = time.perf_counter(), {}
+        attempt = 0
+        try:
+            while True:
+                trial = self._check_breaker()
+                started = False
+                try:
+                    await self._aacquire(deadline)
+                    try:
+                        chunks = self.provider.stream(profile, contents, history, max(deadline - time.monotonic(), 0.1), usage).__aiter__()
+                        while True:
+                            remaining = deadline - time.monotonic()
+                            if remaining <= 0:
+                                raise TimeoutError("deadline stream terlewati")
+                            try:
+                                text = await asyncio.wait_for(chunks.__anext__(), remaining)
+                            except StopAsyncIteration:
+                                break
+                            except asyncio.TimeoutError as exc:
+                                raise TimeoutError("deadline stream terlewati") from exc
+                            started = True
+                            yield text
+                    except Exception as exc:
+                        if started:
+                            if self.provider.is_retryable(exc):
+                                self.breaker.failure()
+                            raise
+                        delay = self._failed(exc, attempt, deadline)
+                    else:
+                        self.breaker.success()
+                        return
+                    finally:
+                        self._semaphore.release()
+                finally:
+                    if trial:
+                        self.breaker.end_trial()
+                await asyncio.sleep(delay)
+                attempt += 1
+        finally:
+            self._record(profile, started_at, attempt + 1, usage)
+
+    def upload(self, path, mime_type=None, timeout=None):
+        """
+        Upload file untuk dipakai sebagai konten prompt (tanpa retry: upload tidak idempoten).
+        Kegagalan sementara dan timeout tetap dihitung oleh circuit breaker.
+        """
+        trial = self._check_breaker()
+        started = time.perf_counter()
+        try:
+            try:
+                uploaded = self.provider.upload(path, mime_type, timeout or UPLOAD_TIMEOUT)
+            except Exception as exc:
+                if self.provider.is_retryable(exc):
+                    self.breaker.failure()
+                if isinstance(exc, TimeoutError):
+                    raise LLMTimeout("Upload file ke layanan AI tidak selesai tepat waktu.") from exc
+                raise
+            self.breaker.success()
+            return uploaded
+        finally:
+            if trial:
+                self.breaker.end_trial()
+            call = current_call()
+            if call is not None:
+                call.add_upload(self.provider_name, time.perf_counter() - started)
+
+
+PROVIDERS = {
+    'gemini': GeminiProvider,
+    'fake': FakeProvider,
+}
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def set_llm_client(client):
+    """Ganti client bersama (mis. benchmark dengan FakeProvider)."""
+    global _client
+    with _client_lock:
+        _client = client
+
+
+def get_llm_client():
+    """Client LLM bersama untuk proses ini (provider dari settings.LLM_PROVIDER)."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            provider_name = getattr(settings, 'LLM_PROVIDER', 'gemini')
+            if provider_name not in PROVIDERS:
+                raise LLMError(f"LLM_PROVIDER tidak dikenal: {provider_name}")
+            _client = LLMClient(PROVIDERS[provider_name]())
+        return _client
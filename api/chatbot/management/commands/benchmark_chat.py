@@ -0,0 +1,112 @@
+import asyncio
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.test import AsyncRequestFactory, RequestFactory, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.chatbot.llm_client import FakeProvider, LLMClient, get_llm_client, set_llm_client
+from api.chatbot.models import ChatMessage, Conversation
+from api.chatbot.views import AsyncChatbotMessageView, ChatbotMessageView
+from api.users.models import User
+
+
+class Command(BaseCommand):
+    help = "Benchmark throughput chat bersamaan: view sync (thread worker) vs view async (event loop), dengan FakeProvider."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Jumlah pesan per mode")
+        parser.add_argument('--concurrency', type=int, default=200, help="Jumlah chat bersamaan pada mode async")
+        parser.add_argument('--sync-workers', type=int, default=20, help="Jumlah thread worker pada mode sync (mis. worker gunicorn)")
+        parser.add_argument('--latency', type=float, default=1.0, help="Latency simulasi Gemini (detik)")
+        parser.add_argument('--mode', choices=['both', 'sync', 'async'], default='both')
+
+    # Yang diukur throughput view, bukan admission control (rate_limit.py)
+    @override_settings(LLM_RATE_LIMIT_ENABLED=False)
+    def handle(self, *args, **options):
+        total = options['requests']
+        previous_client = get_llm_client()
+        set_llm_client(LLMClient(
+            FakeProvider(latency=options['latency']),
+            max_concurrency=max(options['concurrency'], options['sync_workers']),
+        ))
+
+        suffix = uuid.uuid4().hex[:8]
+        user = User.objects.create_user(email=f"bench-chat-{suffix}@example.com", full_name="Bench Chat", role='student')
+        try:
+            # Satu percakapan per pesan; sudah ada giliran user agar cache jawaban tidak ikut terpakai
+            conversations = Conversation.objects.bulk_create([Conversation(user=user, title=f"Bench {i}") for i in range(total)])
+            ChatMessage.objects.bulk_create([
+                ChatMessage(conversation=convo, role=role, content=content)
+                for convo in conversations
+                for role, content in (("user", "Halo"), ("bot", "Halo juga, ada yang bisa dibantu?"))
+            ])
+            convo_ids = [convo.id for convo in conversations]
+            token = str(AccessToken.for_user(user))
+
+            self.stdout.write(f"{'mode':>6} {'workers':>8} {'requests':>9} {'wall s':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+            if options['mode'] in ('both', 'sync'):
+                started = time.perf_counter()
+                latencies = self._run_sync(convo_ids, token, options['sync_workers'])
+                self._report('sync', options['sync_workers'], latencies, time.perf_counter() - started)
+            if options['mode'] in ('both', 'async'):
+                started = time.perf_counter()
+                latencies = asyncio.run(self._run_async(convo_ids, token, options['concurrency']))
+                self._report('async', options['concurrency'], latencies, time.perf_counter() - started)
+        finally:
+            user.delete()
+            set_llm_client(previous_client)
+
+    def _run_sync(self, convo_ids, token, workers):
+        factory = RequestFactory()
+        view = ChatbotMessageView.as_view()
+
+        def send(i, convo_id):
+            request = factory.post(
+                f"/api/chatbot/conversations/{convo_id}/message/",
+                json.dumps({"message": f"Jelaskan soal nomor {i}"}),
+                content_type="application/json",
+                HTTP_AUTHORIZATION=f"Bearer {token}",
+            )
+            started = time.perf_counter()
+            try:
+                response = view(request, conversation_id=convo_id)
+                assert response.status_code == 200, response.status_code
+                return time.perf_counter() - started
+            finally:
+                close_old_connections()
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(send, range(len(convo_ids)), convo_ids))
+
+    async def _run_async(self, convo_ids, token, concurrency):
+        factory = AsyncRequestFactory()
+        view = AsyncChatbotMessageView.as_view()
+        slots = asyncio.Semaphore(concurrency)
+
+        async def send(i, convo_id):
+            async with slots:
+                request = factory.post(
+                    f"/api/chatbot/conversations/{convo_id}/message/",
+                    json.dumps({"message": f"Jelaskan soal nomor {i}"}),
+                    content_type="application/json",
+                    headers={"Authorization": f"Bearer {token}"},
+                )
+                started = time.perf_counter()
+                response = await view(request, conversation_id=convo_id)
+                assert response.status_code == 200, response.status_code
+                return time.perf_counter() - started
+
+        return await asyncio.gather(*(send(i, convo_id) for i, convo_id in enumerate(convo_ids)))
+
+    def _report(self, mode, workers, latencies, wall):
+        latencies = np.array(latencies) * 1000
+        p50, p95 = np.percentile(latencies, [50, 95])
+        self.stdout.write(
+            f"{mode:>6} {workers:>8} {len(latencies):>9} {wall:>8.2f} {len(latencies) / wall:>8.1f} {p50:>8.0f} {p95:>8.0f}"
+        )
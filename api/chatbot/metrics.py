@@ -0,0 +1,23 @@
+from django.core.cache import cache
+
+# Counter sederhana di cache bersama (CACHES['default']) agar angka dari semua worker terjumlah.
+
+
+def _key(prefix, name):
+    return f"{prefix}:metrics:{name}"
+
+
+def incr(prefix, name, amount=1):
+    key = _key(prefix, name)
+    cache.add(key, 0, None)
+    try:
+        return cache.incr(key, amount)
+    except ValueError:
+        # Key terhapus di antara add dan incr
+        cache.set(key, amount, None)
+        return amount
+
+
+def read(prefix, names):
+    values = cache.get_many([_key(prefix, name) for name in names])
+    return {name: values.get(_key(prefix, name), 0) for name in names}
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.25 on 2026-10-18 10:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0002_generationcache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='summary',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='summary_until',
+            field=models.PositiveIntegerField(blank=True, help_text='ID ChatMessage terakhir yang sudah masuk ringkasan', null=True),
+        ),
+    ]
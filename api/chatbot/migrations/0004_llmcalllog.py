@@ -0,0 +1,38 @@
+# Generated by Django 4.2.25 on 2026-10-18 10:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0003_announcement'),
+        ('chatbot', '0003_conversation_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMCallLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('endpoint', models.CharField(max_length=50)),
+                ('provider', models.CharField(blank=True, max_length=20)),
+                ('model_name', models.CharField(blank=True, max_length=100)),
+                ('cache', models.CharField(blank=True, help_text='hit / miss, kosong jika tidak memakai cache', max_length=10)),
+                ('status', models.CharField(choices=[('ok', 'OK'), ('error', 'Error')], default='ok', max_length=10)),
+                ('error_class', models.CharField(blank=True, max_length=100)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('wall_ms', models.PositiveIntegerField(default=0)),
+                ('upload_ms', models.PositiveIntegerField(default=0)),
+                ('generation_ms', models.PositiveIntegerField(default=0)),
+                ('prompt_tokens', models.PositiveIntegerField(default=0)),
+                ('response_tokens', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('class_obj', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='llm_calls', to='classes.class')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['endpoint', 'created_at'], name='chatbot_llm_endpoin_bcff0f_idx')],
+            },
+        ),
+    ]
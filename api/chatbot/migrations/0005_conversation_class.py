@@ -0,0 +1,20 @@
+# Generated by Django 4.2.25 on 2026-10-18 10:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0003_announcement'),
+        ('chatbot', '0004_llmcalllog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='class_obj',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='conversations', to='classes.class'),
+        ),
+    ]
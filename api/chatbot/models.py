@@ -7,6 +7,11 @@ class Conversation(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="conversations")
     title = models.CharField(max_length=255, default="Percakapan Baru")
     created_at = models.DateTimeField(auto_now_add=True)
+    # Ringkasan bergulir dari pesan lama yang sudah tidak dikirim utuh ke Gemini (lihat context.py)
+    summary = models.TextField(blank=True, default="")
+    summary_until = models.PositiveIntegerField(null=True, blank=True, help_text="ID ChatMessage terakhir yang sudah masuk ringkasan")
+    # Mode kelas: jawaban memakai materi kelas ini sebagai sumber (lihat retrieval.py)
+    class_obj = models.ForeignKey('classes.Class', on_delete=models.SET_NULL, null=True, blank=True, related_name="conversations")
 
     def __str__(self):
         return f"{self.title} ({self.user.email})"
@@ -25,3 +30,55 @@ class ChatMessage(models.Model):
 
     def __str__(self):
         return f"[{self.role}] {self.content[:50]}"
+
+
+class GenerationCache(models.Model):
+    """
+    Cache hasil generate AI dari file, dikunci dengan SHA-256 isi file + parameter generate.
+    Lihat api/chatbot/generation_cache.py.
+    """
+    key = models.CharField(max_length=64, unique=True)
+    kind = models.CharField(max_length=50)
+    result = models.JSONField()
+    size_bytes = models.PositiveIntegerField(default=0)
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"[{self.kind}] {self.key[:12]}"
+
+
+class LLMCallLog(models.Model):
+    """
+    Satu operasi AI (jawaban chatbot, generate materi/kuis, ringkasan history):
+    waktu, token, model, cache hit/miss, dan jenis error. Lihat api/chatbot/instrumentation.py.
+    """
+    STATUS_CHOICES = (
+        ("ok", "OK"),
+        ("error", "Error"),
+    )
+
+    endpoint = models.CharField(max_length=50)
+    class_obj = models.ForeignKey('classes.Class', on_delete=models.SET_NULL, null=True, blank=True, related_name="llm_calls")
+    provider = models.CharField(max_length=20, blank=True)
+    model_name = models.CharField(max_length=100, blank=True)
+    cache = models.CharField(max_length=10, blank=True, help_text="hit / miss, kosong jika tidak memakai cache")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="ok")
+    error_class = models.CharField(max_length=100, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    wall_ms = models.PositiveIntegerField(default=0)
+    upload_ms = models.PositiveIntegerField(default=0)
+    generation_ms = models.PositiveIntegerField(default=0)
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    response_tokens = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["endpoint", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"[{self.endpoint}] {self.status} {self.wall_ms} ms"
@@ -0,0 +1,9 @@
+from rest_framework.pagination import CursorPagination
+
+
+class MessageCursorPagination(CursorPagination):
+    """Cursor pagination untuk pesan percakapan, terbaru lebih dulu."""
+    page_size = 30
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-id'
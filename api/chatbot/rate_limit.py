@@ -0,0 +1,233 @@
+import asyncio
+import logging
+import math
+import time
+import uuid
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+from . import metrics as counters
+
+logger = logging.getLogger(__name__)
+
+# Admission control untuk endpoint yang memanggil Gemini (chatbot, generate materi, generate kuis).
+# Token bucket per user (batas per role) dan satu bucket global, disimpan di cache bersama
+# sehingga berlaku lintas proses worker. Jika token belum cukup, request menunggu di antrian
+# maksimal MAX_WAIT detik (dan maksimal MAX_QUEUE request menunggu bersamaan) sebelum ditolak
+# dengan 429 + Retry-After.
+
+# rate = token per detik, burst = kapasitas bucket
+ROLE_LIMITS = getattr(settings, 'LLM_RATE_LIMITS', {
+    'student': {'rate': 10 / 60, 'burst': 5},
+    'teacher': {'rate': 30 / 60, 'burst': 15},
+    'admin': {'rate': 60 / 60, 'burst': 30},
+})
+DEFAULT_LIMIT = ROLE_LIMITS.get('student')
+GLOBAL_LIMIT = getattr(settings, 'LLM_GLOBAL_RATE_LIMIT', {'rate': 10, 'burst': 50})
+MAX_WAIT = getattr(settings, 'LLM_RATE_LIMIT_MAX_WAIT', 5)
+MAX_QUEUE = getattr(settings, 'LLM_RATE_LIMIT_MAX_QUEUE', 50)
+
+# Biaya token: generate dari file jauh lebih mahal dari satu pesan chat
+CHAT_COST = 1
+GENERATION_COST = 5
+
+LOCK_TIMEOUT = 2
+QUEUE_KEY = 'rate-limit:queue'
+# Penunggu dicatat per window waktu; satu request menunggu paling lama MAX_WAIT (+ dua lock bucket),
+# jadi penunggu yang masih hidup selalu ada di window sekarang atau sebelumnya. Hitungan milik
+# worker yang mati di tengah antrian ikut kedaluwarsa bersama window-nya.
+QUEUE_WINDOW = math.ceil(MAX_WAIT + 2 * LOCK_TIMEOUT)
+METRIC_NAMES = ('admitted', 'waited', 'rejected', 'rejected_queue_full')
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Terlalu banyak permintaan AI, coba lagi dalam {retry_after} detik.")
+        self.retry_after = retry_after
+
+
+@contextmanager
+def _bucket_lock(key):
+    """
+    Mutex di cache (cache.add atomik) dengan token unik per pemegang. Jika lock sudah kedaluwarsa
+    dan diambil proses lain, pelepasan tidak menghapus lock milik proses tersebut.
+    """
+    lock_key = f"{key}:lock"
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while not cache.add(lock_key, token, LOCK_TIMEOUT):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Tidak bisa mengunci {key}")
+        time.sleep(0.005)
+    try:
+        yield
+    finally:
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+
+def _buckets(user):
+    limit = ROLE_LIMITS.get(getattr(user, 'role', None), DEFAULT_LIMIT)
+    return [
+        (f"rate-limit:user:{user.pk}", limit),
+        ("rate-limit:global", GLOBAL_LIMIT),
+    ]
+
+
+def try_take(user, cost=CHAT_COST, now=None):
+    """
+    Ambil `cost` token dari bucket user dan bucket global sekaligus.
+    Mengembalikan 0 jika berhasil, atau jumlah detik sampai token cukup.
+    Melempar RateLimited jika lock bucket tidak didapat dalam LOCK_TIMEOUT.
+    """
+    now = now or time.time()
+    buckets = _buckets(user)
+    try:
+        with _bucket_lock(buckets[0][0]), _bucket_lock(buckets[1][0]):
+            return _refill_and_take(buckets, cost, now)
+    except TimeoutError:
+        # Bucket global diperebutkan terlalu lama: dibalas 429, bukan 500
+        logger.warning("Lock rate limit untuk user %s timeout, request ditolak", user.pk)
+        _reject(LOCK_TIMEOUT)
+
+
+def _refill_and_take(buckets, cost, now):
+    states = cache.get_many([key for key, _ in buckets])
+    refilled = {}
+    wait = 0.0
+    for key, limit in buckets:
+        needed = min(cost, limit['burst'])
+        tokens, updated_at = states.get(key, (limit['burst'], now))
+        tokens = min(limit['burst'], tokens + (now - updated_at) * limit['rate'])
+        refilled[key] = (tokens, needed, limit)
+        if tokens < needed:
+            wait = max(wait, (needed - tokens) / limit['rate'])
+
+    if wait:
+        return wait
+    for key, (tokens, needed, limit) in refilled.items():
+        # Bucket yang sudah penuh kembali tidak perlu disimpan lebih lama
+        cache.set(key, (tokens - needed, now), math.ceil(limit['burst'] / limit['rate']) + 1)
+    return 0
+
+
+def _queue_keys(now=None):
+    """Key antrian untuk window sekarang dan window sebelumnya."""
+    window = int((now or time.time()) // QUEUE_WINDOW)
+    return f"{QUEUE_KEY}:{window}", f"{QUEUE_KEY}:{window - 1}"
+
+
+def _queue_depth(now=None):
+    return max(0, sum(cache.get_many(_queue_keys(now)).values()))
+
+
+def _enter_queue():
+    """Catat satu penunggu; mengembalikan (key antrian miliknya, jumlah penunggu termasuk dirinya)."""
+    key, previous = _queue_keys()
+    cache.add(key, 0, 2 * QUEUE_WINDOW)
+    return key, cache.incr(key) + max(0, cache.get(previous, 0))
+
+
+def _leave_queue(key):
+    try:
+        cache.decr(key)
+    except ValueError:
+        # Window sudah kedaluwarsa, hitungannya sudah hilang
+        pass
+
+
+def _reject(wait):
+    counters.incr('rate-limit', 'rejected')
+    raise RateLimited(max(1, math.ceil(wait)))
+
+
+def _wait_in_queue(wait):
+    """Masuk antrian tunggu, atau tolak jika waktu tunggu / antrian melebihi batas."""
+    if wait > MAX_WAIT:
+        _reject(wait)
+    key, depth = _enter_queue()
+    if depth > MAX_QUEUE:
+        _leave_queue(key)
+        counters.incr('rate-limit', 'rejected_queue_full')
+        _reject(wait)
+    counters.incr('rate-limit', 'waited')
+    return key, time.monotonic() + MAX_WAIT
+
+
+def enabled():
+    # Dibaca saat dipanggil agar bisa dimatikan dengan override_settings (mis. benchmark_chat)
+    return getattr(settings, 'LLM_RATE_LIMIT_ENABLED', True)
+
+
+def admit(user, cost=CHAT_COST):
+    """Tunggu (maksimal MAX_WAIT) sampai token tersedia, atau lempar RateLimited."""
+    if not enabled():
+        return
+    wait = try_take(user, cost)
+    if wait:
+        queue_key, deadline = _wait_in_queue(wait)
+        try:
+            while wait:
+                if time.monotonic() + wait > deadline:
+                    _reject(wait)
+                time.sleep(wait)
+                wait = try_take(user, cost)
+        finally:
+            _leave_queue(queue_key)
+    counters.incr('rate-limit', 'admitted')
+
+
+async def aadmit(user, cost=CHAT_COST):
+    """
+    Versi async dari admit(): menunggu dengan asyncio.sleep tanpa menahan event loop.
+    Semua akses cache (bucket, antrian, counter) dijalankan lewat sync_to_async.
+    """
+    if not enabled():
+        return
+    take = sync_to_async(try_take)
+    wait = await take(user, cost)
+    if wait:
+        queue_key, deadline = await sync_to_async(_wait_in_queue)(wait)
+        try:
+            while wait:
+                if time.monotonic() + wait > deadline:
+                    await sync_to_async(_reject)(wait)
+                await asyncio.sleep(wait)
+                wait = await take(user, cost)
+        finally:
+            await sync_to_async(_leave_queue)(queue_key)
+    await sync_to_async(counters.incr)('rate-limit', 'admitted')
+
+
+def metrics():
+    result = counters.read('rate-limit', METRIC_NAMES)
+    result['queue_depth'] = _queue_depth()
+    return result
+
+
+class LLMRateThrottle(BaseThrottle):
+    """Throttle DRF untuk endpoint chat; DRF membalas 429 dengan header Retry-After."""
+    cost = CHAT_COST
+
+    def allow_request(self, request, view):
+        self.retry_after = None
+        if not request.user or not request.user.is_authenticated:
+            return True
+        try:
+            admit(request.user, self.cost)
+        except RateLimited as e:
+            self.retry_after = e.retry_after
+            return False
+        return True
+
+    def wait(self):
+        return self.retry_after
+
+
+class LLMGenerationThrottle(LLMRateThrottle):
+    """Throttle untuk generate materi/kuis dari file."""
+    cost = GENERATION_COST
@@ -0,0 +1,148 @@
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+from api.materials.indexing import class_version
+from api.materials.models import MaterialChunk
+from api.materials.text import tokenize
+
+from .context import estimate_tokens
+
+# Chatbot mode kelas (retrieval-augmented): pertanyaan siswa dijawab berdasarkan materi kelasnya.
+# Potongan Material.content disimpan per materi (api/materials/indexing.py); di sini potongan satu
+# kelas dimuat menjadi indeks BM25 NumPy di memori proses, dan hanya dimuat ulang jika versi indeks
+# kelas (MaterialIndexVersion di database) berubah. Hanya top-k potongan (dalam anggaran token) yang masuk ke prompt.
+
+TOP_K = getattr(settings, 'RAG_TOP_K', 4)
+CONTEXT_TOKEN_BUDGET = getattr(settings, 'RAG_CONTEXT_TOKEN_BUDGET', 1500)
+INDEX_CACHE_SIZE = getattr(settings, 'RAG_INDEX_CACHE_SIZE', 100)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+GROUNDED_PROMPT = """Gunakan potongan materi kelas "{class_name}" di bawah ini sebagai sumber utama jawaban.
+Sebutkan nomor sumber seperti [1] jika memakai isinya. Jika materi tidak membahas pertanyaan ini,
+katakan bahwa materi kelas belum membahasnya, lalu jelaskan secara umum.
+
+{context}
+
+Pertanyaan siswa: {question}"""
+
+
+class ChunkIndex:
+    """Indeks BM25 untuk potongan materi satu kelas: posting list per term dalam array NumPy."""
+
+    def __init__(self, rows):
+        # rows: (id, material_id, judul materi, heading, teks, terms, panjang)
+        self.chunks = [
+            {'id': row[0], 'material_id': row[1], 'title': row[2], 'heading': row[3], 'text': row[4]}
+            for row in rows
+        ]
+        self.lengths = np.array([row[6] for row in rows], dtype=np.float32)
+        self.avgdl = float(self.lengths.mean()) if len(rows) else 0.0
+
+        postings = {}
+        for doc, row in enumerate(rows):
+            for term, tf in row[5].items():
+                postings.setdefault(term, ([], []))
+                postings[term][0].append(doc)
+                postings[term][1].append(tf)
+
+        n = len(rows)
+        self.postings = {}
+        for term, (docs, tfs) in postings.items():
+            df = len(docs)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            self.postings[term] = (np.array(docs, dtype=np.int32), np.array(tfs, dtype=np.float32), idf)
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def search(self, query, k=TOP_K):
+        """[(skor, potongan), ...] terurut skor tertinggi, hanya yang memuat term pertanyaan."""
+        if not self.chunks:
+            return []
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths / self.avgdl)
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            docs, tfs, idf = posting
+            scores[docs] += idf * tfs * (BM25_K1 + 1) / (tfs + norm[docs])
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self.chunks[i]) for i in top if scores[i] > 0]
+
+
+class IndexCache:
+    """Indeks per kelas di memori proses (LRU), dimuat ulang jika versi kelas berubah."""
+
+    def __init__(self, size):
+        self.size = size
+        self._indexes = OrderedDict()   # class_id -> (versi, ChunkIndex)
+        self._lock = threading.Lock()
+
+    def get(self, class_id):
+        version = class_version(class_id)
+        with self._lock:
+            cached = self._indexes.get(class_id)
+            if cached is not None and cached[0] == version:
+                self._indexes.move_to_end(class_id)
+                return cached[1]
+
+        rows = list(
+            MaterialChunk.objects.filter(class_obj_id=class_id)
+            .order_by('material__created_at', 'position')
+            .values_list('id', 'material_id', 'material__title', 'heading', 'text', 'terms', 'length')
+        )
+        index = ChunkIndex(rows)
+        with self._lock:
+            self._indexes[class_id] = (version, index)
+            self._indexes.move_to_end(class_id)
+            while len(self._indexes) > self.size:
+                self._indexes.popitem(last=False)
+        return index
+
+
+index_cache = IndexCache(INDEX_CACHE_SIZE)
+
+
+def retrieve(class_id, question, k=TOP_K):
+    """Potongan materi kelas yang paling relevan, dibatasi CONTEXT_TOKEN_BUDGET."""
+    selected, used = [], 0
+    for _, chunk in index_cache.get(class_id).search(question, k):
+        cost = estimate_tokens(chunk['text'])
+        if selected and used + cost > CONTEXT_TOKEN_BUDGET:
+            break
+        selected.append(chunk)
+        used += cost
+    return selected
+
+
+def grounded_prompt(convo, message):
+    """
+    Prompt untuk pesan `message`: di percakapan mode kelas ditambah potongan materi yang relevan.
+    Mengembalikan (prompt, sumber). History tetap menyimpan pesan asli siswa saja.
+    """
+    if convo.class_obj_id is None:
+        return message, []
+
+    chunks = retrieve(convo.class_obj_id, message)
+    if not chunks:
+        return message, []
+
+    context = "\n\n".join(
+        f"[{i}] {chunk['title']}{' — ' + chunk['heading'] if chunk['heading'] else ''}\n{chunk['text']}"
+        for i, chunk in enumerate(chunks, start=1)
+    )
+    sources = [
+        {'ref': i, 'material_id': chunk['material_id'], 'title': chunk['title'], 'heading': chunk['heading']}
+        for i, chunk in enumerate(chunks, start=1)
+    ]
+    prompt = GROUNDED_PROMPT.format(class_name=convo.class_obj.name, context=context, question=message)
+    return prompt, sources
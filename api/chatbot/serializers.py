@@ -9,7 +9,20 @@ class ChatMessageSerializer(serializers.ModelSerializer):
 
 class ConversationSerializer(serializers.ModelSerializer):
     messages = ChatMessageSerializer(many=True, read_only=True)
+    class_id = serializers.UUIDField(source="class_obj_id", read_only=True, allow_null=True)
 
     class Meta:
         model = Conversation
-        fields = ["id", "title", "created_at", "messages"]
+        fields = ["id", "title", "class_id", "created_at", "messages"]
+
+
+class ConversationListSerializer(serializers.ModelSerializer):
+    """Representasi ringan untuk sidebar: tanpa isi pesan, hanya cuplikan pesan terakhir."""
+    last_message = serializers.CharField(read_only=True, allow_null=True)
+    last_message_at = serializers.DateTimeField(read_only=True, allow_null=True)
+    message_count = serializers.IntegerField(read_only=True)
+    class_id = serializers.UUIDField(source="class_obj_id", read_only=True, allow_null=True)
+
+    class Meta:
+        model = Conversation
+        fields = ["id", "title", "class_id", "created_at", "last_message", "last_message_at", "message_count"]
@@ -1,3 +1,448 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.classes.models import Class
+from api.materials.models import Material, MaterialChunk, MaterialIndexVersion
+from api.users.models import User
+
+from . import context, gemini_service, generation_cache, rate_limit
+from .answer_cache import AnswerCache, is_context_free
+from .gemini_service import aask_gemini, ask_gemini, stream_gemini
+from .models import ChatMessage, Conversation, GenerationCache, LLMCallLog
+from .retrieval import retrieve
+from .views import AsyncChatbotMessageView, AsyncConversationListCreateView
+from .llm_client import CircuitBreaker, FakeProvider, LLMClient, LLMTimeout, LLMUnavailable, ModelProfile, set_llm_client
+
+PROFILE = ModelProfile('test', 'fake-model')
+
+
+class BlockedProvider(FakeProvider):
+    """Provider yang selalu melempar error non-retryable (mis. jawaban diblokir safety filter)."""
+
+    def generate(self, profile, contents, history, timeout, usage):
+        raise ValueError("diblokir")
+
+    async def agenerate(self, profile, contents, history, timeout, usage):
+        raise ValueError("diblokir")
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def open_breaker(self):
+        breaker = CircuitBreaker(failures=1, reset_after=0.01)
+        breaker.failure()
+        time.sleep(0.02)
+        return breaker
+
+    def test_non_retryable_error_on_trial_reopens_breaker(self):
+        breaker = self.open_breaker()
+        client = LLMClient(BlockedProvider(latency=0), breaker=breaker)
+        with self.assertRaises(ValueError):
+            client.generate(PROFILE, "halo")
+        self.assertEqual(breaker.state, 'open')
+
+        # Setelah reset_after, percobaan berikutnya dilewatkan lagi (tidak tertahan di half-open)
+        time.sleep(0.02)
+        client.provider = FakeProvider(latency=0)
+        self.assertTrue(client.generate(PROFILE, "halo"))
+        self.assertEqual(breaker.state, 'closed')
+
+    def test_async_non_retryable_error_on_trial_reopens_breaker(self):
+        breaker = self.open_breaker()
+        client = LLMClient(BlockedProvider(latency=0), breaker=breaker)
+        with self.assertRaises(ValueError):
+            asyncio.run(client.agenerate(PROFILE, "halo"))
+        self.assertEqual(breaker.state, 'open')
+
+    def test_only_one_trial_while_half_open(self):
+        breaker = self.open_breaker()
+        self.assertEqual(breaker.state, 'half-open')
+        self.assertEqual(breaker.allow(), 'half-open')
+        self.assertIsNone(breaker.allow())
+        breaker.end_trial()
+        self.assertEqual(breaker.state, 'open')
+
+    def test_upload_failures_open_breaker(self):
+        client = LLMClient(FakeProvider(latency=0), breaker=CircuitBreaker(failures=2, reset_after=60))
+        with self.assertRaises(ConnectionError):
+            client.upload(f"/tmp/{FakeProvider.FAIL_MARKER}.pdf")
+        with self.assertRaises(LLMTimeout):
+            client.upload(f"/tmp/{FakeProvider.SLOW_MARKER}.pdf", timeout=0.01)
+        self.assertEqual(client.breaker.state, 'open')
+        with self.assertRaises(LLMUnavailable):
+            client.upload("/tmp/materi.pdf")
+
+    def test_rejects_while_open(self):
+        client = LLMClient(FakeProvider(latency=0), breaker=CircuitBreaker(failures=1, reset_after=60))
+        client.breaker.failure()
+        with self.assertRaises(LLMUnavailable):
+            client.generate(PROFILE, "halo")
+
+
+class RetrievalTests(TestCase):
+    def setUp(self):
+        teacher = User.objects.create_user(email='guru@example.com', full_name='Guru', role='teacher', password='pw')
+        self.class_obj = Class.objects.create(name='Fisika', teacher=teacher)
+
+    def test_index_reloads_when_another_process_reindexes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            material = Material.objects.create(class_obj=self.class_obj, title='Optik', content='Cahaya dibiaskan oleh lensa cembung.')
+        self.assertEqual([chunk['material_id'] for chunk in retrieve(self.class_obj.id, 'lensa cembung')], [material.id])
+
+        # Proses lain (mis. worker run_jobs) mengganti potongan tanpa menyentuh cache proses ini
+        MaterialChunk.objects.filter(material=material).update(text='Gaya gesek', terms={'gaya': 1, 'gesek': 1})
+        MaterialIndexVersion.objects.filter(class_obj=self.class_obj).update(version=F('version') + 1)
+
+        self.assertEqual(retrieve(self.class_obj.id, 'lensa cembung'), [])
+        self.assertEqual(retrieve(self.class_obj.id, 'gaya gesek')[0]['text'], 'Gaya gesek')
+
+
+class RateLimitTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='siswa@example.com', full_name='Siswa', password='pw')
+
+    @mock.patch.object(rate_limit, 'LOCK_TIMEOUT', 0.05)
+    def test_lock_timeout_is_rate_limited(self):
+        cache.add('rate-limit:global:lock', 1, 5)
+        self.addCleanup(cache.delete, 'rate-limit:global:lock')
+
+        with self.assertRaises(rate_limit.RateLimited):
+            rate_limit.admit(self.user)
+        with self.assertRaises(rate_limit.RateLimited):
+            asyncio.run(rate_limit.aadmit(self.user))
+
+    def test_lock_release_keeps_lock_taken_by_another_holder(self):
+        with rate_limit._bucket_lock('rate-limit:test'):
+            # Lock kedaluwarsa di tengah jalan dan diambil proses lain
+            cache.set('rate-limit:test:lock', 'token-lain', 5)
+        self.assertEqual(cache.get('rate-limit:test:lock'), 'token-lain')
+        cache.delete('rate-limit:test:lock')
+
+    def test_abandoned_queue_entries_expire(self):
+        now = time.time()
+        self.addCleanup(cache.delete_many, rate_limit._queue_keys(now))
+        with mock.patch.object(rate_limit.time, 'time', return_value=now):
+            rate_limit._enter_queue()  # worker mati tanpa _leave_queue
+            key, depth = rate_limit._enter_queue()
+            self.assertEqual(depth, 2)
+            rate_limit._leave_queue(key)
+            self.assertEqual(rate_limit._queue_depth(), 1)
+        self.assertEqual(rate_limit._queue_depth(now + rate_limit.QUEUE_WINDOW), 1)
+        self.assertEqual(rate_limit._queue_depth(now + 2 * rate_limit.QUEUE_WINDOW), 0)
+
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        self.addCleanup(set_llm_client, None)
+
+    def test_calls_are_logged_with_status(self):
+        set_llm_client(LLMClient(FakeProvider(latency=0)))
+        ask_gemini("Apa itu fotosintesis?", [{'role': 'user', 'parts': ['halo']}])
+        set_llm_client(LLMClient(BlockedProvider(latency=0)))
+        self.assertTrue(ask_gemini("Apa itu sel?", [{'role': 'user', 'parts': ['halo']}]).startswith("Error"))
+
+        ok, failed = LLMCallLog.objects.filter(endpoint='chatbot').order_by('id')
+        self.assertEqual((ok.status, ok.error_class), ('ok', ''))
+        self.assertGreater(ok.prompt_tokens, 0)
+        self.assertEqual((failed.status, failed.error_class), ('error', 'ValueError'))
+
+
+class CountingProvider(FakeProvider):
+    def __init__(self):
+        super().__init__(latency=0)
+        self.calls = 0
+
+    def generate(self, profile, contents, history, timeout, usage):
+        self.calls += 1
+        return super().generate(profile, contents, history, timeout, usage)
+
+    async def agenerate(self, profile, contents, history, timeout, usage):
+        self.calls += 1
+        return await super().agenerate(profile, contents, history, timeout, usage)
+
+
+class AnswerCacheTests(TestCase):
+    def setUp(self):
+        self.provider = CountingProvider()
+        set_llm_client(LLMClient(self.provider))
+        self.addCleanup(set_llm_client, None)
+        patcher = mock.patch.object(gemini_service, 'answer_cache', AnswerCache(10, 60, 0.85))
+        self.cache = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_repeated_question_is_served_from_cache(self):
+        answer = ask_gemini("Apa itu fotosintesis?")
+        self.assertEqual(ask_gemini("apa itu fotosintesis"), answer)
+        self.assertEqual(asyncio.run(aask_gemini("Jelaskan fotosintesis!")), answer)
+        self.assertEqual(self.provider.calls, 1)
+        self.assertEqual(LLMCallLog.objects.filter(cache='hit').count(), 2)
+
+    def test_different_numbers_miss(self):
+        ask_gemini("Hukum Newton 1")
+        ask_gemini("Hukum Newton 2")
+        self.assertEqual(self.provider.calls, 2)
+
+    def test_async_stream_stores_and_hits(self):
+        async def collect(prompt):
+            return "".join([part async for part in stream_gemini(prompt)])
+
+        answer = asyncio.run(collect("Apa itu gravitasi?"))
+        self.assertEqual(asyncio.run(collect("apa itu gravitasi")), answer)
+        self.assertEqual(self.provider.calls, 1)
+
+    def test_only_context_free_questions_use_cache(self):
+        self.assertTrue(is_context_free([]))
+        self.assertTrue(is_context_free([{'role': 'model', 'parts': ['Halo!']}]))
+        history = [{'role': 'user', 'parts': ['Kita bahas biologi']}, {'role': 'model', 'parts': ['Baik']}]
+        self.assertFalse(is_context_free(history))
+
+        ask_gemini("Apa itu sel?")
+        ask_gemini("Apa itu sel?", history)
+        teacher = User.objects.create_user(email='guru@example.com', full_name='Guru', role='teacher', password='pw')
+        ask_gemini("Apa itu sel?", class_id=Class.objects.create(name='Biologi', teacher=teacher).id)
+        self.assertEqual(self.provider.calls, 3)
+        self.assertEqual(len(self.cache), 1)
+
+
+@mock.patch.object(context, 'HISTORY_TOKEN_BUDGET', 100)
+class ChatHistoryTests(TestCase):
+    def setUp(self):
+        self.provider = CountingProvider()
+        set_llm_client(LLMClient(self.provider))
+        self.addCleanup(set_llm_client, None)
+        user = User.objects.create_user(email='siswa@example.com', full_name='Siswa', password='pw')
+        self.convo = Conversation.objects.create(user=user)
+
+    def add_messages(self, count):
+        # Setiap pesan ~24 token: anggaran 100 memuat 4 pesan, dipangkas ke 2 (60% anggaran)
+        return [
+            ChatMessage.objects.create(conversation=self.convo, role='user' if i % 2 == 0 else 'bot', content=f'{i:02d}' + 'x' * 78)
+            for i in range(count)
+        ]
+
+    def test_short_history_is_sent_whole(self):
+        messages = self.add_messages(3)
+        history = context.build_history(self.convo, before_id=messages[-1].id + 1)
+        self.assertEqual([item['parts'][0] for item in history], [m.content for m in messages])
+        self.assertEqual([item['role'] for item in history], ['user', 'model', 'user'])
+        self.assertEqual(self.provider.calls, 0)
+
+    def test_overflow_is_folded_into_summary(self):
+        messages = self.add_messages(10)
+        history = context.build_history(self.convo, before_id=messages[-1].id + 1)
+
+        self.convo.refresh_from_db()
+        self.assertEqual(self.convo.summary_until, messages[7].id)
+        self.assertTrue(self.convo.summary.startswith('[summary:'))
+        self.assertEqual(history[0]['parts'][0], f"Ringkasan percakapan kita sebelumnya:\n{self.convo.summary}")
+        self.assertEqual([item['parts'][0] for item in history[2:]], [m.content for m in messages[8:]])
+        self.assertEqual(self.provider.calls, 1)
+
+        # Giliran berikutnya tanpa pesan baru memakai ringkasan yang sama
+        context.build_history(self.convo, before_id=messages[-1].id + 1)
+        self.assertEqual(self.provider.calls, 1)
+
+    def test_async_history_matches_sync(self):
+        messages = self.add_messages(10)
+        # async_to_sync: query ORM async berjalan di thread utama (koneksi transaksi tes)
+        history = async_to_sync(context.abuild_history)(self.convo, before_id=messages[-1].id + 1)
+        self.assertEqual(len(history), 4)
+        self.assertEqual(Conversation.objects.get(id=self.convo.id).summary_until, messages[7].id)
+
+
+class GenerationCacheTests(TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+        self.calls = 0
+
+    def write(self, name, content=b'isi materi'):
+        path = os.path.join(self.tempdir, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def generate(self, result='hasil'):
+        def run():
+            self.calls += 1
+            return result
+        return run
+
+    def test_same_content_and_params_hit(self):
+        params = {'prompt_version': 1, 'model': 'm'}
+        first = generation_cache.cached_generation('material', self.write('a.pdf'), params, self.generate())
+        # Nama file berbeda, isi sama
+        second = generation_cache.cached_generation('material', self.write('b.pdf'), params, self.generate('lain'))
+        self.assertEqual((first, second, self.calls), ('hasil', 'hasil', 1))
+        self.assertEqual(GenerationCache.objects.get().hits, 1)
+
+        generation_cache.cached_generation('material', self.write('a.pdf'), {**params, 'prompt_version': 2}, self.generate())
+        generation_cache.cached_generation('material', self.write('c.pdf', b'isi lain'), params, self.generate())
+        self.assertEqual(self.calls, 3)
+
+    def test_failures_and_expired_entries_are_not_served(self):
+        path = self.write('a.pdf')
+
+        def fail():
+            raise ValueError("kuota habis")
+
+        with self.assertRaises(ValueError):
+            generation_cache.cached_generation('quiz', path, {}, fail)
+        self.assertFalse(GenerationCache.objects.exists())
+
+        generation_cache.cached_generation('quiz', path, {}, self.generate())
+        GenerationCache.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        generation_cache.cached_generation('quiz', path, {}, self.generate())
+        self.assertEqual(self.calls, 2)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        path = self.write('a.pdf')
+        with mock.patch.object(generation_cache, 'CACHE_MAX_BYTES', 30):
+            for n in range(3):
+                generation_cache.cached_generation('quiz', path, {'n': n}, self.generate('x' * 10))
+        # Tiap hasil 12 byte JSON: hanya dua entri terbaru yang muat
+        self.assertEqual(GenerationCache.objects.count(), 2)
+        generation_cache.cached_generation('quiz', path, {'n': 0}, self.generate())
+        self.assertEqual(self.calls, 4)
+
+
+class ConversationApiTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='siswa@example.com', full_name='Siswa', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def make_conversation(self, messages):
+        convo = Conversation.objects.create(user=self.user, title='Fisika')
+        ChatMessage.objects.bulk_create([
+            ChatMessage(conversation=convo, role='user' if i % 2 == 0 else 'bot', content=f'Pesan {i} ' + 'x' * 150)
+            for i in range(messages)
+        ])
+        return convo
+
+    def test_list_is_light_and_query_count_is_flat(self):
+        self.make_conversation(3)
+        with CaptureQueriesContext(connection) as few:
+            response = self.client.get('/api/chatbot/conversations/')
+        item = response.data[0]
+        self.assertNotIn('messages', item)
+        self.assertEqual(item['message_count'], 3)
+        self.assertEqual(item['last_message'], ('Pesan 2 ' + 'x' * 150)[:100])
+
+        for _ in range(5):
+            self.make_conversation(4)
+        with CaptureQueriesContext(connection) as many:
+            self.assertEqual(len(self.client.get('/api/chatbot/conversations/').data), 6)
+        self.assertEqual(len(few.captured_queries), len(many.captured_queries))
+
+    def test_messages_are_paginated_newest_first(self):
+        convo = self.make_conversation(5)
+        url = f'/api/chatbot/conversations/{convo.id}/messages/'
+        first = self.client.get(url, {'page_size': 3}).data
+        second = self.client.get(first['next']).data
+        contents = [m['content'][:7] for m in first['results'] + second['results']]
+        self.assertEqual(contents, [f'Pesan {i}' for i in range(4, -1, -1)])
+        self.assertIsNone(second['next'])
+
+        other = User.objects.create_user(email='lain@example.com', full_name='Lain', password='pw')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+def parse_sse(body):
+    events = []
+    for block in body.strip().split('\n\n'):
+        event, data = block.split('\n', 1)
+        events.append((event.removeprefix('event: '), json.loads(data.removeprefix('data: '))))
+    return events
+
+
+# Admission control punya tes sendiri; di sini bucket bersama tidak boleh ikut terpakai tes lain
+@override_settings(LLM_RATE_LIMIT_ENABLED=False)
+class ChatStreamTests(TestCase):
+    def setUp(self):
+        set_llm_client(LLMClient(FakeProvider(latency=0), max_retries=0))
+        self.addCleanup(set_llm_client, None)
+        self.user = User.objects.create_user(email='siswa@example.com', full_name='Siswa', password='pw')
+        self.convo = Conversation.objects.create(user=self.user)
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    async def post_stream(self, message):
+        response = await self.async_client.post(
+            f'/api/chatbot/conversations/{self.convo.id}/message/stream/',
+            {'message': message}, content_type='application/json', headers=self.headers,
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return parse_sse(''.join([chunk.decode() async for chunk in response.streaming_content]))
+
+    async def test_answer_is_streamed_then_saved(self):
+        events = await self.post_stream('Apa itu gaya?')
+        names = [name for name, _ in events]
+        self.assertEqual((names[0], names[-1]), ('user_message', 'done'))
+        self.assertGreater(names.count('chunk'), 1)
+
+        answer = ''.join(data['text'] for name, data in events if name == 'chunk')
+        bot_message = events[-1][1]['bot_message']
+        self.assertEqual(bot_message['content'], answer)
+        saved = await ChatMessage.objects.filter(conversation=self.convo, role='bot').aget()
+        self.assertEqual(saved.content, answer)
+
+    async def test_provider_error_is_sent_as_event(self):
+        events = await self.post_stream(f'Halo {FakeProvider.FAIL_MARKER}')
+        self.assertEqual([name for name, _ in events], ['user_message', 'error', 'done'])
+        self.assertTrue(events[-1][1]['bot_message']['content'].startswith('Error:'))
+
+    async def test_requires_authentication(self):
+        response = await self.async_client.post(
+            f'/api/chatbot/conversations/{self.convo.id}/message/stream/', {'message': 'halo'}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 401)
+
+
+@override_settings(LLM_RATE_LIMIT_ENABLED=False)
+class AsyncChatViewTests(TestCase):
+    def setUp(self):
+        set_llm_client(LLMClient(FakeProvider(latency=0)))
+        self.addCleanup(set_llm_client, None)
+        self.user = User.objects.create_user(email='siswa@example.com', full_name='Siswa', password='pw')
+        self.factory = AsyncRequestFactory()
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    def post(self, data, authenticated=True):
+        return self.factory.post('/', data, content_type='application/json', headers=self.headers if authenticated else {})
+
+    async def test_create_list_and_send_message(self):
+        conversations = AsyncConversationListCreateView.as_view()
+        response = await conversations(self.post({'title': 'Biologi'}))
+        self.assertEqual(response.status_code, 201)
+        conversation_id = json.loads(response.content)['conversation_id']
+
+        response = await AsyncChatbotMessageView.as_view()(self.post({'message': 'Apa itu sel?'}), conversation_id=conversation_id)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(data['user_message']['content'], 'Apa itu sel?')
+        self.assertTrue(data['bot_message']['content'])
+
+        listing = json.loads((await conversations(self.factory.get('/', headers=self.headers))).content)
+        self.assertEqual([(c['title'], c['message_count']) for c in listing], [('Biologi', 3)])
+
+    async def test_errors(self):
+        view = AsyncChatbotMessageView.as_view()
+        self.assertEqual((await view(self.post({'message': 'halo'}, authenticated=False), conversation_id=1)).status_code, 401)
+        self.assertEqual((await view(self.post({}), conversation_id=1)).status_code, 400)
+        self.assertEqual((await view(self.post({'message': 'halo'}), conversation_id=999)).status_code, 404)
@@ -1,12 +1,27 @@
+from django.conf import settings
 from django.urls import path
 from .views import (
     ConversationListCreateView,
     ChatbotMessageView,
-    ConversationDetailView
+    ChatbotMessageStreamView,
+    ConversationDetailView,
+    ConversationMessagesView,
+    AsyncConversationListCreateView,
+    AsyncChatbotMessageView,
 )
 
+# Mode async (server ASGI): daftar percakapan & kirim pesan memakai view async
+if settings.CHATBOT_ASYNC_VIEWS:
+    conversation_list_view = AsyncConversationListCreateView.as_view()
+    message_view = AsyncChatbotMessageView.as_view()
+else:
+    conversation_list_view = ConversationListCreateView.as_view()
+    message_view = ChatbotMessageView.as_view()
+
 urlpatterns = [
-    path("conversations/", ConversationListCreateView.as_view()),
+    path("conversations/", conversation_list_view),
     path("conversations/<int:conversation_id>/", ConversationDetailView.as_view()),
-    path("conversations/<int:conversation_id>/message/", ChatbotMessageView.as_view()),
+    path("conversations/<int:conversation_id>/messages/", ConversationMessagesView.as_view()),
+    path("conversations/<int:conversation_id>/message/", message_view),
+    path("conversations/<int:conversation_id>/message/stream/", ChatbotMessageStreamView.as_view()),
 ]
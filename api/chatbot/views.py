@@ -1,30 +1,122 @@
+import logging
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Substr
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
 
+from api.async_views import authenticate_async, sse_event
+from api.classes.models import Class
 from .models import Conversation, ChatMessage
-from .serializers import ConversationSerializer, ChatMessageSerializer
-from .gemini_service import ask_gemini
+from .serializers import ConversationSerializer, ConversationListSerializer, ChatMessageSerializer
+from .pagination import MessageCursorPagination
+from .gemini_service import aask_gemini, ask_gemini, stream_gemini
+from .context import abuild_history, build_history
+from .rate_limit import LLMRateThrottle, RateLimited, aadmit
+from .retrieval import grounded_prompt
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_LENGTH = 100
+
+
+def save_user_message(convo, message):
+    """Simpan pesan user dan kembalikan (pesan, history chat sebelumnya dalam format Gemini)."""
+    user_msg = ChatMessage.objects.create(
+        conversation=convo,
+        role="user",
+        content=message
+    )
+
+    # Pesan terbaru dalam anggaran token + ringkasan pesan lama (lihat context.py)
+    history = build_history(convo, before_id=user_msg.id)
+    return user_msg, history
+
+
+async def asave_user_message(convo, message):
+    """Versi async dari save_user_message."""
+    user_msg = await ChatMessage.objects.acreate(
+        conversation=convo,
+        role="user",
+        content=message
+    )
+    history = await abuild_history(convo, before_id=user_msg.id)
+    return user_msg, history
+
+
+def conversation_list(user):
+    # Cuplikan & waktu pesan terakhir serta jumlah pesan dihitung di query yang sama
+    last_message = ChatMessage.objects.filter(conversation=OuterRef('pk')).order_by('-id')
+    return (
+        Conversation.objects.filter(user=user)
+        .annotate(
+            message_count=Count('messages'),
+            last_message=Subquery(last_message.annotate(preview=Substr('content', 1, PREVIEW_LENGTH)).values('preview')[:1]),
+            last_message_at=Subquery(last_message.values('timestamp')[:1]),
+        )
+        .order_by("-created_at")
+    )
+
+
+def welcome_text(user, class_obj=None):
+    if class_obj is not None:
+        return (
+            f"Hallo, {user.full_name or 'User'}! Saya Guruku AI. Di percakapan ini saya menjawab "
+            f"berdasarkan materi kelas {class_obj.name}. Tanyakan apa saja tentang materinya!"
+        )
+    return f"Hallo, {user.full_name or 'User'}! Saya Guruku AI, siap membantu belajarmu. Tanyakan apa saja!"
+
+
+def member_class(user, class_id):
+    """Kelas yang diajar atau diikuti user, atau None."""
+    try:
+        return Class.objects.filter(Q(teacher=user) | Q(students=user), id=class_id).distinct().first()
+    except (ValueError, ValidationError):
+        return None
+
+
+async def admit_async(user):
+    """Admission control untuk view async; mengembalikan respons 429 jika ditolak."""
+    try:
+        await aadmit(user)
+    except RateLimited as e:
+        response = JsonResponse({"detail": str(e)}, status=429)
+        response["Retry-After"] = str(e.retry_after)
+        return response
+    return None
 
 
 class ConversationListCreateView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        conversations = Conversation.objects.filter(user=request.user).order_by("-created_at")
-        serializer = ConversationSerializer(conversations, many=True)
+        serializer = ConversationListSerializer(conversation_list(request.user), many=True)
         return Response(serializer.data)
 
     def post(self, request):
         title = request.data.get("title", "Percakapan Baru")
-        convo = Conversation.objects.create(user=request.user, title=title)
+
+        # class_id opsional: percakapan mode kelas, dijawab berdasarkan materi kelas tersebut
+        class_obj = None
+        if request.data.get("class_id"):
+            class_obj = member_class(request.user, request.data["class_id"])
+            if class_obj is None:
+                return Response({"error": "Class not found"}, status=404)
+
+        convo = Conversation.objects.create(user=request.user, title=title, class_obj=class_obj)
 
         # Create welcome message
-        welcome_text = f"Hallo, {request.user.full_name or 'User'}! Saya Guruku AI, siap membantu belajarmu. Tanyakan apa saja!"
         ChatMessage.objects.create(
             conversation=convo,
             role="bot",
-            content=welcome_text
+            content=welcome_text(request.user, class_obj)
         )
 
         return Response({"conversation_id": convo.id}, status=status.HTTP_201_CREATED)
@@ -32,6 +124,8 @@ class ConversationListCreateView(APIView):
 
 class ChatbotMessageView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    # Batas panggilan Gemini per user & global (lihat rate_limit.py)
+    throttle_classes = [LLMRateThrottle]
 
     def post(self, request, conversation_id):
         message = request.data.get("message")
@@ -39,26 +133,17 @@ class ChatbotMessageView(APIView):
             return Response({"error": "Message is required"}, status=400)
 
         try:
-            convo = Conversation.objects.get(id=conversation_id, user=request.user)
+            convo = Conversation.objects.select_related("class_obj").get(id=conversation_id, user=request.user)
         except Conversation.DoesNotExist:
             return Response({"error": "Conversation not found"}, status=404)
 
-        # Simpan pesan user
-        user_msg = ChatMessage.objects.create(
-            conversation=convo,
-            role="user",
-            content=message
-        )
+        user_msg, history = save_user_message(convo, message)
 
-        # Ambil history chat sebelumnya (kecuali pesan barusan)
-        previous_messages = ChatMessage.objects.filter(conversation=convo).exclude(id=user_msg.id).order_by('timestamp')
-        history = []
-        for msg in previous_messages:
-            role = "user" if msg.role == "user" else "model"
-            history.append({"role": role, "parts": [msg.content]})
+        # Mode kelas: hanya potongan materi yang relevan ikut dikirim (lihat retrieval.py)
+        prompt, sources = grounded_prompt(convo, message)
 
         # Panggil Gemini API dengan history
-        bot_answer = ask_gemini(message, history)
+        bot_answer = ask_gemini(prompt, history, class_id=convo.class_obj_id)
 
         # Simpan jawaban bot
         bot_msg = ChatMessage.objects.create(
@@ -70,9 +155,145 @@ class ChatbotMessageView(APIView):
         return Response({
             "user_message": ChatMessageSerializer(user_msg).data,
             "bot_message": ChatMessageSerializer(bot_msg).data,
+            "sources": sources,
         }, status=200)
 
 
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncConversationListCreateView(View):
+    """Versi async ConversationListCreateView (jalankan lewat ASGI, aktif jika CHATBOT_ASYNC_VIEWS=True)."""
+
+    async def get(self, request):
+        user, _, error = await authenticate_async(request)
+        if error is not None:
+            return error
+        conversations = [convo async for convo in conversation_list(user)]
+        return JsonResponse(ConversationListSerializer(conversations, many=True).data, safe=False)
+
+    async def post(self, request):
+        user, data, error = await authenticate_async(request)
+        if error is not None:
+            return error
+
+        class_obj = None
+        if data.get("class_id"):
+            class_obj = await sync_to_async(member_class)(user, data["class_id"])
+            if class_obj is None:
+                return JsonResponse({"error": "Class not found"}, status=404)
+
+        convo = await Conversation.objects.acreate(user=user, title=data.get("title", "Percakapan Baru"), class_obj=class_obj)
+        await ChatMessage.objects.acreate(
+            conversation=convo,
+            role="bot",
+            content=welcome_text(user, class_obj)
+        )
+        return JsonResponse({"conversation_id": convo.id}, status=201)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncChatbotMessageView(View):
+    """
+    Versi async ChatbotMessageView: ORM async dan client LLM async, sehingga satu proses ASGI
+    bisa melayani ratusan chat yang sedang menunggu Gemini.
+    """
+
+    async def post(self, request, conversation_id):
+        user, data, error = await authenticate_async(request)
+        if error is not None:
+            return error
+
+        message = data.get("message")
+        if not message:
+            return JsonResponse({"error": "Message is required"}, status=400)
+
+        convo = await Conversation.objects.select_related("class_obj").filter(id=conversation_id, user=user).afirst()
+        if convo is None:
+            return JsonResponse({"error": "Conversation not found"}, status=404)
+
+        error = await admit_async(user)
+        if error is not None:
+            return error
+
+        user_msg, history = await asave_user_message(convo, message)
+        prompt, sources = await sync_to_async(grounded_prompt)(convo, message)
+        bot_answer = await aask_gemini(prompt, history, class_id=convo.class_obj_id)
+        bot_msg = await ChatMessage.objects.acreate(
+            conversation=convo,
+            role="bot",
+            content=bot_answer
+        )
+
+        return JsonResponse({
+            "user_message": ChatMessageSerializer(user_msg).data,
+            "bot_message": ChatMessageSerializer(bot_msg).data,
+            "sources": sources,
+        }, status=200)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class ChatbotMessageStreamView(View):
+    """
+    Versi streaming ChatbotMessageView lewat Server-Sent Events (jalankan dengan server ASGI, config/asgi.py).
+    Event: `user_message`, `sources` (mode kelas), `chunk` (potongan jawaban), `error`, lalu `done` berisi pesan bot yang tersimpan.
+    """
+
+    async def post(self, request, conversation_id):
+        user, data, error = await authenticate_async(request)
+        if error is not None:
+            return error
+
+        message = data.get("message")
+        if not message:
+            return JsonResponse({"error": "Message is required"}, status=400)
+
+        convo = await Conversation.objects.select_related("class_obj").filter(id=conversation_id, user=user).afirst()
+        if convo is None:
+            return JsonResponse({"error": "Conversation not found"}, status=404)
+
+        error = await admit_async(user)
+        if error is not None:
+            return error
+
+        user_msg, history = await asave_user_message(convo, message)
+        prompt, sources = await sync_to_async(grounded_prompt)(convo, message)
+
+        response = StreamingHttpResponse(
+            self.stream(convo, user_msg, prompt, history, sources),
+            content_type="text/event-stream",
+        )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"  # nginx tidak boleh menahan buffer SSE
+        return response
+
+    async def stream(self, convo, user_msg, prompt, history, sources):
+        yield sse_event("user_message", ChatMessageSerializer(user_msg).data)
+        if sources:
+            yield sse_event("sources", sources)
+
+        parts = []
+        bot_msg = None
+        try:
+            try:
+                async for text in stream_gemini(prompt, history, class_id=convo.class_obj_id):
+                    parts.append(text)
+                    yield sse_event("chunk", {"text": text})
+            except Exception as e:
+                logger.exception("Streaming Gemini gagal untuk percakapan %s", convo.id)
+                if not parts:
+                    parts.append(f"Error: {str(e)}")
+                yield sse_event("error", {"error": str(e)})
+        finally:
+            # Jawaban disimpan setelah stream selesai (juga sebagian jika client memutus koneksi)
+            if parts:
+                bot_msg = await ChatMessage.objects.acreate(
+                    conversation=convo,
+                    role="bot",
+                    content="".join(parts)
+                )
+
+        yield sse_event("done", {"bot_message": ChatMessageSerializer(bot_msg).data if bot_msg else None})
+
+
 class ConversationDetailView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -85,3 +306,17 @@ class ConversationDetailView(APIView):
         serializer = ConversationSerializer(convo)
         return Response(serializer.data)
 
+
+class ConversationMessagesView(APIView):
+    """Pesan percakapan per halaman (cursor), terbaru lebih dulu."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, conversation_id):
+        if not Conversation.objects.filter(id=conversation_id, user=request.user).exists():
+            return Response({"error": "Conversation not found"}, status=404)
+
+        paginator = MessageCursorPagination()
+        page = paginator.paginate_queryset(
+            ChatMessage.objects.filter(conversation_id=conversation_id), request, view=self
+        )
+        return paginator.get_paginated_response(ChatMessageSerializer(page, many=True).data)
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import ClassListCreateView, ClassJoinView, ClassDetailView, ClassStudentsView, ClassAnnouncementListCreateView, ClassLeaveView
+from .views import ClassListCreateView, ClassJoinView, ClassDetailView, ClassStudentsView, ClassAnnouncementListCreateView, ClassLeaveView, ClassLeaderboardView
 
 urlpatterns = [
     path('', ClassListCreateView.as_view(), name='class-list-create'),
@@ -8,4 +8,5 @@ urlpatterns = [
     path('<uuid:pk>/students/', ClassStudentsView.as_view(), name='class-students'),
     path('<uuid:pk>/announcements/', ClassAnnouncementListCreateView.as_view(), name='class-announcements'),
     path('<uuid:pk>/leave/', ClassLeaveView.as_view(), name='class-leave'),
+    path('<uuid:pk>/leaderboard/', ClassLeaderboardView.as_view(), name='class-leaderboard'),
 ]
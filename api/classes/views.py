@@ -4,6 +4,7 @@ from rest_framework import status, permissions
 from .models import Class
 from .serializers import ClassSerializer, AnnouncementSerializer
 from django.shortcuts import get_object_or_404
+from api.quizzes.leaderboard import get_class_board, leaderboard_payload, parse_limit
 
 
 class ClassListCreateView(APIView):
@@ -125,6 +126,24 @@ class ClassStudentsView(APIView):
         return Response(data)
 
 
+class ClassLeaderboardView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        class_obj = get_object_or_404(Class, pk=pk)
+
+        is_teacher = class_obj.teacher == request.user
+        is_student = class_obj.students.filter(id=request.user.id).exists()
+        if not (is_teacher or is_student):
+             return Response({"error": "Anda tidak memiliki akses ke kelas ini."}, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            limit = parse_limit(request.query_params.get('limit'))
+        except ValueError:
+            return Response({"error": "limit harus berupa angka"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(leaderboard_payload(get_class_board(class_obj.id), request.user, limit))
+
+
 class ClassAnnouncementListCreateView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
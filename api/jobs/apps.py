@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class JobsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'api.jobs'
+
+    def ready(self):
+        # Setiap app mendaftarkan handler job-nya di modul <app>/jobs.py
+        autodiscover_modules('jobs')
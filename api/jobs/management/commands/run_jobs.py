@@ -0,0 +1,51 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from api.jobs.worker import claim_jobs, requeue_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = "Worker untuk menjalankan background job (mis. generate kuis dari file dengan Gemini)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Jumlah thread worker")
+        parser.add_argument('--poll-interval', type=float, default=2.0, help="Jeda (detik) saat antrian kosong")
+        parser.add_argument('--kind', action='append', dest='kinds', help="Hanya jalankan job dengan kind ini (boleh berulang)")
+        parser.add_argument('--stale-minutes', type=int, default=30, help="Job running lebih lama dari ini dikembalikan ke antrian saat start")
+        parser.add_argument('--once', action='store_true', help="Habiskan antrian lalu berhenti")
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        poll_interval = options['poll_interval']
+        kinds = options['kinds']
+
+        requeued = requeue_stale_jobs(timedelta(minutes=options['stale_minutes']))
+        if requeued:
+            self.stdout.write(f"{requeued} job tertinggal dikembalikan ke antrian.")
+
+        self.stdout.write(f"Worker berjalan dengan {workers} thread.")
+        running = set()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            try:
+                while True:
+                    free = workers - len(running)
+                    job_ids = claim_jobs(free, kinds) if free else []
+                    for job_id in job_ids:
+                        running.add(pool.submit(run_job, job_id))
+
+                    if not running:
+                        if options['once']:
+                            break
+                        time.sleep(poll_interval)
+                        continue
+
+                    done, running = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                    running = set(running)
+                    for future in done:
+                        if future.exception():
+                            self.stderr.write(f"Worker error: {future.exception()}")
+            except KeyboardInterrupt:
+                self.stdout.write("Menunggu job yang sedang berjalan selesai...")
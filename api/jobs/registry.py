@@ -0,0 +1,19 @@
+_handlers = {}
+
+
+def register(kind):
+    """
+    Dekorator untuk mendaftarkan handler job.
+    Handler menerima objek Job dan mengembalikan hasil yang bisa disimpan sebagai JSON.
+    """
+    def decorator(func):
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+def get_handler(kind):
+    try:
+        return _handlers[kind]
+    except KeyError:
+        raise LookupError(f"Handler job '{kind}' tidak terdaftar.")
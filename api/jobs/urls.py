@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import JobStatusView, JobResultView
+
+urlpatterns = [
+    path('<uuid:job_id>/', JobStatusView.as_view(), name='job-status'),
+    path('<uuid:job_id>/result/', JobResultView.as_view(), name='job-result'),
+]
@@ -0,0 +1,42 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status, permissions
+from django.shortcuts import get_object_or_404
+
+from .models import Job
+from .serializers import JobSerializer
+
+
+def get_job_for_user(user, job_id):
+    job = get_object_or_404(Job, id=job_id)
+    if job.created_by_id != user.id and getattr(user, 'role', None) != 'admin':
+        return None
+    return job
+
+
+class JobStatusView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = get_job_for_user(request.user, job_id)
+        if job is None:
+            return Response({"detail": "Not authorized."}, status=status.HTTP_403_FORBIDDEN)
+        return Response(JobSerializer(job).data)
+
+
+class JobResultView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = get_job_for_user(request.user, job_id)
+        if job is None:
+            return Response({"detail": "Not authorized."}, status=status.HTTP_403_FORBIDDEN)
+
+        if job.status == Job.STATUS_DONE:
+            return Response({"status": job.status, "result": job.result}, status=status.HTTP_200_OK)
+        if job.status == Job.STATUS_FAILED:
+            # Request ini sendiri berhasil; kegagalan job dibaca client dari field status/error
+            return Response({"status": job.status, "error": job.error}, status=status.HTTP_200_OK)
+
+        # Belum selesai, client diminta polling lagi
+        return Response({"status": job.status}, status=status.HTTP_202_ACCEPTED)
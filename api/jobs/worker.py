@@ -0,0 +1,64 @@
+import logging
+
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+from .registry import get_handler
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(kind, payload=None, file=None, user=None):
+    """Buat job baru berstatus pending. Worker (manage.py run_jobs) akan mengambilnya."""
+    return Job.objects.create(kind=kind, payload=payload or {}, file=file, created_by=user)
+
+
+def claim_jobs(limit, kinds=None):
+    """
+    Ambil hingga `limit` job pending dan tandai sebagai running.
+    SKIP LOCKED membuat beberapa proses worker bisa berjalan bersamaan tanpa mengambil job yang sama.
+    """
+    with transaction.atomic():
+        queryset = Job.objects.select_for_update(skip_locked=True).filter(status=Job.STATUS_PENDING)
+        if kinds:
+            queryset = queryset.filter(kind__in=kinds)
+        ids = list(queryset.order_by('created_at').values_list('id', flat=True)[:limit])
+        if ids:
+            Job.objects.filter(id__in=ids).update(
+                status=Job.STATUS_RUNNING, started_at=timezone.now(), attempts=F('attempts') + 1
+            )
+    return ids
+
+
+def requeue_stale_jobs(older_than):
+    """Kembalikan job 'running' yang tertinggal (mis. worker mati) ke antrian."""
+    cutoff = timezone.now() - older_than
+    return Job.objects.filter(status=Job.STATUS_RUNNING, started_at__lt=cutoff).update(
+        status=Job.STATUS_PENDING, started_at=None
+    )
+
+
+def run_job(job_id):
+    """Jalankan satu job di thread worker dan simpan hasil atau error-nya."""
+    close_old_connections()
+    try:
+        job = Job.objects.get(id=job_id)
+        try:
+            handler = get_handler(job.kind)
+            job.result = handler(job)
+            job.status = Job.STATUS_DONE
+            job.error = ''
+        except Exception as e:
+            logger.exception("Job %s (%s) gagal", job.id, job.kind)
+            job.status = Job.STATUS_FAILED
+            job.error = str(e)
+
+        job.finished_at = timezone.now()
+        if job.file:
+            job.file.delete(save=False)
+        job.save()
+    finally:
+        close_old_connections()
+
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class MaterialsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api.materials'
+
+    def ready(self):
+        # Indeks potongan materi diperbarui setiap materi disimpan/dihapus
+        from . import signals  # noqa: F401
@@ -0,0 +1,109 @@
+from django.db import transaction
+from django.db.models import F
+
+from .models import MaterialChunk, MaterialIndexVersion, MaterialSearchDoc, MaterialTerm
+from .text import chunk_content, term_counts
+
+# Indeks materi diperbarui secara incremental: hanya materi yang disimpan/dihapus yang diproses ulang.
+# - potongan per kelas untuk chatbot mode kelas; versi indeks kelasnya (di database) dinaikkan agar
+#   setiap proses memuat ulang indeks kelas itu saja (lihat api/chatbot/retrieval.py)
+# - indeks terbalik term -> materi untuk pencarian materi (lihat search.py)
+
+# Term di judul dihitung beberapa kali agar materi yang judulnya cocok berperingkat lebih tinggi
+TITLE_WEIGHT = 3
+MAX_TERM_LENGTH = 64
+
+
+def class_version(class_id):
+    """Versi indeks kelas; berubah setiap materi kelas diindeks ulang atau dihapus."""
+    return class_versions([class_id])[class_id]
+
+
+def class_versions(class_ids):
+    """{class_id: versi} untuk banyak kelas sekaligus (satu query)."""
+    found = dict(MaterialIndexVersion.objects.filter(class_obj_id__in=class_ids).values_list('class_obj_id', 'version'))
+    return {class_id: found.get(class_id, 0) for class_id in class_ids}
+
+
+def bump_class_version(class_id, create=True):
+    # Ikut transaksi perubahan indeks: proses lain melihat versi baru tepat saat potongan baru ter-commit
+    if MaterialIndexVersion.objects.filter(class_obj_id=class_id).update(version=F('version') + 1):
+        return
+    if create:
+        _, created = MaterialIndexVersion.objects.get_or_create(class_obj_id=class_id, defaults={'version': 1})
+        if not created:
+            MaterialIndexVersion.objects.filter(class_obj_id=class_id).update(version=F('version') + 1)
+
+
+def _search_rows(material):
+    """Posting list & statistik dokumen satu materi untuk indeks pencarian."""
+    counts = term_counts(material.content)
+    for term, tf in term_counts(material.title).items():
+        counts[term] += tf * TITLE_WEIGHT
+
+    length = sum(counts.values())
+    terms = [
+        MaterialTerm(term=term, material=material, class_obj_id=material.class_obj_id, tf=tf, length=length)
+        for term, tf in counts.items()
+        if len(term) <= MAX_TERM_LENGTH
+    ]
+    return terms, MaterialSearchDoc(material=material, class_obj_id=material.class_obj_id, length=length)
+
+
+def _chunk_rows(material):
+    chunks = []
+    for position, (heading, text) in enumerate(chunk_content(material.content)):
+        counts = term_counts(f"{material.title} {heading} {text}")
+        if counts:
+            chunks.append(MaterialChunk(
+                material=material,
+                class_obj_id=material.class_obj_id,
+                position=position,
+                heading=heading[:255],
+                text=text,
+                terms=dict(counts),
+                length=sum(counts.values()),
+            ))
+    return chunks
+
+
+def index_materials(materials):
+    """
+    Proses ulang sekumpulan materi: ganti potongan, posting list dan statistik dokumennya
+    dalam satu transaksi, sehingga pembaca tidak pernah melihat indeks yang setengah terhapus.
+    Mengembalikan jumlah potongan yang dibuat.
+    """
+    with transaction.atomic():
+        material_ids = [material.pk for material in materials]
+        affected = set(MaterialChunk.objects.filter(material_id__in=material_ids).values_list('class_obj_id', flat=True).distinct())
+        MaterialChunk.objects.filter(material_id__in=material_ids).delete()
+        MaterialTerm.objects.filter(material_id__in=material_ids).delete()
+        MaterialSearchDoc.objects.filter(material_id__in=material_ids).delete()
+
+        chunks, terms, docs = [], [], []
+        for material in materials:
+            material_terms, doc = _search_rows(material)
+            terms.extend(material_terms)
+            docs.append(doc)
+            chunks.extend(_chunk_rows(material))
+            affected.add(material.class_obj_id)
+
+        MaterialChunk.objects.bulk_create(chunks, batch_size=1000)
+        MaterialTerm.objects.bulk_create(terms, batch_size=1000)
+        MaterialSearchDoc.objects.bulk_create(docs, batch_size=1000)
+
+        # Urutan tetap agar dua transaksi indexing tidak saling deadlock di baris versi
+        for class_id in sorted(affected, key=str):
+            bump_class_version(class_id)
+        return len(chunks)
+
+
+def index_material(material):
+    """Potong ulang isi satu materi dan perbarui indeks pencariannya."""
+    return index_materials([material])
+
+
+def remove_material(material):
+    # Potongan & posting list ikut terhapus (CASCADE), cukup naikkan versi indeks kelasnya.
+    # Tanpa membuat baris versi baru: kelasnya bisa jadi sedang ikut dihapus.
+    bump_class_version(material.class_obj_id, create=False)
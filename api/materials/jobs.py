@@ -0,0 +1,55 @@
+import mimetypes
+
+from django.db import transaction
+
+from api.chatbot.gemini_service import generate_material_content
+from api.jobs.registry import register
+from api.jobs.worker import enqueue
+from .models import Material
+
+GENERATE_CONTENT = 'material.generate_content'
+
+
+def enqueue_generation(material, user=None):
+    """Tandai materi pending dan antrikan job generate konten dari file-nya (dijalankan manage.py run_jobs)."""
+    mime_type, _ = mimetypes.guess_type(material.file.name)
+    # Job dan tautannya di materi commit bersamaan: worker yang mengambil job sebelum
+    # generation_job tersimpan akan menganggapnya job lama dan melewatinya
+    with transaction.atomic():
+        job = enqueue(
+            GENERATE_CONTENT,
+            payload={'material_id': str(material.id), 'mime_type': mime_type},
+            user=user,
+        )
+        material.generation_status = Material.GENERATION_PENDING
+        material.generation_error = ''
+        material.generation_job = job
+        material.save(update_fields=['generation_status', 'generation_error', 'generation_job'])
+    return job
+
+
+@register(GENERATE_CONTENT)
+def generate_content_job(job):
+    material = Material.objects.get(id=job.payload['material_id'])
+    # Job lama (mis. sudah di-retry) tidak boleh menimpa status job terbaru
+    current = Material.objects.filter(id=material.id, generation_job_id=job.id)
+    if not current.update(generation_status=Material.GENERATION_RUNNING):
+        return {'material_id': str(material.id), 'skipped': True}
+
+    try:
+        content = generate_material_content(
+            material.file.path,
+            job.payload.get('mime_type'),
+            class_id=material.class_obj_id,
+            raise_errors=True,
+        )
+    except Exception as e:
+        current.update(generation_status=Material.GENERATION_FAILED, generation_error=str(e))
+        raise
+
+    material.content = content
+    material.generation_status = Material.GENERATION_DONE
+    material.generation_error = ''
+    # content ikut di update_fields, jadi indeks materi diperbarui lewat signal
+    material.save(update_fields=['content', 'generation_status', 'generation_error'])
+    return {'material_id': str(material.id), 'characters': len(content)}
@@ -0,0 +1,88 @@
+import time
+import uuid
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from api.classes.models import Class
+from api.materials.indexing import index_materials
+from api.materials.models import Material
+from api.materials.search import search_materials
+from api.users.models import User
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark latency pencarian materi (indeks terbalik + BM25) dengan materi sintetis."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--materials', type=int, default=20000, help="Jumlah materi sintetis")
+        parser.add_argument('--classes', type=int, default=20, help="Jumlah kelas (semua diikuti siswa benchmark)")
+        parser.add_argument('--words', type=int, default=300, help="Jumlah kata per materi")
+        parser.add_argument('--vocabulary', type=int, default=20000, help="Jumlah kata unik")
+        parser.add_argument('--queries', type=int, default=200, help="Jumlah pencarian yang diukur")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        # Semua data benchmark dibuat di dalam transaksi lalu di-rollback
+        try:
+            with transaction.atomic():
+                self._bench(options)
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+    def _bench(self, options):
+        rng = np.random.default_rng(options['seed'])
+        vocabulary = np.array([f"kata{i}" for i in range(options['vocabulary'])])
+        # Frekuensi kata mengikuti distribusi Zipf seperti teks alami
+        weights = 1 / np.arange(1, len(vocabulary) + 1)
+        weights /= weights.sum()
+
+        suffix = uuid.uuid4().hex[:8]
+        teacher = User.objects.create_user(email=f"bench-t-{suffix}@example.com", full_name="Bench Teacher", role='teacher')
+        student = User.objects.create_user(email=f"bench-s-{suffix}@example.com", full_name="Bench Student")
+        classes = [Class.objects.create(name=f"Bench {i}", teacher=teacher) for i in range(options['classes'])]
+        for class_obj in classes:
+            class_obj.students.add(student)
+
+        started = time.perf_counter()
+        words = rng.choice(len(vocabulary), size=(options['materials'], options['words']), p=weights)
+        materials = Material.objects.bulk_create([
+            Material(
+                class_obj=classes[i % len(classes)],
+                title=" ".join(vocabulary[row[:3]]),
+                content="\n\n".join(" ".join(vocabulary[part]) for part in np.array_split(row, 5)),
+            )
+            for i, row in enumerate(words)
+        ], batch_size=1000)
+        for start in range(0, len(materials), 500):
+            index_materials(materials[start:start + 500])
+        self.stdout.write(f"{len(materials)} materi dibuat & diindeks dalam {time.perf_counter() - started:.1f} s")
+
+        class_ids = [class_obj.id for class_obj in classes]
+        # Pertanyaan 1-3 kata dari kata yang cukup umum sampai jarang
+        queries = [
+            " ".join(vocabulary[rng.integers(10, min(len(vocabulary), 5000), size=rng.integers(1, 4))])
+            for _ in range(options['queries'])
+        ]
+        timings, results, queries_per_search = [], 0, 0
+        # Log query saat indexing sudah penuh, kosongkan agar jumlah query per pencarian terhitung
+        connection.queries_log.clear()
+        for query in queries:
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                results += len(search_materials(class_ids, query))
+                timings.append((time.perf_counter() - start) * 1000)
+            queries_per_search = len(ctx.captured_queries)
+
+        p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+        self.stdout.write(f"{'searches':>9} {'queries':>8} {'avg hits':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        self.stdout.write(
+            f"{len(timings):>9} {queries_per_search:>8} {results / len(timings):>9.1f} {p50:>8.2f} {p95:>8.2f} {p99:>8.2f}"
+        )
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.materials.indexing import index_materials
+from api.materials.models import Material
+
+
+class Command(BaseCommand):
+    help = "Bangun ulang indeks materi: potongan untuk chatbot kelas & indeks pencarian (mis. untuk materi lama)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--class-id', action='append', dest='class_ids', help="Hanya materi kelas ini (boleh diulang)")
+        parser.add_argument('--batch-size', type=int, default=200, help="Jumlah materi per transaksi")
+
+    def handle(self, *args, **options):
+        materials = Material.objects.order_by('created_at')
+        if options['class_ids']:
+            materials = materials.filter(class_obj_id__in=options['class_ids'])
+
+        started = time.perf_counter()
+        count = chunks = 0
+        batch = []
+        for material in materials.iterator():
+            batch.append(material)
+            if len(batch) >= options['batch_size']:
+                chunks += self._index(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            chunks += self._index(batch)
+            count += len(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f"{count} materi diindeks ({chunks} potongan, {time.perf_counter() - started:.2f} s)"
+        ))
+
+    def _index(self, batch):
+        with transaction.atomic():
+            return index_materials(batch)
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.25 on 2026-10-18 10:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0003_announcement'),
+        ('materials', '0002_alter_material_content_alter_material_file_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaterialChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('heading', models.CharField(blank=True, max_length=255)),
+                ('text', models.TextField()),
+                ('terms', models.JSONField(default=dict, help_text='term -> frekuensi')),
+                ('length', models.PositiveIntegerField(default=0)),
+                ('class_obj', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='material_chunks', to='classes.class')),
+                ('material', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='materials.material')),
+            ],
+            options={
+                'ordering': ['material', 'position'],
+            },
+        ),
+    ]
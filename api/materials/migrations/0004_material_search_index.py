@@ -0,0 +1,37 @@
+# Generated by Django 4.2.25 on 2026-10-18 11:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0003_announcement'),
+        ('materials', '0003_materialchunk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaterialSearchDoc',
+            fields=[
+                ('material', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_doc', serialize=False, to='materials.material')),
+                ('length', models.PositiveIntegerField(default=0)),
+                ('class_obj', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='material_search_docs', to='classes.class')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MaterialTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('tf', models.PositiveIntegerField()),
+                ('length', models.PositiveIntegerField(default=0)),
+                ('class_obj', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='material_terms', to='classes.class')),
+                ('material', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='materials.material')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'class_obj', 'material', 'tf', 'length'], name='materials_m_term_19cf44_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.25 on 2026-10-18 11:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0003_announcement'),
+        ('materials', '0005_material_generation_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaterialIndexVersion',
+            fields=[
+                ('class_obj', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='material_index_version', serialize=False, to='classes.class')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
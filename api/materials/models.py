@@ -19,12 +19,27 @@ def unique_video_path(instance, filename):
     return os.path.join('materials/videos/', filename)
 
 class Material(models.Model):
+    # Status generate konten dari file oleh worker (lihat api/materials/jobs.py)
+    GENERATION_PENDING = 'pending'
+    GENERATION_RUNNING = 'running'
+    GENERATION_DONE = 'done'
+    GENERATION_FAILED = 'failed'
+    GENERATION_STATUS_CHOICES = (
+        (GENERATION_PENDING, 'Pending'),
+        (GENERATION_RUNNING, 'Running'),
+        (GENERATION_DONE, 'Done'),
+        (GENERATION_FAILED, 'Failed'),
+    )
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     class_obj = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='materials')
     title = models.CharField(max_length=200)
     content = models.TextField(help_text="Rich text content (HTML)", blank=True, null=True) # Content can be generated
     video_file = models.FileField(upload_to=unique_video_path, blank=True, null=True)
     file = models.FileField(upload_to=unique_file_path, blank=True, null=True)
+    generation_status = models.CharField(max_length=20, choices=GENERATION_STATUS_CHOICES, default=GENERATION_DONE)
+    generation_error = models.TextField(blank=True, default='')
+    generation_job = models.ForeignKey('jobs.Job', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -41,3 +56,65 @@ class MaterialProgress(models.Model):
 
     def __str__(self):
         return f"{self.student.username} - {self.material.title} - {'Completed' if self.is_completed else 'In Progress'}"
+
+
+class MaterialChunk(models.Model):
+    """
+    Potongan Material.content beserta frekuensi term-nya, diperbarui setiap materi disimpan.
+    Dipakai chatbot mode kelas untuk mengambil bagian materi yang relevan (api/chatbot/retrieval.py).
+    """
+    material = models.ForeignKey(Material, on_delete=models.CASCADE, related_name='chunks')
+    class_obj = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='material_chunks')
+    position = models.PositiveIntegerField()
+    heading = models.CharField(max_length=255, blank=True)
+    text = models.TextField()
+    terms = models.JSONField(default=dict, help_text="term -> frekuensi")
+    length = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['material', 'position']
+
+    def __str__(self):
+        return f"{self.material.title} #{self.position}"
+
+
+class MaterialSearchDoc(models.Model):
+    """Statistik dokumen untuk pencarian BM25 (panjang materi dalam jumlah term), lihat api/materials/search.py."""
+    material = models.OneToOneField(Material, on_delete=models.CASCADE, primary_key=True, related_name='search_doc')
+    class_obj = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='material_search_docs')
+    length = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.material_id} ({self.length} term)"
+
+
+class MaterialTerm(models.Model):
+    """
+    Posting list indeks terbalik: term -> materi beserta frekuensinya. Panjang materi disalin ke
+    setiap posting agar skor BM25 cukup dihitung dari index (term, kelas, materi, tf, panjang) tanpa join.
+    """
+    term = models.CharField(max_length=64)
+    material = models.ForeignKey(Material, on_delete=models.CASCADE, related_name='search_terms')
+    class_obj = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='material_terms')
+    tf = models.PositiveIntegerField()
+    length = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['term', 'class_obj', 'material', 'tf', 'length']),
+        ]
+
+    def __str__(self):
+        return f"{self.term} -> {self.material_id} ({self.tf})"
+
+
+class MaterialIndexVersion(models.Model):
+    """
+    Versi indeks materi per kelas, naik di transaksi yang sama dengan perubahan indeksnya.
+    Disimpan di database (bukan cache) agar proses lain (mis. worker run_jobs) ikut membatalkan indeks di memori.
+    """
+    class_obj = models.OneToOneField(Class, on_delete=models.CASCADE, primary_key=True, related_name='material_index_version')
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.class_obj_id} v{self.version}"
@@ -0,0 +1,205 @@
+import hashlib
+import math
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, Count, ExpressionWrapper, F, FloatField, Max, Sum, Value, When
+from django.utils.html import escape, strip_tags
+
+from .indexing import MAX_TERM_LENGTH, class_versions
+from .models import Material, MaterialSearchDoc, MaterialTerm
+from .text import tokenize
+
+# Pencarian full-text materi dengan indeks terbalik (MaterialTerm, diperbarui di indexing.py) dan
+# peringkat BM25. Skor dihitung di database dari index (term, kelas, materi, tf, panjang) sehingga
+# posting list tidak perlu dibaca ke Python dan tanpa scan LIKE '%...%'. Statistik BM25
+# (jumlah materi, total panjang, df per term) di-cache per kumpulan kelas & versi indeksnya, jadi
+# otomatis dihitung ulang setelah materi kelas berubah. Cuplikan <mark> hanya dibuat untuk hasil yang dikembalikan.
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_QUERY_TERMS = 10
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 50
+SNIPPET_CHARS = 200
+# Term yang ada di lebih dari 30% materi dianggap umum (lihat _rank)
+COMMON_TERM_RATIO = 0.3
+# Jumlah kandidat dari term jarang = limit * CANDIDATE_FACTOR
+CANDIDATE_FACTOR = 5
+STATS_TTL = getattr(settings, 'MATERIAL_SEARCH_STATS_TTL', 60 * 60)
+
+_markdown = re.compile(r'[#*_`>|~]+|\$\$?|!?\[([^\]]*)\]\([^)]*\)')
+
+
+def query_terms(query):
+    return list(dict.fromkeys(term for term in tokenize(query) if len(term) <= MAX_TERM_LENGTH))[:MAX_QUERY_TERMS]
+
+
+def _plain_text(content):
+    text = content or ''
+    if '<' in text:
+        # strip_tags cukup lambat, hanya untuk materi HTML dari editor
+        text = strip_tags(text)
+    text = _markdown.sub(lambda m: m.group(1) or ' ', text)
+    return ' '.join(text.split())
+
+
+def _term_pattern(terms):
+    return re.compile(r'(?<![0-9a-z])(' + '|'.join(map(re.escape, terms)) + r')(?![0-9a-z])', re.IGNORECASE)
+
+
+def make_snippet(content, pattern, size=SNIPPET_CHARS):
+    """Cuplikan `size` karakter dengan kecocokan term terbanyak, term ditandai <mark> (HTML di-escape)."""
+    text = _plain_text(content)
+    matches = [(m.start(), m.end()) for m in pattern.finditer(text)]
+
+    start = 0
+    if matches:
+        # Jendela dengan jumlah kecocokan terbanyak (two pointer atas posisi kecocokan)
+        best, right = 0, 0
+        for left in range(len(matches)):
+            while right < len(matches) and matches[right][1] - matches[left][0] <= size:
+                right += 1
+            if right - left > best:
+                best, start = right - left, matches[left][0]
+        start = max(0, start - size // 5)
+        if start:
+            start = text.find(' ', start) + 1 or start
+    end = min(len(text), start + size)
+    if end < len(text):
+        space = text.rfind(' ', start, end)
+        end = space if space > start else end
+
+    pieces, cursor = [], start
+    for match_start, match_end in matches:
+        if match_start < start or match_end > end:
+            continue
+        pieces.append(escape(text[cursor:match_start]))
+        pieces.append(f"<mark>{escape(text[match_start:match_end])}</mark>")
+        cursor = match_end
+    pieces.append(escape(text[cursor:end]))
+    return ('…' if start > 0 else '') + ''.join(pieces) + ('…' if end < len(text) else '')
+
+
+def _scope(class_ids):
+    """Kunci cache untuk sekumpulan kelas pada versi indeksnya saat ini."""
+    versions = class_versions(sorted(set(class_ids)))
+    return hashlib.md5(','.join(f"{class_id}:{version}" for class_id, version in versions.items()).encode()).hexdigest()
+
+
+def _doc_stats(class_ids, scope):
+    """(jumlah materi, total panjang) di kelas-kelas tersebut."""
+    key = f"materials:search:{scope}:docs"
+    stats = cache.get(key)
+    if stats is None:
+        row = MaterialSearchDoc.objects.filter(class_obj_id__in=class_ids).aggregate(docs=Count('pk'), total=Sum('length'))
+        stats = (row['docs'], row['total'] or 0)
+        cache.set(key, stats, STATS_TTL)
+    return stats
+
+
+def _saturation(avgdl):
+    """Bagian BM25 per posting tanpa idf: tf * (k1 + 1) / (tf + k1 * (1 - b + b * panjang / rata-rata panjang))."""
+    norm = Value(BM25_K1 * (1 - BM25_B)) + Value(BM25_K1 * BM25_B / avgdl) * F('length')
+    return ExpressionWrapper(F('tf') * Value(BM25_K1 + 1) / (F('tf') + norm), output_field=FloatField())
+
+
+def _term_stats(class_ids, scope, terms, avgdl):
+    """{term: (jumlah materi yang memuat term, nilai _saturation terbesar)} di kelas-kelas tersebut."""
+    keys = {term: f"materials:search:{scope}:term:{term}" for term in terms}
+    found = cache.get_many(keys.values())
+    stats = {term: found[key] for term, key in keys.items() if key in found}
+    missing = [term for term in terms if term not in stats]
+    if missing:
+        rows = MaterialTerm.objects.filter(term__in=missing, class_obj_id__in=class_ids).values('term').annotate(
+            df=Count('pk'), peak=Max(_saturation(avgdl))
+        )
+        fresh = {term: (0, 0.0) for term in missing}
+        fresh.update({row['term']: (row['df'], row['peak']) for row in rows})
+        cache.set_many({keys[term]: value for term, value in fresh.items()}, STATS_TTL)
+        stats.update(fresh)
+    return stats
+
+
+def _top_scores(idf, avgdl, class_ids, limit, material_ids=None):
+    """[(material_id, skor), ...] tertinggi dari posting list term-term di `idf`, dihitung di database."""
+    if len(idf) == 1:
+        weight = Value(next(iter(idf.values())))
+    else:
+        weight = Case(*[When(term=term, then=Value(value)) for term, value in idf.items()], output_field=FloatField())
+    score = ExpressionWrapper(weight * _saturation(avgdl), output_field=FloatField())
+
+    postings = MaterialTerm.objects.filter(term__in=list(idf), class_obj_id__in=class_ids)
+    if material_ids is not None:
+        postings = postings.filter(material_id__in=material_ids)
+    if len(idf) == 1:
+        # Satu term = satu posting per materi, tanpa GROUP BY
+        rows = postings.annotate(score=score)
+    else:
+        rows = postings.values('material_id').annotate(score=Sum(score))
+    return list(rows.order_by('-score', 'material_id').values_list('material_id', 'score')[:limit])
+
+
+def _rank(idf, stats, docs, avgdl, class_ids, limit):
+    """
+    Top-`limit` materi untuk pertanyaan. Posting list term umum (ada di banyak materi, idf kecil) paling
+    mahal dijumlahkan, jadi dipakai cara MaxScore: kandidat diambil dari term yang lebih jarang, skor
+    lengkap hanya dihitung untuk kandidat. Hasilnya pasti sama dengan menjumlahkan semua posting jika
+    materi di luar kandidat (skor term jarang <= kandidat terakhir, ditambah skor maksimum term umum)
+    tidak bisa melewati hasil ke-`limit`; jika tidak, hitung ulang dengan semua posting.
+    """
+    ordered = sorted(idf, key=idf.get)
+    common = [term for term in ordered[:-1] if stats[term][0] > docs * COMMON_TERM_RATIO]
+    if not common:
+        return _top_scores(idf, avgdl, class_ids, limit)
+
+    rare = {term: idf[term] for term in ordered if term not in common}
+    candidates = _top_scores(rare, avgdl, class_ids, limit * CANDIDATE_FACTOR)
+    top = _top_scores(idf, avgdl, class_ids, limit, material_ids=[material_id for material_id, _ in candidates])
+    bound = sum(idf[term] * stats[term][1] for term in common)
+    if len(candidates) == limit * CANDIDATE_FACTOR:
+        bound += candidates[-1][1]
+    if len(top) == limit and top[-1][1] > bound:
+        return top
+    return _top_scores(idf, avgdl, class_ids, limit)
+
+
+def search_materials(class_ids, query, limit=DEFAULT_LIMIT):
+    """[{id, title, class_id, class_name, created_at, score, snippet}, ...] terurut skor BM25."""
+    terms = query_terms(query)
+    if not terms or not class_ids:
+        return []
+
+    scope = _scope(class_ids)
+    docs, total = _doc_stats(class_ids, scope)
+    avgdl = total / max(docs, 1) or 1.0
+    stats = _term_stats(class_ids, scope, terms, avgdl)
+    idf = {
+        term: math.log(1 + (docs - count + 0.5) / (count + 0.5))
+        for term, (count, _) in stats.items() if count
+    }
+    if not idf:
+        return []
+
+    top = _rank(idf, stats, docs, avgdl, class_ids, limit)
+    materials = Material.objects.select_related('class_obj').only(
+        'id', 'title', 'content', 'created_at', 'class_obj__id', 'class_obj__name'
+    ).in_bulk([material_id for material_id, _ in top])
+
+    pattern = _term_pattern(terms)
+    results = []
+    for material_id, score in top:
+        material = materials.get(material_id)
+        if material is None:
+            continue
+        results.append({
+            'id': material.id,
+            'title': material.title,
+            'class_id': material.class_obj.id,
+            'class_name': material.class_obj.name,
+            'created_at': material.created_at,
+            'score': round(score, 4),
+            'snippet': make_snippet(material.content, pattern),
+        })
+    return results
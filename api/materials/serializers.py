@@ -6,8 +6,11 @@ class MaterialSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Material
-        fields = ['id', 'class_obj', 'title', 'content', 'video_file', 'file', 'created_at', 'is_completed']
-        read_only_fields = ['id', 'created_at', 'class_obj']
+        fields = [
+            'id', 'class_obj', 'title', 'content', 'video_file', 'file', 'created_at', 'is_completed',
+            'generation_status', 'generation_error',
+        ]
+        read_only_fields = ['id', 'created_at', 'class_obj', 'generation_status', 'generation_error']
 
     def get_is_completed(self, obj):
         user = self.context['request'].user
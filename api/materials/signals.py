@@ -0,0 +1,23 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .indexing import index_material, remove_material
+from .models import Material
+
+# Field yang memengaruhi isi indeks materi
+INDEXED_FIELDS = {'content', 'title', 'class_obj'}
+
+
+@receiver(post_save, sender=Material)
+def reindex_material(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not INDEXED_FIELDS.intersection(update_fields):
+        return
+    # Diindeks setelah commit: transaksi yang di-rollback tidak meninggalkan indeks,
+    # dan gagal indexing (dicatat log) tidak membatalkan penyimpanan materi
+    transaction.on_commit(lambda: index_material(instance), robust=True)
+
+
+@receiver(post_delete, sender=Material)
+def unindex_material(sender, instance, **kwargs):
+    remove_material(instance)
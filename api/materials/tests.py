@@ -1,3 +1,123 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.chatbot.llm_client import FakeProvider, LLMClient, set_llm_client
+from api.classes.models import Class
+from api.jobs.models import Job
+from api.jobs.worker import claim_jobs, run_job
+from api.users.models import User
+from .jobs import enqueue_generation
+from .models import Material
+from .search import search_materials
+
+
+class MaterialSearchTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(email='guru@example.com', full_name='Guru', role='teacher', password='pw')
+        self.class_obj = Class.objects.create(name='Biologi', teacher=self.teacher)
+        self.other_class = Class.objects.create(name='Lain', teacher=self.teacher)
+
+    def add(self, title, content, class_obj=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Material.objects.create(class_obj=class_obj or self.class_obj, title=title, content=content)
+
+    def test_bm25_ranking(self):
+        focused = self.add('Fotosintesis', 'Fotosintesis terjadi di daun. Klorofil menyerap cahaya untuk fotosintesis.')
+        passing = self.add('Biologi umum', 'Fotosintesis disebut sekali. ' + 'Hewan bernapas dengan paru-paru dan insang. ' * 20)
+        cell = self.add('Sel', 'Sel memiliki membran dan inti sel.')
+        self.add('Fotosintesis', 'Fotosintesis fotosintesis fotosintesis.', class_obj=self.other_class)
+
+        results = search_materials([self.class_obj.id], 'fotosintesis')
+        self.assertEqual([r['id'] for r in results], [focused.id, passing.id])
+        self.assertGreater(results[0]['score'], results[1]['score'])
+
+        # Istilah langka (membran) lebih berbobot daripada istilah yang muncul di beberapa materi
+        results = search_materials([self.class_obj.id], 'membran fotosintesis')
+        self.assertEqual(results[0]['id'], cell.id)
+
+    def test_reindex_on_update(self):
+        material = self.add('Optik', 'Lensa cembung membiaskan cahaya.')
+        material.content = 'Gaya gesek memperlambat benda.'
+        with self.captureOnCommitCallbacks(execute=True):
+            material.save(update_fields=['content'])
+
+        self.assertEqual(search_materials([self.class_obj.id], 'lensa'), [])
+        self.assertEqual([r['id'] for r in search_materials([self.class_obj.id], 'gesek')], [material.id])
+
+    def test_search_endpoint_is_scoped_to_member_classes(self):
+        self.add('Fotosintesis', 'Fotosintesis di daun.', class_obj=self.other_class)
+        student = User.objects.create_user(email='siswa@example.com', full_name='Siswa', password='pw')
+        self.class_obj.students.add(student)
+        client = APIClient()
+        client.force_authenticate(student)
+
+        response = client.get('/api/materials/search/', {'q': 'fotosintesis'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 0)
+        self.assertEqual(client.get('/api/materials/search/', {'q': 'daun', 'class_id': 'x'}).status_code, 400)
+
+
+class FailingProvider(FakeProvider):
+    def generate(self, profile, contents, history, timeout, usage):
+        raise ValueError("kuota habis")
+
+
+class MaterialGenerationJobTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(set_llm_client, None)
+
+        self.teacher = User.objects.create_user(email='guru@example.com', full_name='Guru', role='teacher', password='pw')
+        self.class_obj = Class.objects.create(name='Biologi', teacher=self.teacher)
+        self.material = Material.objects.create(
+            class_obj=self.class_obj, title='Sel',
+            file=SimpleUploadedFile('sel.pdf', b'%PDF-1.4 sel', content_type='application/pdf'),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def run_jobs(self):
+        for job_id in claim_jobs(10):
+            run_job(job_id)
+
+    def test_generation_fills_content(self):
+        set_llm_client(LLMClient(FakeProvider(latency=0)))
+        job = enqueue_generation(self.material, user=self.teacher)
+        self.run_jobs()
+
+        self.material.refresh_from_db()
+        self.assertEqual(self.material.generation_status, Material.GENERATION_DONE)
+        self.assertTrue(self.material.content)
+        self.assertEqual(Job.objects.get(id=job.id).status, Job.STATUS_DONE)
+
+    def test_llm_error_marks_generation_failed(self):
+        set_llm_client(LLMClient(FailingProvider(latency=0)))
+        job = enqueue_generation(self.material, user=self.teacher)
+        self.run_jobs()
+
+        self.assertEqual(Job.objects.get(id=job.id).status, Job.STATUS_FAILED)
+        response = self.client.get(f'/api/materials/{self.material.id}/generation/')
+        self.assertEqual(response.data['generation_status'], Material.GENERATION_FAILED)
+        self.assertIn('kuota habis', response.data['generation_error'])
+
+        # Yang gagal bisa diantrikan ulang oleh guru kelas
+        set_llm_client(LLMClient(FakeProvider(latency=0)))
+        self.assertEqual(self.client.post(f'/api/materials/{self.material.id}/generation/retry/').status_code, 202)
+        self.run_jobs()
+        self.material.refresh_from_db()
+        self.assertEqual(self.material.generation_status, Material.GENERATION_DONE)
+
+    def test_job_is_not_committed_without_material_link(self):
+        with mock.patch.object(Material, 'save', side_effect=RuntimeError("db putus")):
+            with self.assertRaises(RuntimeError):
+                enqueue_generation(self.material, user=self.teacher)
+        self.assertFalse(Job.objects.exists())
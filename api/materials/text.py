@@ -0,0 +1,78 @@
+import re
+import unicodedata
+from collections import Counter
+
+from django.utils.html import strip_tags
+
+# Teks materi (Markdown hasil generate atau HTML dari editor) untuk indeks pencarian:
+# normalisasi, tokenisasi, dan pemotongan per bagian (heading/paragraf).
+
+# Kata umum Bahasa Indonesia (dan sedikit Inggris) yang tidak membantu pencarian
+STOPWORDS = frozenset(
+    'yang dan di ke dari ini itu untuk dengan pada adalah dalam tidak akan juga atau oleh karena '
+    'sebagai ada bisa dapat agar jika maka saat setelah sebelum para serta telah sudah masih hanya '
+    'lebih sangat kita kami kamu anda saya dia mereka nya pun lah kah apa apakah bagaimana mengapa '
+    'kenapa siapa kapan dimana mana berapa tolong jelaskan sebutkan tentang mengenai yaitu yakni '
+    'the of and to in is are for on with as by an be this that it or from at'.split()
+)
+
+CHUNK_WORDS = 180
+CHUNK_OVERLAP = 30
+
+_heading = re.compile(r'^\s{0,3}#{1,6}\s+(.*)$')
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', strip_tags(str(text or ''))).encode('ascii', 'ignore').decode('ascii')
+    return text.lower()
+
+
+def tokenize(text):
+    """Token pencarian: huruf kecil, tanpa aksen & tanda baca, tanpa stopword."""
+    return [word for word in re.findall(r'[a-z0-9]+', normalize(text)) if (len(word) > 1 or word.isdigit()) and word not in STOPWORDS]
+
+
+def term_counts(text):
+    return Counter(tokenize(text))
+
+
+def _blocks(content):
+    """(heading, paragraf) per blok yang dipisahkan baris kosong."""
+    heading = ''
+    for block in re.split(r'\n\s*\n', strip_tags(content or '')):
+        lines = []
+        for line in block.strip().splitlines():
+            match = _heading.match(line)
+            if match:
+                heading = match.group(1).strip(' #*')
+            else:
+                lines.append(line.strip())
+        text = ' '.join(line for line in lines if line)
+        if text:
+            yield heading, text
+
+
+def chunk_content(content, chunk_words=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    """
+    Potong isi materi menjadi [(heading, teks), ...] berukuran sekitar `chunk_words` kata.
+    Paragraf di bawah heading yang sama digabung; paragraf yang terlalu panjang dipotong
+    dengan overlap agar kalimat di batas potongan tetap bisa ditemukan.
+    """
+    chunks = []
+    current_heading, current = None, []
+
+    def flush():
+        if current:
+            chunks.append((current_heading or '', ' '.join(current)))
+
+    for heading, text in _blocks(content):
+        words = text.split()
+        if heading != current_heading or len(current) + len(words) > chunk_words:
+            flush()
+            current_heading, current = heading, []
+        while len(words) > chunk_words:
+            chunks.append((heading, ' '.join(words[:chunk_words])))
+            words = words[chunk_words - overlap:]
+        current.extend(words)
+    flush()
+    return chunks
@@ -1,9 +1,16 @@
 from django.urls import path
-from .views import MaterialListCreateView, MaterialDetailView, MarkMaterialCompleteView, GenerateMaterialContentView
+from .views import (
+    MaterialListCreateView, MaterialDetailView, MarkMaterialCompleteView, GenerateMaterialContentView, MaterialSearchView,
+    MaterialGenerationView, MaterialGenerationRetryView, MaterialGenerationStreamView,
+)
 
 urlpatterns = [
     path('class/<uuid:class_id>/', MaterialListCreateView.as_view(), name='material-list-create'),
+    path('search/', MaterialSearchView.as_view(), name='material-search'),
     path('<uuid:pk>/', MaterialDetailView.as_view(), name='material-detail'),
     path('<uuid:material_id>/complete/', MarkMaterialCompleteView.as_view(), name='material-complete'),
+    path('<uuid:material_id>/generation/', MaterialGenerationView.as_view(), name='material-generation'),
+    path('<uuid:material_id>/generation/retry/', MaterialGenerationRetryView.as_view(), name='material-generation-retry'),
+    path('<uuid:material_id>/generation/stream/', MaterialGenerationStreamView.as_view(), name='material-generation-stream'),
     path('generate-content/', GenerateMaterialContentView.as_view(), name='material-generate-content'),
 ]
@@ -6,7 +6,22 @@ from .serializers import MaterialSerializer, MaterialProgressSerializer
 from api.classes.models import Class
 from django.shortcuts import get_object_or_404
 from api.chatbot.gemini_service import generate_material_content
-import mimetypes
+from api.chatbot.rate_limit import GENERATION_COST, LLMGenerationThrottle, RateLimited, admit
+from api.chatbot.instrumentation import resolve_class_id
+from api.async_views import authenticate_async, sse_event
+from .jobs import enqueue_generation
+from .search import DEFAULT_LIMIT, MAX_LIMIT, search_materials
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+import asyncio
+import time
+
+GENERATION_POLL_INTERVAL = getattr(settings, 'MATERIAL_GENERATION_POLL_INTERVAL', 1)
+GENERATION_STREAM_TIMEOUT = getattr(settings, 'MATERIAL_GENERATION_STREAM_TIMEOUT', 10 * 60)
 
 class MaterialListCreateView(generics.ListCreateAPIView):
     serializer_class = MaterialSerializer
@@ -16,25 +31,133 @@ class MaterialListCreateView(generics.ListCreateAPIView):
         class_id = self.kwargs['class_id']
         return Material.objects.filter(class_obj__id=class_id).order_by('created_at')
 
+    def get_throttles(self):
+        # Upload file tanpa konten akan di-generate lewat Gemini
+        if self.request.method == 'POST' and self.request.FILES.get('file') and not self.request.data.get('content'):
+            return [LLMGenerationThrottle()]
+        return super().get_throttles()
+
     def perform_create(self, serializer):
         class_id = self.kwargs['class_id']
         class_obj = get_object_or_404(Class, id=class_id)
-        
-        # Save first to get the file path
         instance = serializer.save(class_obj=class_obj)
-        
-        # If file is present and content is empty, generate content
+
+        # Konten dari file di-generate worker (manage.py run_jobs), client memantau generation_status
         if instance.file and not instance.content:
-            try:
-                file_path = instance.file.path
-                mime_type, _ = mimetypes.guess_type(file_path)
-                generated_content = generate_material_content(file_path, mime_type)
-                instance.content = generated_content
-                instance.save()
-            except Exception as e:
-                print(f"Error generating content: {e}")
-                # Fallback or keep content empty/error handling
-                pass
+            enqueue_generation(instance, user=self.request.user)
+
+def member_material(user, material_id):
+    """Materi di kelas yang diajar atau diikuti user, atau None."""
+    return Material.objects.filter(
+        Q(class_obj__teacher=user) | Q(class_obj__students=user), id=material_id
+    ).distinct().first()
+
+def generation_data(material):
+    return {
+        'material_id': material.id,
+        'generation_status': material.generation_status,
+        'generation_error': material.generation_error,
+        'job_id': material.generation_job_id,
+    }
+
+class MaterialGenerationView(APIView):
+    """Status generate konten materi dari file (untuk polling)."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, material_id):
+        material = member_material(request.user, material_id)
+        if material is None:
+            return Response({'error': 'Material not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(generation_data(material))
+
+class MaterialGenerationRetryView(APIView):
+    """Antrikan ulang generate konten yang gagal (guru kelas atau admin)."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, material_id):
+        material = get_object_or_404(Material.objects.select_related('class_obj'), id=material_id)
+        if material.class_obj.teacher_id != request.user.id and request.user.role != 'admin':
+            return Response({'error': 'Only the class teacher can retry generation'}, status=status.HTTP_403_FORBIDDEN)
+        if not material.file:
+            return Response({'error': 'Material has no file to generate from'}, status=status.HTTP_400_BAD_REQUEST)
+        if material.generation_status != Material.GENERATION_FAILED:
+            return Response(
+                {'error': f'Generation is {material.generation_status}, only failed generations can be retried'},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        # Kuota Gemini baru dipakai setelah permintaan retry valid
+        try:
+            admit(request.user, GENERATION_COST)
+        except RateLimited as e:
+            return Response({'detail': str(e)}, status=status.HTTP_429_TOO_MANY_REQUESTS, headers={'Retry-After': str(e.retry_after)})
+
+        enqueue_generation(material, user=request.user)
+        return Response(generation_data(material), status=status.HTTP_202_ACCEPTED)
+
+class MaterialGenerationStreamView(View):
+    """
+    Pantau generate konten lewat Server-Sent Events (jalankan dengan server ASGI). Event `status` dikirim
+    setiap status berubah; stream ditutup setelah done/failed atau timeout (client bisa menyambung lagi).
+    """
+
+    async def get(self, request, material_id):
+        user, _, error = await authenticate_async(request)
+        if error is not None:
+            return error
+        material = await sync_to_async(member_material)(user, material_id)
+        if material is None:
+            return JsonResponse({'error': 'Material not found'}, status=404)
+
+        response = StreamingHttpResponse(self.stream(material.id), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def stream(self, material_id):
+        deadline = time.monotonic() + GENERATION_STREAM_TIMEOUT
+        last = None
+        while True:
+            material = await Material.objects.only(
+                'id', 'generation_status', 'generation_error', 'generation_job'
+            ).filter(id=material_id).afirst()
+            if material is None:
+                yield sse_event('error', {'error': 'Material not found'})
+                return
+            data = generation_data(material)
+            if data != last:
+                yield sse_event('status', data)
+                last = data
+            if material.generation_status in (Material.GENERATION_DONE, Material.GENERATION_FAILED):
+                return
+            if time.monotonic() >= deadline:
+                return
+            await asyncio.sleep(GENERATION_POLL_INTERVAL)
+
+class MaterialSearchView(APIView):
+    """Cari materi di semua kelas user (atau satu kelas dengan ?class_id=), peringkat BM25."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'Parameter q wajib diisi'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', DEFAULT_LIMIT)), MAX_LIMIT))
+        except ValueError:
+            return Response({'error': 'limit harus berupa angka'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Hanya kelas yang diajar atau diikuti user
+        class_ids = Class.objects.filter(Q(teacher=request.user) | Q(students=request.user))
+        try:
+            if request.query_params.get('class_id'):
+                class_ids = class_ids.filter(id=request.query_params['class_id'])
+            class_ids = list(class_ids.values_list('id', flat=True).distinct())
+        except (ValueError, ValidationError):
+            return Response({'error': 'class_id tidak valid'}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = search_materials(class_ids, query, limit)
+        return Response({'query': query, 'count': len(results), 'results': results})
 
 class MaterialDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Material.objects.all()
@@ -59,6 +182,7 @@ from rest_framework.parsers import MultiPartParser, FormParser
 class GenerateMaterialContentView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     parser_classes = (MultiPartParser, FormParser)
+    throttle_classes = [LLMGenerationThrottle]
 
     def post(self, request):
         if 'file' not in request.FILES:
@@ -81,7 +205,8 @@ class GenerateMaterialContentView(APIView):
             import mimetypes
             mime_type, _ = mimetypes.guess_type(full_path)
             
-            generated_content = generate_material_content(full_path, mime_type)
+            # class_id opsional, hanya untuk metrik pemakaian AI per kelas
+            generated_content = generate_material_content(full_path, mime_type, class_id=resolve_class_id(request.data.get('class_id')))
             
             # Clean up temp file
             default_storage.delete(path)
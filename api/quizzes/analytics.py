@@ -0,0 +1,258 @@
+import logging
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Quiz, QuizAttempt, QuizStats, UserAnswer
+from .snapshot import get_quiz_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Analisis butir soal (item analysis):
+# - QuizStats menyimpan agregat mentah (jumlah jawab/benar per soal, distribusi opsi,
+#   jumlah & kuadrat skor, frekuensi skor). Attempt baru ditandai stats_pending dan ditambahkan
+#   per batch oleh fold_pending (worker submit / saat analitik dibuka), bukan di jalur request submit.
+# - Pembangunan ulang penuh dan semua statistik turunan dihitung dengan NumPy
+#   dari kolom-kolom UserAnswer / QuizAttempt, bukan loop objek ORM.
+
+HISTOGRAM_BINS = 10
+PERCENTILES = (25, 50, 75, 90)
+
+
+def _index_of(values, keys):
+    """Posisi setiap elemen `values` di dalam `keys` (-1 jika tidak ada)."""
+    if len(keys) == 0 or len(values) == 0:
+        return np.full(len(values), -1, dtype=np.int64)
+    sorter = np.argsort(keys)
+    pos = np.searchsorted(keys, values, sorter=sorter)
+    pos = np.clip(pos, 0, len(keys) - 1)
+    idx = sorter[pos]
+    return np.where(keys[idx] == values, idx, -1)
+
+
+def _aggregate(snapshot, attempt_rows, answer_rows):
+    """
+    Agregat mentah dari baris (attempt_id, skor) dan (attempt_id, question_id, jawaban):
+    (skor per attempt, {question_id: {answered, correct, correct_score_sum, options}}).
+    """
+    question_ids = list(snapshot['answer_key'].keys())
+    key_text = np.array([snapshot['answer_key'][q][0] for q in question_ids], dtype=str)
+    q_keys = np.array(question_ids, dtype=str)
+
+    attempt_ids = np.array([str(row[0]) for row in attempt_rows], dtype=str)
+    scores = np.array([row[1] for row in attempt_rows], dtype=float)
+
+    a_attempt = np.array([str(row[0]) for row in answer_rows], dtype=str)
+    a_question = np.array([str(row[1]) for row in answer_rows], dtype=str)
+    a_text = np.char.strip(np.array([str(row[2]) for row in answer_rows], dtype=str))
+
+    q_idx = _index_of(a_question, q_keys)
+    att_idx = _index_of(a_attempt, attempt_ids)
+    valid = (q_idx >= 0) & (att_idx >= 0)
+    q_idx, att_idx, a_text = q_idx[valid], att_idx[valid], a_text[valid]
+
+    nq = len(question_ids)
+    is_correct = (a_text == key_text[q_idx]) if len(q_idx) else np.zeros(0, dtype=bool)
+    answered = np.bincount(q_idx, minlength=nq)
+    correct = np.bincount(q_idx, weights=is_correct, minlength=nq)
+    correct_score_sum = np.bincount(q_idx, weights=is_correct * scores[att_idx], minlength=nq)
+
+    items = {
+        q_id: {
+            'answered': int(answered[i]),
+            'correct': int(correct[i]),
+            'correct_score_sum': float(correct_score_sum[i]),
+            'options': {},
+        }
+        for i, q_id in enumerate(question_ids)
+    }
+
+    # Distribusi opsi: hitung pasangan (soal, jawaban) unik sekaligus
+    if len(q_idx):
+        options, opt_idx = np.unique(a_text, return_inverse=True)
+        codes, counts = np.unique(q_idx * len(options) + opt_idx, return_counts=True)
+        for code, count in zip(codes.tolist(), counts.tolist()):
+            q, o = divmod(code, len(options))
+            items[question_ids[q]]['options'][str(options[o])] = count
+
+    return scores, items
+
+
+def _score_counts(scores):
+    values, value_counts = np.unique(scores, return_counts=True)
+    return {repr(float(v)): int(c) for v, c in zip(values, value_counts)}
+
+
+def rebuild_stats(quiz):
+    """Bangun ulang QuizStats dari seluruh attempt kuis."""
+    snapshot = get_quiz_snapshot(quiz)
+
+    with transaction.atomic():
+        stats, _ = QuizStats.objects.select_for_update().get_or_create(
+            quiz=quiz, defaults={'version': snapshot['version'], 'rebuilt_at': timezone.now()}
+        )
+        rebuilt_at = timezone.now()
+
+        attempt_rows = list(QuizAttempt.objects.select_for_update().filter(quiz=quiz).values_list('id', 'score'))
+        answer_rows = list(
+            UserAnswer.objects.filter(attempt__quiz=quiz).values_list('attempt_id', 'question_id', 'answer_text')
+        )
+        scores, items = _aggregate(snapshot, attempt_rows, answer_rows)
+
+        stats.version = snapshot['version']
+        stats.attempts_count = len(scores)
+        stats.score_sum = float(scores.sum())
+        stats.score_sq_sum = float((scores ** 2).sum())
+        stats.score_counts = _score_counts(scores)
+        stats.items = items
+        stats.rebuilt_at = rebuilt_at
+        stats.save()
+
+        # Attempt yang sudah terbaca di sini tidak ditambahkan lagi oleh fold_pending
+        QuizAttempt.objects.filter(id__in=[row[0] for row in attempt_rows], stats_pending=True).update(stats_pending=False)
+
+    return stats
+
+
+def fold_pending(quiz):
+    """
+    Tambahkan attempt yang belum terhitung (stats_pending) ke QuizStats dalam satu batch.
+    Submit tidak menyentuh QuizStats; fungsi ini dipanggil worker submit dan saat analitik dibuka,
+    sehingga tidak ada satu baris agregat yang dikunci oleh setiap siswa yang submit.
+    Mengembalikan jumlah attempt yang ditambahkan (None jika agregat belum ada / harus dibangun ulang).
+    """
+    with transaction.atomic():
+        stats = QuizStats.objects.select_for_update().filter(quiz=quiz).first()
+        if stats is None:
+            return None
+        snapshot = get_quiz_snapshot(quiz)
+        if stats.version != snapshot['version']:
+            stats.delete()
+            return None
+
+        # Locking read: batch lain yang baru commit ikut terbaca, attempt yang sama tidak terhitung dua kali
+        attempt_rows = list(
+            QuizAttempt.objects.select_for_update().filter(quiz=quiz, stats_pending=True).values_list('id', 'score')
+        )
+        if not attempt_rows:
+            return 0
+        attempt_ids = [row[0] for row in attempt_rows]
+        answer_rows = list(
+            UserAnswer.objects.filter(attempt_id__in=attempt_ids).values_list('attempt_id', 'question_id', 'answer_text')
+        )
+        scores, items = _aggregate(snapshot, attempt_rows, answer_rows)
+
+        stats.attempts_count += len(scores)
+        stats.score_sum += float(scores.sum())
+        stats.score_sq_sum += float((scores ** 2).sum())
+        for score_key, count in _score_counts(scores).items():
+            stats.score_counts[score_key] = stats.score_counts.get(score_key, 0) + count
+        for q_id, delta in items.items():
+            item = stats.items.setdefault(q_id, {'answered': 0, 'correct': 0, 'correct_score_sum': 0.0, 'options': {}})
+            item['answered'] += delta['answered']
+            item['correct'] += delta['correct']
+            item['correct_score_sum'] += delta['correct_score_sum']
+            for option, count in delta['options'].items():
+                item['options'][option] = item['options'].get(option, 0) + count
+        stats.save()
+
+        QuizAttempt.objects.filter(id__in=attempt_ids).update(stats_pending=False)
+    return len(attempt_ids)
+
+
+def fold_pending_for(quiz_ids):
+    """fold_pending untuk beberapa kuis (mis. setelah satu batch submit dinilai); error hanya dicatat."""
+    for quiz in Quiz.objects.filter(id__in=quiz_ids):
+        try:
+            fold_pending(quiz)
+        except Exception:
+            logger.exception("Gagal memperbarui statistik kuis %s", quiz.id)
+
+
+def get_item_analysis(quiz, rebuild=False):
+    if not rebuild and fold_pending(quiz) is not None:
+        stats = QuizStats.objects.get(quiz=quiz)
+    else:
+        stats = rebuild_stats(quiz)
+    return summarize(quiz, stats)
+
+
+def summarize(quiz, stats):
+    """Hitung statistik turunan (persentase benar, daya beda, histogram, persentil) dari QuizStats."""
+    snapshot = get_quiz_snapshot(quiz)
+    questions = snapshot['questions']
+    answer_key = snapshot['answer_key']
+    n = stats.attempts_count
+
+    result = {
+        'attempts_count': n,
+        'max_score': quiz.max_score,
+        'mean_score': None,
+        'std_score': None,
+        'percentiles': {},
+        'histogram': [],
+        'questions': [],
+    }
+
+    std = 0.0
+    if n:
+        values = np.array([float(v) for v in stats.score_counts.keys()])
+        counts = np.array(list(stats.score_counts.values()), dtype=np.int64)
+        mean = stats.score_sum / n
+        std = float(np.sqrt(max(stats.score_sq_sum / n - mean ** 2, 0.0)))
+        all_scores = np.repeat(values, counts)
+        upper = max(float(quiz.max_score or 0), float(values.max()), 1.0)
+        hist, edges = np.histogram(values, bins=HISTOGRAM_BINS, range=(0.0, upper), weights=counts)
+
+        result['mean_score'] = round(mean, 2)
+        result['std_score'] = round(std, 2)
+        result['percentiles'] = {
+            f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(all_scores, PERCENTILES))
+        }
+        result['histogram'] = [
+            {'min': round(float(edges[i]), 2), 'max': round(float(edges[i + 1]), 2), 'count': int(hist[i])}
+            for i in range(len(hist))
+        ]
+
+    empty = {'answered': 0, 'correct': 0, 'correct_score_sum': 0.0, 'options': {}}
+    items = [stats.items.get(q['id'], empty) for q in questions]
+    answered = np.array([item['answered'] for item in items], dtype=float)
+    correct = np.array([item['correct'] for item in items], dtype=float)
+    correct_score_sum = np.array([item['correct_score_sum'] for item in items], dtype=float)
+
+    # Daya beda = korelasi point-biserial antara benar/salah di soal ini dan skor total.
+    # Soal yang tidak dijawab dihitung salah.
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = correct / n if n else np.zeros(len(items))
+        mean_correct = correct_score_sum / correct
+        mean_wrong = (stats.score_sum - correct_score_sum) / (n - correct)
+        discrimination = (mean_correct - mean_wrong) / std * np.sqrt(p * (1 - p))
+        percent_correct = p * 100
+
+    for i, question in enumerate(questions):
+        item = items[i]
+        option_counts = dict(item['options'])
+        options = [
+            {'option': option, 'count': option_counts.pop(option.strip(), 0), 'is_correct': option.strip() == answer_key[question['id']][0]}
+            for option in question['options']
+        ]
+        # Jawaban di luar pilihan (mis. pilihan sudah diedit)
+        options += [
+            {'option': option, 'count': count, 'is_correct': False}
+            for option, count in option_counts.items()
+        ]
+
+        d = discrimination[i]
+        result['questions'].append({
+            'id': question['id'],
+            'text': question['text'],
+            'order': question['order'],
+            'answered': int(answered[i]),
+            'correct': int(correct[i]),
+            'percent_correct': round(float(percent_correct[i]), 2) if n else None,
+            'discrimination': round(float(d), 3) if np.isfinite(d) else None,
+            'options': options,
+        })
+
+    return result
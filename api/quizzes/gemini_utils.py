@@ -1,10 +1,25 @@
-import google.generativeai as genai
-from django.conf import settings
 import json
+import logging
 import typing_extensions as typing
+from api.chatbot.generation_cache import cached_generation
+from api.chatbot.instrumentation import track_llm
+from api.chatbot.llm_client import LONG_TIMEOUT, ModelProfile, get_llm_client
 
-# Re-configure if needed, or rely on settings.GEMINI_API_KEY
-genai.configure(api_key=settings.GEMINI_API_KEY)
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = "gemini-2.5-flash-lite"
+# Naikkan setiap kali prompt/konfigurasi generate diubah agar hasil cache lama tidak dipakai
+PROMPT_VERSION = 1
+
+# Optimized for Flash Lite to prevent looping
+QUIZ_PROFILE = ModelProfile(
+    "quiz", MODEL_NAME,
+    generation_config={
+        "temperature": 0.1, # Low temperature for clearer logic
+        "response_mime_type": "application/json",
+        "max_output_tokens": 8192, # Prevent infinite loops
+    },
+)
 
 # Define the schema for the response
 class Option(typing.TypedDict):
@@ -20,65 +35,66 @@ class Question(typing.TypedDict):
 class QuizAndQuestions(typing.TypedDict):
     questions: list[Question]
 
-def generate_quiz_from_file(file_path: str, mime_type: str, num_questions: int = 5) -> list[Question]:
+def generate_quiz_from_file(file_path: str, mime_type: str, num_questions: int = 5, class_id=None, raise_errors=False) -> list[Question]:
     """
     Generates quiz questions from a file using Gemini, returning structured JSON.
+    File yang sama (SHA-256 isi file) dengan parameter yang sama diambil dari cache.
+    Secara default error menghasilkan list kosong; raise_errors=True untuk worker yang perlu menandai gagal.
     """
-    try:
-        # 1. Upload File
-        print(f"Uploading file: {file_path}")
-        uploaded_file = genai.upload_file(file_path, mime_type=mime_type)
-        print(f"File uploaded: {uploaded_file.uri}")
-
-        # 2. Configure Model
-        # 2. Configure Model
-        # Optimized for Flash Lite to prevent looping
-        generation_config = {
-            "temperature": 0.1, # Low temperature for clearer logic
-            "response_mime_type": "application/json",
-            "max_output_tokens": 8192, # Prevent infinite loops
-        }
-        
-        model = genai.GenerativeModel(
-            model_name="gemini-2.5-flash-lite",
-            generation_config=generation_config
-        )
-
-        # 3. Generate Content
-        prompt_text = f"""
-        You are an educational assistant. 
-        TASK: Extract ALL multiple-choice questions from the attached document, up to a maximum of {num_questions}.
-        
-        RULES:
-        1. If the document has existing questions, USE THEM.
-        2. If the document has an Answer Key (Kunci Jawaban), USE IT for the 'answer' field.
-        3. If no key is found, deduce the correct answer.
-        4. Return ONLY a valid JSON List. No markdown formatting, no plain text.
-        
-        JSON SCHEMA:
-        [
-          {{
-            "text": "Question text",
-            "options": ["Option A", "Option B", "Option C", "Option D"],
-            "answer": "Exact string of correct option",
-            "points": 10,
-            "order": 1
-          }}
-        ]
-        """
-        
-        prompt = prompt_text
-        
-        response = model.generate_content([uploaded_file, prompt])
-        
-        # 4. Parse Response
+    with track_llm("quiz", class_id) as call:
         try:
-            questions_json = json.loads(response.text)
-            return questions_json
-        except json.JSONDecodeError:
-            print("Failed to decode JSON:", response.text)
+            params = {
+                "num_questions": num_questions, "prompt_version": PROMPT_VERSION,
+                "model": MODEL_NAME, "provider": get_llm_client().provider_name,
+            }
+            return cached_generation(
+                "quiz", file_path, params,
+                lambda: _generate_quiz(file_path, mime_type, num_questions),
+            )
+        except Exception as e:
+            logger.exception("Gagal generate kuis dari %s", file_path)
+            call.failed(e)
+            if raise_errors:
+                raise
             return []
 
-    except Exception as e:
-        print(f"Error in generate_quiz_from_file: {e}")
-        return []
+def _generate_quiz(file_path: str, mime_type: str, num_questions: int) -> list[Question]:
+    # 1. Upload File
+    client = get_llm_client()
+    uploaded_file = client.upload(file_path, mime_type=mime_type)
+    logger.info("File uploaded: %s", getattr(uploaded_file, 'uri', uploaded_file))
+
+    # 2. Generate Content (model: QUIZ_PROFILE)
+    prompt_text = f"""
+    You are an educational assistant. 
+    TASK: Extract ALL multiple-choice questions from the attached document, up to a maximum of {num_questions}.
+    
+    RULES:
+    1. If the document has existing questions, USE THEM.
+    2. If the document has an Answer Key (Kunci Jawaban), USE IT for the 'answer' field.
+    3. If no key is found, deduce the correct answer.
+    4. Return ONLY a valid JSON List. No markdown formatting, no plain text.
+    
+    JSON SCHEMA:
+    [
+      {{
+        "text": "Question text",
+        "options": ["Option A", "Option B", "Option C", "Option D"],
+        "answer": "Exact string of correct option",
+        "points": 10,
+        "order": 1
+      }}
+    ]
+    """
+    
+    prompt = prompt_text
+    
+    response_text = client.generate(QUIZ_PROFILE, [uploaded_file, prompt], timeout=LONG_TIMEOUT)
+    
+    # 3. Parse Response
+    # JSON yang rusak di-raise agar tidak tersimpan di cache
+    try:
+        return json.loads(response_text)
+    except json.JSONDecodeError:
+        logger.error("Failed to decode JSON: %s", response_text[:500])
+        raise
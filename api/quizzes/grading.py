@@ -0,0 +1,75 @@
+from .models import UserAnswer
+from .snapshot import get_quiz_snapshot
+
+
+def normalize_answer(value):
+    """Bentuk jawaban yang dipakai saat mencocokkan dengan kunci jawaban."""
+    return str(value).strip()
+
+
+def load_answer_key(quiz):
+    """
+    Kunci jawaban kuis dari snapshot (lihat snapshot.py), tanpa membaca tabel Question
+    selama snapshot versi terbaru sudah ada di cache.
+    Hasil: {question_id (str): (jawaban ternormalisasi, points)}
+    """
+    return get_quiz_snapshot(quiz)['answer_key']
+
+
+def clean_answers(answers_data):
+    """
+    Validasi payload jawaban [{question_id, answer_text}, ...] sebelum dinilai / disimpan.
+    answer_text boleh kosong tapi harus teks (angka diubah ke teks); melempar ValueError jika tidak valid.
+    """
+    if not isinstance(answers_data, list):
+        raise ValueError("answers harus berupa list")
+    cleaned = []
+    for i, item in enumerate(answers_data):
+        if not isinstance(item, dict) or not item.get('question_id'):
+            raise ValueError(f"answers[{i}]: question_id wajib diisi")
+        answer_text = item.get('answer_text', '')
+        if isinstance(answer_text, bool) or not isinstance(answer_text, (str, int, float)):
+            raise ValueError(f"answers[{i}]: answer_text harus berupa teks")
+        cleaned.append({'question_id': str(item['question_id']), 'answer_text': str(answer_text)})
+    return cleaned
+
+
+def is_attempt_number_conflict(exc):
+    """IntegrityError karena dua attempt mendapat nomor yang sama (unique_quiz_attempt_number)."""
+    message = str(exc)
+    # SQLite tidak menyebut nama constraint, hanya kolomnya
+    return 'unique_quiz_attempt_number' in message or 'quizattempt.attempt_number' in message
+
+
+def grade_answers(answer_key, answers_data):
+    """
+    Nilai semua jawaban di memory.
+    Mengembalikan (total_score, [(question_id, answer_text, is_correct), ...]) untuk jawaban
+    yang soalnya ada di kuis. Soal yang dijawab lebih dari sekali hanya dihitung sekali.
+    """
+    total_score = 0
+    graded = []
+    seen = set()
+
+    for item in answers_data:
+        q_id = str(item.get('question_id'))
+        if q_id not in answer_key or q_id in seen:
+            continue
+        seen.add(q_id)
+
+        user_ans_text = item.get('answer_text')
+        correct_answer, points = answer_key[q_id]
+        is_correct = normalize_answer(user_ans_text) == correct_answer
+        if is_correct:
+            total_score += points
+        graded.append((q_id, user_ans_text, is_correct))
+
+    return total_score, graded
+
+
+def save_answers(attempt, graded):
+    """Simpan jawaban siswa dengan satu bulk insert."""
+    UserAnswer.objects.bulk_create([
+        UserAnswer(attempt=attempt, question_id=q_id, answer_text=answer_text)
+        for q_id, answer_text, _ in graded
+    ])
@@ -0,0 +1,74 @@
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import SubmissionIdempotencyKey
+
+# Idempotency-Key hanya berlaku selama KEY_TTL: key yang lebih lama dianggap tidak ada
+# (boleh dipakai ulang) dan dihapus oleh manage.py purge_idempotency_keys.
+KEY_TTL = timedelta(hours=getattr(settings, 'QUIZ_IDEMPOTENCY_KEY_TTL_HOURS', 24))
+CLAIM_RETRIES = 3
+
+
+def submission_fingerprint(quiz, data):
+    raw = json.dumps({'quiz': str(quiz.id), 'data': data}, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def begin_submission(user, quiz, key, fingerprint):
+    """
+    Klaim Idempotency-Key. Mengembalikan (record, created);
+    created=False berarti key ini sudah pernah dipakai (selesai atau masih diproses).
+    """
+    for _ in range(CLAIM_RETRIES):
+        try:
+            with transaction.atomic():
+                record = SubmissionIdempotencyKey.objects.create(
+                    user=user, quiz=quiz, key=key, fingerprint=fingerprint
+                )
+            return record, True
+        except IntegrityError:
+            pass
+        record = SubmissionIdempotencyKey.objects.filter(user=user, key=key).first()
+        if record is None:
+            # Request pertama gagal dan melepas key-nya di antara insert dan baca ini
+            continue
+        if record.created_at >= timezone.now() - KEY_TTL:
+            return record, False
+        SubmissionIdempotencyKey.objects.filter(id=record.id).delete()
+    raise IntegrityError(f"Idempotency-Key {key} terus bentrok")
+
+
+def replay_submission(record, fingerprint):
+    if record.fingerprint != fingerprint:
+        return Response(
+            {"error": "Idempotency-Key sudah dipakai untuk request yang berbeda."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    if record.status_code is None:
+        return Response(
+            {"error": "Request dengan Idempotency-Key ini masih diproses."},
+            status=status.HTTP_409_CONFLICT,
+        )
+
+    response = Response(record.response, status=record.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def finish_submission(record, response):
+    record.status_code = response.status_code
+    record.response = response.data
+    record.save(update_fields=['status_code', 'response'])
+
+
+def purge_expired_keys(now=None):
+    cutoff = (now or timezone.now()) - KEY_TTL
+    deleted, _ = SubmissionIdempotencyKey.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
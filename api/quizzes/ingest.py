@@ -0,0 +1,146 @@
+import logging
+
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from .analytics import fold_pending_for
+from .grading import grade_answers, is_attempt_number_conflict, load_answer_key
+from .leaderboard import record_attempts
+from .models import PendingSubmission, QuizAttempt, QuizSession, UserAnswer
+
+logger = logging.getLogger(__name__)
+
+# Mode submit antrian: request hanya memvalidasi dan menyimpan payload ke PendingSubmission,
+# lalu worker menilai antrian per batch (bulk insert attempt & jawaban).
+
+LIMIT_REACHED = "Anda telah mencapai batas maksimal percobaan untuk kuis ini."
+
+
+def enqueue_submission(quiz, user, answers):
+    """Simpan submit ke antrian. Melempar ValueError jika batas percobaan sudah pasti terlampaui."""
+    if quiz.max_attempts > 0:
+        used = QuizAttempt.objects.filter(quiz=quiz, user=user).count()
+        queued = PendingSubmission.objects.filter(
+            quiz=quiz, user=user,
+            status__in=[PendingSubmission.STATUS_PENDING, PendingSubmission.STATUS_PROCESSING],
+        ).count()
+        if used + queued >= quiz.max_attempts:
+            raise ValueError(LIMIT_REACHED)
+    return PendingSubmission.objects.create(quiz=quiz, user=user, answers=answers)
+
+
+def claim_batch(size):
+    """Ambil satu batch submit pending (SKIP LOCKED agar aman untuk banyak worker)."""
+    with transaction.atomic():
+        ids = list(
+            PendingSubmission.objects.select_for_update(skip_locked=True)
+            .filter(status=PendingSubmission.STATUS_PENDING)
+            .order_by('created_at')
+            .values_list('id', flat=True)[:size]
+        )
+        if ids:
+            PendingSubmission.objects.filter(id__in=ids).update(
+                status=PendingSubmission.STATUS_PROCESSING, claimed_at=timezone.now()
+            )
+    return ids
+
+
+def requeue_stale(older_than):
+    cutoff = timezone.now() - older_than
+    return PendingSubmission.objects.filter(
+        status=PendingSubmission.STATUS_PROCESSING, claimed_at__lt=cutoff
+    ).update(status=PendingSubmission.STATUS_PENDING, claimed_at=None)
+
+
+def process_batch(ids, retries=3):
+    """
+    Nilai satu batch submit di memory lalu tulis dengan bulk insert dalam satu transaksi.
+    Jika ada bentrok nomor percobaan (submit sinkron bersamaan), batch dipecah dan diproses satu per satu.
+    """
+    close_old_connections()
+    try:
+        try:
+            return _process(ids)
+        except IntegrityError as e:
+            if len(ids) > 1:
+                return sum(process_batch([submission_id], retries) for submission_id in ids)
+            conflict = is_attempt_number_conflict(e)
+            if conflict and retries > 1:
+                return process_batch(ids, retries - 1)
+            if conflict:
+                logger.warning("Submit %s gagal dinilai: nomor percobaan terus bentrok", ids[0])
+                error = "Terdeteksi submit bersamaan untuk kuis ini, silakan coba lagi."
+            else:
+                logger.exception("Submit %s gagal disimpan", ids[0])
+                error = "Jawaban tidak dapat disimpan karena datanya tidak valid."
+            PendingSubmission.objects.filter(id__in=ids).update(
+                status=PendingSubmission.STATUS_FAILED, error=error, processed_at=timezone.now(),
+            )
+            return 0
+    finally:
+        close_old_connections()
+
+
+def _process(ids):
+    submissions = sorted(
+        PendingSubmission.objects.filter(id__in=ids, status=PendingSubmission.STATUS_PROCESSING).select_related('quiz'),
+        key=lambda s: s.created_at,
+    )
+    if not submissions:
+        return 0
+
+    quizzes = {s.quiz_id: s.quiz for s in submissions}
+    answer_keys = {quiz_id: load_answer_key(quiz) for quiz_id, quiz in quizzes.items()}
+
+    # Nomor percobaan terakhir untuk semua pasangan (kuis, siswa) di batch dalam satu query
+    last_numbers = {
+        (row['quiz_id'], row['user_id']): row['n']
+        for row in QuizAttempt.objects.filter(
+            quiz_id__in=quizzes.keys(), user_id__in={s.user_id for s in submissions}
+        ).values('quiz_id', 'user_id').annotate(n=Max('attempt_number'))
+    }
+
+    now = timezone.now()
+    attempts, answers = [], []
+    for submission in submissions:
+        quiz = submission.quiz
+        pair = (submission.quiz_id, submission.user_id)
+        number = last_numbers.get(pair, 0) + 1
+        submission.processed_at = now
+
+        if quiz.max_attempts > 0 and number > quiz.max_attempts:
+            submission.status = PendingSubmission.STATUS_FAILED
+            submission.error = LIMIT_REACHED
+            continue
+        last_numbers[pair] = number
+
+        score, graded = grade_answers(answer_keys[quiz.id], submission.answers)
+        attempt = QuizAttempt(
+            id=submission.id, quiz=quiz, user_id=submission.user_id, score=score, attempt_number=number
+        )
+        attempts.append(attempt)
+        answers.extend(
+            UserAnswer(attempt=attempt, question_id=q_id, answer_text=answer_text)
+            for q_id, answer_text, _ in graded
+        )
+        submission.status = PendingSubmission.STATUS_DONE
+        submission.error = ''
+
+    with transaction.atomic():
+        QuizAttempt.objects.bulk_create(attempts)
+        # submitted_at mengikuti waktu siswa submit, bukan waktu worker memproses
+        created_at = {s.id: s.created_at for s in submissions}
+        for attempt in attempts:
+            attempt.submitted_at = created_at[attempt.id]
+        QuizAttempt.objects.bulk_update(attempts, ['submitted_at'])
+        UserAnswer.objects.bulk_create(answers, batch_size=1000)
+        PendingSubmission.objects.bulk_update(submissions, ['status', 'error', 'processed_at'])
+        # Sesi yang submit lewat antrian: id attempt sama dengan id submit-nya
+        QuizSession.objects.filter(submission_id__in=[attempt.id for attempt in attempts]).update(attempt_id=F('submission_id'))
+
+        record_attempts(attempts)
+        # Statistik butir soal ditambahkan sekali per kuis untuk seluruh batch (lihat analytics.fold_pending)
+        transaction.on_commit(lambda: fold_pending_for({attempt.quiz_id for attempt in attempts}))
+
+    return len(attempts)
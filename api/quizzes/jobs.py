@@ -0,0 +1,13 @@
+from api.jobs.registry import register
+from .gemini_utils import generate_quiz_from_file
+
+
+@register('quiz.generate_from_file')
+def generate_quiz_job(job):
+    return generate_quiz_from_file(
+        job.file.path,
+        job.payload.get('mime_type') or 'application/pdf',
+        job.payload.get('num_questions', 5),
+        class_id=job.payload.get('class_id'),
+        raise_errors=True,
+    )
@@ -0,0 +1,156 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Max, Sum
+
+from .models import ClassTotalScore, Quiz, QuizAttempt, QuizBestScore
+
+# Leaderboard disimpan sebagai tabel skor terurut di database, bukan dihitung saat dibuka:
+# - QuizBestScore: skor terbaik tiap siswa per kuis
+# - ClassTotalScore: jumlah skor terbaik siswa di semua kuis kelas
+# Keduanya diperbarui incremental oleh record_attempts() di transaksi yang sama dengan
+# penyimpanan attempt, sehingga semua proses langsung melihat papan yang sama.
+# Top-N dan peringkat dibaca lewat index (quiz/kelas, -skor). Pembangunan ulang penuh
+# (rebuild_*) hanya untuk perbaikan: regrade, kuis dihapus, atau manage.py rebuild_leaderboards.
+
+MAX_LIMIT = 100
+
+
+def record_attempts(attempts):
+    """Masukkan attempt yang baru disimpan ke papan kuis & kelas. Harus dipanggil di dalam transaksi penilaian."""
+    best = {}
+    class_of = {}
+    for attempt in attempts:
+        pair = (attempt.quiz_id, attempt.user_id)
+        best[pair] = max(best.get(pair, attempt.score), attempt.score)
+        class_of[attempt.quiz_id] = attempt.quiz.class_obj_id
+    if not best:
+        return
+
+    user_ids = sorted({user_id for _, user_id in best})
+    # Baris siswa dikunci (urut pk) agar submit sinkron & worker antrian tidak memperbarui
+    # baris papan siswa yang sama bersamaan
+    list(get_user_model().objects.select_for_update().filter(pk__in=user_ids).order_by('pk').values_list('pk', flat=True))
+
+    existing = {
+        (row.quiz_id, row.user_id): row
+        for row in QuizBestScore.objects.filter(quiz_id__in=class_of.keys(), user_id__in=user_ids)
+    }
+    created, updated, deltas = [], [], {}
+    for (quiz_id, user_id), score in best.items():
+        row = existing.get((quiz_id, user_id))
+        if row is None:
+            created.append(QuizBestScore(quiz_id=quiz_id, user_id=user_id, score=score))
+            delta = score
+        elif score > row.score:
+            delta = score - row.score
+            row.score = score
+            updated.append(row)
+        else:
+            continue
+        key = (class_of[quiz_id], user_id)
+        deltas[key] = deltas.get(key, 0) + delta
+    QuizBestScore.objects.bulk_create(created)
+    QuizBestScore.objects.bulk_update(updated, ['score'])
+
+    totals = {
+        (row.class_obj_id, row.user_id): row
+        for row in ClassTotalScore.objects.filter(class_obj_id__in={c for c, _ in deltas}, user_id__in=user_ids)
+    }
+    created, updated = [], []
+    for (class_id, user_id), delta in deltas.items():
+        row = totals.get((class_id, user_id))
+        if row is None:
+            created.append(ClassTotalScore(class_obj_id=class_id, user_id=user_id, score=delta))
+        else:
+            row.score += delta
+            updated.append(row)
+    ClassTotalScore.objects.bulk_create(created)
+    ClassTotalScore.objects.bulk_update(updated, ['score'])
+
+
+@transaction.atomic
+def rebuild_class_board(class_id):
+    """Hitung ulang papan kelas dari QuizBestScore (satu query agregat di database)."""
+    ClassTotalScore.objects.filter(class_obj_id=class_id).delete()
+    rows = (
+        QuizBestScore.objects.filter(quiz__class_obj_id=class_id)
+        .values('user_id').annotate(total=Sum('score')).order_by()
+    )
+    ClassTotalScore.objects.bulk_create(
+        [ClassTotalScore(class_obj_id=class_id, user_id=row['user_id'], score=row['total']) for row in rows],
+        batch_size=1000,
+    )
+
+
+@transaction.atomic
+def rebuild_quiz_board(quiz_id, class_id=None):
+    """Hitung ulang papan kuis dari QuizAttempt, lalu papan kelasnya."""
+    QuizBestScore.objects.filter(quiz_id=quiz_id).delete()
+    rows = QuizAttempt.objects.filter(quiz_id=quiz_id).values('user_id').annotate(best=Max('score')).order_by()
+    QuizBestScore.objects.bulk_create(
+        [QuizBestScore(quiz_id=quiz_id, user_id=row['user_id'], score=row['best']) for row in rows],
+        batch_size=1000,
+    )
+    if class_id is None:
+        class_id = Quiz.objects.filter(id=quiz_id).values_list('class_obj_id', flat=True).first()
+    if class_id is not None:
+        rebuild_class_board(class_id)
+
+
+class Leaderboard:
+    """Papan skor terurut di atas queryset (user_id, score)."""
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+
+    def top(self, n):
+        return list(self.queryset.order_by('-score', 'user_id').values_list('user_id', 'score')[:n])
+
+    def score_of(self, user_id):
+        return self.queryset.filter(user_id=user_id).values_list('score', flat=True).first()
+
+    def rank_of_score(self, score):
+        """Peringkat 1-based untuk skor ini (skor sama = peringkat sama)."""
+        return self.queryset.filter(score__gt=score).count() + 1
+
+    def __len__(self):
+        return self.queryset.count()
+
+
+def get_quiz_board(quiz_id):
+    return Leaderboard(QuizBestScore.objects.filter(quiz_id=quiz_id))
+
+
+def get_class_board(class_id):
+    return Leaderboard(ClassTotalScore.objects.filter(class_obj_id=class_id))
+
+
+def parse_limit(value, default=10):
+    """Nilai query param `limit` (1..MAX_LIMIT). Melempar ValueError jika bukan angka."""
+    if value in (None, ''):
+        return default
+    return max(1, min(int(value), MAX_LIMIT))
+
+
+def leaderboard_payload(board, user, limit=10):
+    """Top-N beserta peringkat user yang meminta."""
+    top = board.top(limit)
+    users = get_user_model().objects.in_bulk([user_id for user_id, _ in top])
+    entries = []
+    for i, (user_id, score) in enumerate(top):
+        # Urutan skor menurun: peringkat = posisi pertama skor yang sama
+        rank = entries[-1]['rank'] if entries and entries[-1]['score'] == score else i + 1
+        u = users.get(user_id)
+        entries.append({
+            'rank': rank,
+            'user_id': user_id,
+            'full_name': u.full_name if u else None,
+            'score': score,
+        })
+
+    my_score = board.score_of(user.id)
+    return {
+        'total_participants': len(board),
+        'top': entries,
+        'me': {'rank': board.rank_of_score(my_score), 'score': my_score} if my_score is not None else None,
+    }
@@ -0,0 +1,89 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from api.classes.models import Class
+from api.users.models import User
+from api.quizzes.models import Quiz, Question
+from api.quizzes.serializers import QuizAttemptSerializer
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark jumlah query dan latency submit kuis (QuizAttemptSerializer.create)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,50,200', help="Jumlah soal per kuis, dipisah koma")
+        parser.add_argument('--runs', type=int, default=20, help="Jumlah submit per ukuran kuis")
+
+    def handle(self, *args, **options):
+        sizes = [int(s) for s in options['sizes'].split(',') if s.strip()]
+        runs = options['runs']
+
+        self.stdout.write(f"{'questions':>10} {'queries':>8} {'avg ms':>8} {'p95 ms':>8}")
+        # Semua data benchmark dibuat di dalam transaksi lalu di-rollback;
+        # callback on_commit tiap submit tetap dijalankan dan ikut diukur (lihat _bench)
+        try:
+            with transaction.atomic():
+                for size in sizes:
+                    self._bench(size, runs)
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+    def _bench(self, size, runs):
+        suffix = uuid.uuid4().hex[:8]
+        teacher = User.objects.create_user(email=f"bench-t-{suffix}@example.com", full_name="Bench Teacher", role='teacher')
+        class_obj = Class.objects.create(name=f"Bench {size}", teacher=teacher)
+        quiz = Quiz.objects.create(
+            title=f"Bench {size}", class_obj=class_obj, created_by=teacher,
+            duration_minutes=60, max_attempts=0, total_questions=size, max_score=size,
+        )
+        Question.objects.bulk_create([
+            Question(quiz=quiz, text=f"Soal {i}", order=i, points=1, options=["A", "B", "C", "D"], answer="A")
+            for i in range(size)
+        ])
+        answers = [
+            {"question_id": str(q_id), "answer_text": "A" if i % 2 else "B"}
+            for i, q_id in enumerate(quiz.questions.values_list('id', flat=True))
+        ]
+
+        student = User.objects.create_user(email=f"bench-s-{suffix}@example.com", full_name="Bench Student")
+        request = APIRequestFactory().post('/')
+        request.user = student
+
+        timings = []
+        queries = 0
+        for _ in range(runs):
+            serializer = QuizAttemptSerializer(data={"answers": answers}, context={'request': request})
+            serializer.is_valid(raise_exception=True)
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                pending = len(connection.run_on_commit)
+                serializer.save(quiz=quiz)
+                self._run_on_commit(pending)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries = len(ctx.captured_queries)
+
+        timings.sort()
+        avg = sum(timings) / len(timings)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(f"{size:>10} {queries:>8} {avg:>8.2f} {p95:>8.2f}")
+
+    @staticmethod
+    def _run_on_commit(start):
+        """
+        Transaksi luar tidak pernah commit: callback on_commit yang didaftarkan submit ini
+        dijalankan langsung (seperti setelah commit) lalu dibuang dari antrian koneksi.
+        """
+        callbacks = connection.run_on_commit[start:]
+        del connection.run_on_commit[start:]
+        for _, callback, _ in callbacks:
+            callback()
@@ -0,0 +1,54 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from api.quizzes.ingest import claim_batch, process_batch, requeue_stale
+
+
+class Command(BaseCommand):
+    help = "Worker untuk menilai submit kuis yang masuk antrian (QUIZ_SUBMISSION_MODE='queued')."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help="Jumlah thread worker")
+        parser.add_argument('--batch-size', type=int, default=200, help="Jumlah submit yang dinilai per batch")
+        parser.add_argument('--poll-interval', type=float, default=0.5, help="Jeda (detik) saat antrian kosong")
+        parser.add_argument('--stale-minutes', type=int, default=10, help="Submit processing lebih lama dari ini dikembalikan ke antrian saat start")
+        parser.add_argument('--once', action='store_true', help="Habiskan antrian lalu berhenti")
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        batch_size = options['batch_size']
+        poll_interval = options['poll_interval']
+
+        requeued = requeue_stale(timedelta(minutes=options['stale_minutes']))
+        if requeued:
+            self.stdout.write(f"{requeued} submit tertinggal dikembalikan ke antrian.")
+
+        self.stdout.write(f"Worker submit berjalan dengan {workers} thread, batch {batch_size}.")
+        running = set()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            try:
+                while True:
+                    while len(running) < workers:
+                        ids = claim_batch(batch_size)
+                        if not ids:
+                            break
+                        running.add(pool.submit(process_batch, ids))
+
+                    if not running:
+                        if options['once']:
+                            break
+                        time.sleep(poll_interval)
+                        continue
+
+                    done, running = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                    running = set(running)
+                    for future in done:
+                        if future.exception():
+                            self.stderr.write(f"Worker error: {future.exception()}")
+                        else:
+                            self.stdout.write(f"{future.result()} submit dinilai.")
+            except KeyboardInterrupt:
+                self.stdout.write("Menunggu batch yang sedang berjalan selesai...")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.quizzes.idempotency import KEY_TTL, purge_expired_keys
+
+
+class Command(BaseCommand):
+    help = "Hapus Idempotency-Key submit kuis yang lebih lama dari QUIZ_IDEMPOTENCY_KEY_TTL_HOURS (jalankan berkala, mis. cron)."
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_keys()
+        self.stdout.write(self.style.SUCCESS(f"{deleted} Idempotency-Key lebih lama dari {KEY_TTL} dihapus."))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from api.classes.models import Class
+from api.quizzes.models import Quiz
+from api.quizzes.leaderboard import rebuild_quiz_board, rebuild_class_board
+
+
+class Command(BaseCommand):
+    help = "Bangun ulang tabel leaderboard kuis dan kelas dari data QuizAttempt (perbaikan jika papan tidak sinkron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quiz', dest='quiz_ids', action='append', help="Hanya kuis ini (boleh berulang)")
+        parser.add_argument('--class', dest='class_ids', action='append', help="Hanya kelas ini (boleh berulang)")
+
+    def handle(self, *args, **options):
+        quiz_ids = options['quiz_ids']
+        class_ids = options['class_ids']
+        rebuild_all = not quiz_ids and not class_ids
+
+        quizzes = Quiz.objects.all() if rebuild_all else Quiz.objects.filter(id__in=quiz_ids or [])
+        for quiz_id, class_id in quizzes.values_list('id', 'class_obj_id'):
+            rebuild_quiz_board(quiz_id, class_id)
+
+        classes = Class.objects.all() if rebuild_all else Class.objects.filter(id__in=class_ids or [])
+        for class_id in classes.values_list('id', flat=True):
+            rebuild_class_board(class_id)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Leaderboard dibangun ulang: {quizzes.count()} kuis, {classes.count()} kelas."
+        ))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.quizzes.models import Quiz
+from api.quizzes.regrade import CHUNK_SIZE, regrade_quiz
+
+
+class Command(BaseCommand):
+    help = "Nilai ulang semua attempt kuis dengan kunci jawaban terbaru."
+
+    def add_arguments(self, parser):
+        parser.add_argument('quiz_ids', nargs='+', help="ID kuis yang dinilai ulang")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Jumlah attempt per bulk_update")
+
+    def handle(self, *args, **options):
+        quizzes = list(Quiz.objects.filter(id__in=options['quiz_ids']))
+        if len(quizzes) != len(set(options['quiz_ids'])):
+            raise CommandError("Sebagian ID kuis tidak ditemukan.")
+
+        for quiz in quizzes:
+            self.stdout.write(f"Regrade '{quiz.title}' ({quiz.id})...")
+            started = time.perf_counter()
+            result = regrade_quiz(
+                quiz,
+                chunk_size=options['chunk_size'],
+                progress=lambda written, total: self.stdout.write(f"  {written}/{total} skor ditulis"),
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"  {result['changed']} dari {result['attempts']} attempt berubah "
+                f"({result['answers']} jawaban, {time.perf_counter() - started:.2f} s)"
+            ))
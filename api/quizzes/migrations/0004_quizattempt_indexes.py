@@ -0,0 +1,21 @@
+# Generated by Django 4.2.25 on 2026-10-18 10:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0003_quiz_max_attempts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['quiz', 'submitted_at'], name='quizzes_qui_quiz_id_0fa68d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['quiz', 'user', 'submitted_at'], name='quizzes_qui_quiz_id_c48f12_idx'),
+        ),
+    ]
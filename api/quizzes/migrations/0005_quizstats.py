@@ -0,0 +1,28 @@
+# Generated by Django 4.2.25 on 2026-10-18 10:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0004_quizattempt_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizStats',
+            fields=[
+                ('quiz', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='quizzes.quiz')),
+                ('version', models.BigIntegerField(help_text='Versi snapshot kuis saat agregat dibangun')),
+                ('attempts_count', models.PositiveIntegerField(default=0)),
+                ('score_sum', models.FloatField(default=0.0)),
+                ('score_sq_sum', models.FloatField(default=0.0)),
+                ('score_counts', models.JSONField(default=dict, help_text='{skor: jumlah attempt}')),
+                ('items', models.JSONField(default=dict, help_text='{question_id: {answered, correct, correct_score_sum, options}}')),
+                ('rebuilt_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.25 on 2026-10-18 10:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0005_quizstats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['user', 'submitted_at'], name='quizzes_qui_user_id_ac3563_idx'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 4.2.25 on 2026-10-18 10:23
+
+from django.conf import settings
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+
+def backfill_attempt_numbers(apps, schema_editor):
+    QuizAttempt = apps.get_model('quizzes', 'QuizAttempt')
+    numbered = QuizAttempt.objects.annotate(number=Window(
+        expression=RowNumber(),
+        partition_by=[F('quiz_id'), F('user_id')],
+        order_by=[F('submitted_at').asc(), F('id').asc()],
+    )).values_list('id', 'number')
+
+    batch = []
+    for attempt_id, number in numbered.iterator():
+        batch.append(QuizAttempt(id=attempt_id, attempt_number=number))
+        if len(batch) >= 1000:
+            QuizAttempt.objects.bulk_update(batch, ['attempt_number'])
+            batch = []
+    QuizAttempt.objects.bulk_update(batch, ['attempt_number'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('quizzes', '0007_quizsession'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionIdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100)),
+                ('fingerprint', models.CharField(help_text='SHA-256 dari kuis + payload request', max_length=64)),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, help_text='Null selama request pertama masih diproses', null=True)),
+                ('response', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='quizattempt',
+            name='attempt_number',
+            field=models.PositiveIntegerField(default=1, help_text='Urutan percobaan siswa pada kuis ini'),
+        ),
+        migrations.RunPython(backfill_attempt_numbers, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='quizattempt',
+            constraint=models.UniqueConstraint(fields=('quiz', 'user', 'attempt_number'), name='unique_quiz_attempt_number'),
+        ),
+        migrations.AddField(
+            model_name='submissionidempotencykey',
+            name='quiz',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='submission_keys', to='quizzes.quiz'),
+        ),
+        migrations.AddField(
+            model_name='submissionidempotencykey',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='submission_keys', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='submissionidempotencykey',
+            constraint=models.UniqueConstraint(fields=('user', 'key'), name='unique_submission_idempotency_key'),
+        ),
+    ]
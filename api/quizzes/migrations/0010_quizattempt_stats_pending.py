@@ -0,0 +1,28 @@
+# Generated by Django 4.2.25 on 2026-10-18 11:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0009_pendingsubmission'),
+    ]
+
+    operations = [
+        # Attempt lama sudah terhitung di QuizStats (atau ikut saat agregat dibangun ulang)
+        migrations.AddField(
+            model_name='quizattempt',
+            name='stats_pending',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='quizattempt',
+            name='stats_pending',
+            field=models.BooleanField(default=True, help_text='Belum ditambahkan ke QuizStats (lihat analytics.fold_pending)'),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['quiz', 'stats_pending'], name='quizzes_qui_quiz_id_ec55db_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.25 on 2026-10-18 11:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0010_quizattempt_stats_pending'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizsession',
+            name='submission',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='session', to='quizzes.pendingsubmission'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.2.25 on 2026-10-18 11:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Max, Sum
+
+
+def backfill_scores(apps, schema_editor):
+    QuizAttempt = apps.get_model('quizzes', 'QuizAttempt')
+    QuizBestScore = apps.get_model('quizzes', 'QuizBestScore')
+    ClassTotalScore = apps.get_model('quizzes', 'ClassTotalScore')
+
+    best = QuizAttempt.objects.values('quiz_id', 'user_id').annotate(best=Max('score')).order_by()
+    QuizBestScore.objects.bulk_create(
+        (QuizBestScore(quiz_id=row['quiz_id'], user_id=row['user_id'], score=row['best']) for row in best.iterator()),
+        batch_size=1000,
+    )
+    totals = QuizBestScore.objects.values('quiz__class_obj_id', 'user_id').annotate(total=Sum('score')).order_by()
+    ClassTotalScore.objects.bulk_create(
+        (ClassTotalScore(class_obj_id=row['quiz__class_obj_id'], user_id=row['user_id'], score=row['total']) for row in totals.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0003_announcement'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('quizzes', '0011_quizsession_submission'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassTotalScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(default=0.0)),
+                ('class_obj', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='total_scores', to='classes.class')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='class_total_scores', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='QuizBestScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='best_scores', to='quizzes.quiz')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quiz_best_scores', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['quiz', '-score'], name='quiz_best_score_rank')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='quizbestscore',
+            constraint=models.UniqueConstraint(fields=('quiz', 'user'), name='unique_quiz_best_score'),
+        ),
+        migrations.AddIndex(
+            model_name='classtotalscore',
+            index=models.Index(fields=['class_obj', '-score'], name='class_total_score_rank'),
+        ),
+        migrations.AddConstraint(
+            model_name='classtotalscore',
+            constraint=models.UniqueConstraint(fields=('class_obj', 'user'), name='unique_class_total_score'),
+        ),
+        migrations.RunPython(backfill_scores, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from api.classes.models import Class
 import uuid
 
@@ -47,7 +48,21 @@ class QuizAttempt(models.Model):
     quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='attempts')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='quiz_attempts')
     score = models.FloatField(default=0.0)
+    attempt_number = models.PositiveIntegerField(default=1, help_text="Urutan percobaan siswa pada kuis ini")
     submitted_at = models.DateTimeField(auto_now_add=True)
+    stats_pending = models.BooleanField(default=True, help_text="Belum ditambahkan ke QuizStats (lihat analytics.fold_pending)")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['quiz', 'stats_pending']),
+            models.Index(fields=['quiz', 'submitted_at']),
+            models.Index(fields=['quiz', 'user', 'submitted_at']),
+            models.Index(fields=['user', 'submitted_at']),
+        ]
+        constraints = [
+            # Dua submit bersamaan tidak bisa mendapat nomor percobaan yang sama
+            models.UniqueConstraint(fields=['quiz', 'user', 'attempt_number'], name='unique_quiz_attempt_number'),
+        ]
     
     def __str__(self):
         return f"{self.user} - {self.quiz.title} - Score: {self.score}"
@@ -56,4 +71,137 @@ class UserAnswer(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     attempt = models.ForeignKey(QuizAttempt, on_delete=models.CASCADE, related_name='answers')
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
-    answer_text = models.CharField(max_length=255, help_text="Jawaban yang dipilih siswa")
\ No newline at end of file
+    answer_text = models.CharField(max_length=255, help_text="Jawaban yang dipilih siswa")
+
+class QuizSession(models.Model):
+    """Sesi pengerjaan kuis dengan waktu mulai dari server; jawaban disimpan bertahap (autosave)."""
+    STATUS_ACTIVE = 'active'
+    STATUS_SUBMITTED = 'submitted'
+    STATUS_CHOICES = (
+        (STATUS_ACTIVE, 'Active'),
+        (STATUS_SUBMITTED, 'Submitted'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='sessions')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='quiz_sessions')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_ACTIVE)
+    answers = models.JSONField(default=dict, blank=True, help_text="{question_id: answer_text}")
+    started_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(null=True, blank=True, help_text="Batas waktu pengerjaan (null = tanpa batas)")
+    last_saved_at = models.DateTimeField(null=True, blank=True)
+    attempt = models.OneToOneField(QuizAttempt, on_delete=models.SET_NULL, null=True, blank=True, related_name='session')
+    # Mode submit antrian: submit yang menunggu dinilai worker; attempt diisi saat selesai dinilai
+    submission = models.OneToOneField('PendingSubmission', on_delete=models.SET_NULL, null=True, blank=True, related_name='session')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['quiz', 'user', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.quiz.title} [{self.status}]"
+
+class PendingSubmission(models.Model):
+    """
+    Antrian submit kuis (mode QUIZ_SUBMISSION_MODE='queued').
+    id dipakai sebagai id QuizAttempt setelah dinilai oleh worker (manage.py process_submissions).
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='pending_submissions')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='pending_submissions')
+    answers = models.JSONField(default=list)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.quiz_id} [{self.status}]"
+
+class SubmissionIdempotencyKey(models.Model):
+    """Respons submit yang tersimpan per Idempotency-Key, agar retry client tidak menilai ulang."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='submission_keys')
+    key = models.CharField(max_length=100)
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='submission_keys')
+    fingerprint = models.CharField(max_length=64, help_text="SHA-256 dari kuis + payload request")
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True, help_text="Null selama request pertama masih diproses")
+    response = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_submission_idempotency_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.key}"
+
+class QuizStats(models.Model):
+    """
+    Agregat hasil kuis yang dimaterialisasi untuk analisis butir soal (lihat analytics.py).
+    Attempt baru ditambahkan per batch dan agregat dibangun ulang penuh jika versi kuis berubah.
+    """
+    quiz = models.OneToOneField(Quiz, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    version = models.BigIntegerField(help_text="Versi snapshot kuis saat agregat dibangun")
+    attempts_count = models.PositiveIntegerField(default=0)
+    score_sum = models.FloatField(default=0.0)
+    score_sq_sum = models.FloatField(default=0.0)
+    score_counts = models.JSONField(default=dict, help_text="{skor: jumlah attempt}")
+    items = models.JSONField(default=dict, help_text="{question_id: {answered, correct, correct_score_sum, options}}")
+    rebuilt_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stats {self.quiz_id} ({self.attempts_count} attempts)"
+
+class QuizBestScore(models.Model):
+    """Papan skor kuis: skor terbaik tiap siswa, diperbarui di transaksi penilaian (lihat leaderboard.py)."""
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='best_scores')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='quiz_best_scores')
+    score = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['quiz', '-score'], name='quiz_best_score_rank'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['quiz', 'user'], name='unique_quiz_best_score'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.quiz_id}: {self.score}"
+
+class ClassTotalScore(models.Model):
+    """Papan skor kelas: jumlah skor terbaik siswa di semua kuis kelas."""
+    class_obj = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='total_scores')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='class_total_scores')
+    score = models.FloatField(default=0.0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['class_obj', '-score'], name='class_total_score_rank'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['class_obj', 'user'], name='unique_class_total_score'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.class_obj_id}: {self.score}"
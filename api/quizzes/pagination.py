@@ -0,0 +1,9 @@
+from rest_framework.pagination import CursorPagination
+
+
+class AttemptCursorPagination(CursorPagination):
+    """Cursor pagination untuk daftar attempt, terbaru lebih dulu."""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-submitted_at', '-id')
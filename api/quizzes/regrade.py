@@ -0,0 +1,92 @@
+import logging
+
+import numpy as np
+from django.db import transaction
+
+from .analytics import _index_of
+from .leaderboard import rebuild_quiz_board
+from .models import QuizAttempt, QuizStats, UserAnswer
+from .snapshot import get_quiz_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Penilaian ulang semua attempt setelah kunci jawaban diperbaiki.
+# Semua UserAnswer kuis dibaca sebagai kolom (satu query), dinilai sekaligus dengan NumPy,
+# lalu hanya skor yang berubah ditulis kembali dengan bulk_update per chunk.
+
+CHUNK_SIZE = 2000
+
+
+def compute_scores(answer_key, attempt_ids, answer_rows):
+    """
+    Skor baru setiap attempt dari baris (attempt_id, question_id, answer_text).
+    Aturan sama dengan grade_answers: soal yang tidak ada di kuis diabaikan,
+    soal yang dijawab lebih dari sekali hanya dihitung sekali.
+    """
+    question_ids = list(answer_key.keys())
+    q_keys = np.array(question_ids, dtype=str)
+    key_text = np.array([answer_key[q][0] for q in question_ids], dtype=str)
+    points = np.array([answer_key[q][1] for q in question_ids], dtype=float)
+    a_ids = np.array(attempt_ids, dtype=str)
+
+    if not answer_rows or not question_ids:
+        return np.zeros(len(a_ids))
+
+    a_attempt = np.array([str(row[0]) for row in answer_rows], dtype=str)
+    a_question = np.array([str(row[1]) for row in answer_rows], dtype=str)
+    a_text = np.char.strip(np.array([str(row[2]) for row in answer_rows], dtype=str))
+
+    q_idx = _index_of(a_question, q_keys)
+    att_idx = _index_of(a_attempt, a_ids)
+    valid = (q_idx >= 0) & (att_idx >= 0)
+    q_idx, att_idx, a_text = q_idx[valid], att_idx[valid], a_text[valid]
+
+    # Satu jawaban per (attempt, soal)
+    _, first = np.unique(att_idx * len(question_ids) + q_idx, return_index=True)
+    q_idx, att_idx, a_text = q_idx[first], att_idx[first], a_text[first]
+
+    earned = np.where(a_text == key_text[q_idx], points[q_idx], 0.0)
+    return np.bincount(att_idx, weights=earned, minlength=len(a_ids))
+
+
+def regrade_quiz(quiz, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Hitung ulang skor semua attempt kuis dengan kunci jawaban terbaru.
+    `progress(written, total)` dipanggil setelah setiap chunk ditulis.
+    Mengembalikan ringkasan {'attempts', 'answers', 'changed'}.
+    """
+    answer_key = get_quiz_snapshot(quiz)['answer_key']
+
+    with transaction.atomic():
+        # Kunci attempt kuis ini agar tidak ada skor yang ditimpa submit/regrade lain di tengah jalan
+        attempt_rows = list(
+            QuizAttempt.objects.select_for_update().filter(quiz=quiz).order_by().values_list('id', 'score')
+        )
+        answer_rows = list(
+            UserAnswer.objects.filter(attempt__quiz=quiz).values_list('attempt_id', 'question_id', 'answer_text')
+        )
+
+        attempt_ids = [row[0] for row in attempt_rows]
+        new_scores = compute_scores(answer_key, [str(a) for a in attempt_ids], answer_rows)
+        old_scores = np.array([row[1] for row in attempt_rows], dtype=float)
+        changed = np.flatnonzero(~np.isclose(new_scores, old_scores))
+
+        updates = [QuizAttempt(id=attempt_ids[i], score=float(new_scores[i])) for i in changed.tolist()]
+        for start in range(0, len(updates), chunk_size):
+            chunk = updates[start:start + chunk_size]
+            QuizAttempt.objects.bulk_update(chunk, ['score'])
+            if progress:
+                progress(start + len(chunk), len(updates))
+
+        if updates:
+            # Agregat analitik dibangun ulang saat dibaca berikutnya; skor terbaik bisa turun,
+            # jadi papan kuis & kelas dihitung ulang di transaksi yang sama
+            QuizStats.objects.filter(quiz=quiz).delete()
+            rebuild_quiz_board(quiz.id, quiz.class_obj_id)
+
+    logger.info("Regrade kuis %s: %s dari %s attempt berubah", quiz.id, len(updates), len(attempt_rows))
+    return {
+        'attempts': len(attempt_rows),
+        'answers': len(answer_rows),
+        'changed': len(updates),
+    }
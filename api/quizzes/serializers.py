@@ -1,9 +1,16 @@
 from rest_framework import serializers
-from django.db import transaction
-from .models import Quiz, Question, QuizAttempt, UserAnswer
+from django.db import IntegrityError, transaction
+from .models import PendingSubmission, Quiz, Question, QuizAttempt, QuizSession
 from api.classes.models import Class
+from .grading import clean_answers, grade_answers, is_attempt_number_conflict, load_answer_key, save_answers
+from .snapshot import get_quiz_snapshot, publish_snapshot
+from .leaderboard import record_attempts
+from .sessions import saved_answers
+from django.utils import timezone
 
 class QuestionAdminSerializer(serializers.ModelSerializer):
+    # Writable agar update kuis bisa mencocokkan soal yang sudah ada berdasarkan id
+    id = serializers.UUIDField(required=False)
     options = serializers.ListField(
         child=serializers.CharField(), 
         min_length=2, 
@@ -51,15 +58,17 @@ class QuizAdminSerializer(serializers.ModelSerializer):
         
         with transaction.atomic():
             quiz = Quiz.objects.create(**validated_data)
-            for q_data in questions_data:
-                Question.objects.create(quiz=quiz, **q_data)
+            questions = Question.objects.bulk_create([
+                Question(quiz=quiz, **{k: v for k, v in q_data.items() if k != 'id'})
+                for q_data in questions_data
+            ])
             
-            quiz.total_questions = quiz.questions.count()
+            quiz.total_questions = len(questions)
             # Hitung max_score dari total points pertanyaan
-            total_points = sum(q.points for q in quiz.questions.all())
-            quiz.max_score = total_points
+            quiz.max_score = sum(q.points for q in questions)
             quiz.save()
-            
+
+        publish_snapshot(quiz)
         return quiz
 
     def update(self, instance, validated_data):
@@ -71,30 +80,64 @@ class QuizAdminSerializer(serializers.ModelSerializer):
         instance.deadline = validated_data.get('deadline', instance.deadline)
         instance.is_active = validated_data.get('is_active', instance.is_active)
         instance.max_attempts = validated_data.get('max_attempts', instance.max_attempts)
-        instance.save()
-        
-        if 'questions' in validated_data:
-            questions_data = validated_data.pop('questions')
-            with transaction.atomic():
-                instance.questions.all().delete()
-                for q_data in questions_data:
-                    Question.objects.create(quiz=instance, **q_data)
-                
-                instance.total_questions = instance.questions.count()
+
+        with transaction.atomic():
+            if 'questions' in validated_data:
+                questions = self._sync_questions(instance, validated_data.pop('questions'))
+                instance.total_questions = len(questions)
                 # Recalculate max_score
-                total_points = sum(q.points for q in instance.questions.all())
-                instance.max_score = total_points
-                instance.save()
-                
+                instance.max_score = sum(q.points for q in questions)
+            instance.save()
+
+        publish_snapshot(instance)
         return instance
 
+    QUESTION_FIELDS = ['text', 'order', 'points', 'options', 'answer']
+
+    def _sync_questions(self, quiz, questions_data):
+        """
+        Terapkan daftar soal baru secara incremental:
+        - soal dengan id yang sudah ada -> bulk_update (hanya jika ada perubahan)
+        - soal tanpa id / id tidak dikenal -> bulk_create
+        - soal lama yang tidak dikirim lagi -> dihapus
+        Soal yang tetap ada tidak dihapus, sehingga jawaban siswa (UserAnswer) untuk soal itu tidak ikut terhapus.
+        Mengembalikan daftar soal akhir untuk menghitung total di memory.
+        """
+        existing = {q.id: q for q in quiz.questions.all()}
+        questions, to_update, to_create = [], [], []
+
+        for q_data in questions_data:
+            q_data = dict(q_data)
+            question = existing.pop(q_data.pop('id', None), None)
+            if question is None:
+                question = Question(quiz=quiz, **q_data)
+                to_create.append(question)
+            else:
+                changed = False
+                for field, value in q_data.items():
+                    if getattr(question, field) != value:
+                        setattr(question, field, value)
+                        changed = True
+                if changed:
+                    to_update.append(question)
+            questions.append(question)
+
+        if existing:
+            Question.objects.filter(id__in=existing.keys()).delete()
+        if to_update:
+            Question.objects.bulk_update(to_update, self.QUESTION_FIELDS)
+        if to_create:
+            Question.objects.bulk_create(to_create)
+        return questions
+
 class QuestionStudentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Question
         fields = ['id', 'text', 'order', 'points', 'options']
 
 class QuizDetailSerializer(serializers.ModelSerializer):
-    questions = QuestionStudentSerializer(many=True, read_only=True)
+    # Payload soal diambil dari snapshot kuis, bukan query ke tabel Question
+    questions = serializers.SerializerMethodField()
     class_id = serializers.PrimaryKeyRelatedField(read_only=True, source='class_obj')
     class_name = serializers.CharField(source='class_obj.name', read_only=True)
     user_attempts_count = serializers.SerializerMethodField()
@@ -104,74 +147,127 @@ class QuizDetailSerializer(serializers.ModelSerializer):
         model = Quiz
         fields = ['id', 'title', 'description', 'class_id', 'class_name', 'duration_minutes', 'deadline', 'is_active', 'questions', 'max_attempts', 'user_attempts_count', 'latest_score']
 
+    def get_questions(self, obj):
+        return get_quiz_snapshot(obj)['questions']
+
     def get_user_attempts_count(self, obj):
+        # Sudah dihitung lewat annotate di QuizStudentViewSet.get_queryset
+        if hasattr(obj, 'user_attempts_count'):
+            return obj.user_attempts_count
         user = self.context['request'].user
         if not user.is_authenticated:
             return 0
         return QuizAttempt.objects.filter(quiz=obj, user=user).count()
 
     def get_latest_score(self, obj):
+        if hasattr(obj, 'latest_score'):
+            return obj.latest_score
         user = self.context['request'].user
         if not user.is_authenticated:
             return None
         attempt = QuizAttempt.objects.filter(quiz=obj, user=user).order_by('-submitted_at').first()
         return attempt.score if attempt else None
 
+class QuizStudentListSerializer(serializers.ModelSerializer):
+    """Representasi ringan untuk daftar kuis siswa: tanpa soal, statistik attempt dari annotate."""
+    class_id = serializers.PrimaryKeyRelatedField(read_only=True, source='class_obj')
+    class_name = serializers.CharField(source='class_obj.name', read_only=True)
+    user_attempts_count = serializers.IntegerField(read_only=True)
+    latest_score = serializers.FloatField(read_only=True, allow_null=True)
+
+    class Meta:
+        model = Quiz
+        fields = ['id', 'title', 'description', 'class_id', 'class_name', 'duration_minutes', 'deadline', 'is_active', 'total_questions', 'max_score', 'max_attempts', 'user_attempts_count', 'latest_score']
+
 class QuizAttemptSerializer(serializers.ModelSerializer):
     answers = serializers.ListField(write_only=True)
     student_name = serializers.CharField(source='user.full_name', read_only=True)
     student_avatar = serializers.ImageField(source='user.profile_picture', read_only=True)
     quiz_title = serializers.CharField(source='quiz.title', read_only=True)
-    attempt_number = serializers.SerializerMethodField()
 
     class Meta:
         model = QuizAttempt
         fields = ['id', 'quiz', 'quiz_title', 'user', 'student_name', 'student_avatar', 'score', 'submitted_at', 'answers', 'attempt_number']
-        read_only_fields = ['score', 'submitted_at', 'user', 'quiz']
+        read_only_fields = ['score', 'submitted_at', 'user', 'quiz', 'attempt_number']
 
-    def get_attempt_number(self, obj):
-        # Hitung urutan attempt ini
-        all_attempts = QuizAttempt.objects.filter(quiz=obj.quiz, user=obj.user).order_by('submitted_at')
-        for index, attempt in enumerate(all_attempts):
-            if attempt.id == obj.id:
-                return index + 1
-        return 1
+    MAX_NUMBERING_RETRIES = 3
+
+    def validate_answers(self, value):
+        try:
+            return clean_answers(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
 
     def create(self, validated_data):
         answers_data = validated_data.pop('answers')
         user = self.context['request'].user
         quiz = validated_data.get('quiz')
         
-        # Validate Attempt Limit
-        if quiz.max_attempts > 0:
-            count = QuizAttempt.objects.filter(quiz=quiz, user=user).count()
-            if count >= quiz.max_attempts:
-               raise serializers.ValidationError("Anda telah mencapai batas maksimal percobaan untuk kuis ini.")
-        
-        total_score = 0
-        
-        with transaction.atomic():
-            attempt = QuizAttempt.objects.create(user=user, quiz=quiz, score=0)
-            
-            for item in answers_data:
-                q_id = item.get('question_id')
-                user_ans_text = item.get('answer_text')
-                
-                try:
-                    question_obj = Question.objects.get(id=q_id, quiz=quiz)
-
-                    UserAnswer.objects.create(
-                        attempt=attempt,
-                        question=question_obj,
-                        answer_text=user_ans_text
+        # Kunci jawaban diambil sekali, penilaian dilakukan di memory
+        answer_key = load_answer_key(quiz)
+        total_score, graded = grade_answers(answer_key, answers_data)
+
+        # Batas percobaan dijaga oleh unique constraint (quiz, user, attempt_number).
+        # Setiap percobaan punya savepoint sendiri: baris siswa dikunci dulu agar submit bersamaan
+        # dari siswa yang sama antre, lalu nomor terakhir dibaca dengan locking read sehingga
+        # attempt yang baru commit tetap terlihat walaupun kita di dalam transaksi luar
+        # (mis. submit sesi) pada isolation REPEATABLE READ.
+        for _ in range(self.MAX_NUMBERING_RETRIES):
+            try:
+                with transaction.atomic():
+                    list(type(user).objects.select_for_update().filter(pk=user.pk).values_list('pk', flat=True))
+                    last_number = (
+                        QuizAttempt.objects.select_for_update().filter(quiz=quiz, user=user)
+                        .order_by('-attempt_number').values_list('attempt_number', flat=True).first()
+                    ) or 0
+                    attempt_number = last_number + 1
+
+                    # Validate Attempt Limit
+                    if quiz.max_attempts > 0 and attempt_number > quiz.max_attempts:
+                        raise serializers.ValidationError("Anda telah mencapai batas maksimal percobaan untuk kuis ini.")
+
+                    attempt = QuizAttempt.objects.create(
+                        user=user, quiz=quiz, score=total_score, attempt_number=attempt_number
                     )
-                    if str(user_ans_text).strip() == str(question_obj.answer).strip():
-                        total_score += question_obj.points
-                        
-                except Question.DoesNotExist:
-                    continue
-
-            attempt.score = total_score
-            attempt.save()
-            
-        return attempt
\ No newline at end of file
+                    save_answers(attempt, graded)
+                    record_attempts([attempt])
+            except IntegrityError as e:
+                # Hanya bentrok nomor percobaan yang dicoba ulang; error lain bukan soal konkurensi
+                if not is_attempt_number_conflict(e):
+                    raise
+                continue
+            return attempt
+
+        raise serializers.ValidationError("Terdeteksi submit bersamaan untuk kuis ini, silakan coba lagi.")
+
+
+class PendingSubmissionSerializer(serializers.ModelSerializer):
+    attempt = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PendingSubmission
+        fields = ['id', 'quiz', 'status', 'error', 'created_at', 'processed_at', 'attempt']
+
+    def get_attempt(self, obj):
+        # id submit == id attempt setelah dinilai
+        if obj.status != PendingSubmission.STATUS_DONE:
+            return None
+        attempt = QuizAttempt.objects.select_related('user', 'quiz').filter(id=obj.id).first()
+        return QuizAttemptSerializer(attempt).data if attempt else None
+
+class QuizSessionSerializer(serializers.ModelSerializer):
+    answers = serializers.SerializerMethodField()
+    server_time = serializers.SerializerMethodField()
+
+    class Meta:
+        model = QuizSession
+        fields = ['id', 'quiz', 'status', 'started_at', 'expires_at', 'server_time', 'last_saved_at', 'answers', 'attempt', 'submission']
+        read_only_fields = fields
+
+    def get_answers(self, obj):
+        # Termasuk autosave yang belum di-flush ke database
+        return saved_answers(obj)
+
+    def get_server_time(self, obj):
+        # Dipakai client untuk menyelaraskan timer dengan jam server
+        return serializers.DateTimeField().to_representation(timezone.now())
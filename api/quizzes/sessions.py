@@ -0,0 +1,145 @@
+import atexit
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .grading import clean_answers
+from .models import QuizSession
+from .snapshot import get_quiz_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Autosave jawaban tidak langsung ditulis ke database. Setiap proses menampung
+# autosave di buffer (write-behind); simpan berulang dari siswa yang sama digabung,
+# lalu thread latar menulis semuanya dengan satu bulk_update setiap FLUSH_INTERVAL detik.
+# Dengan begitu beban tulis tersebar sepanjang ujian, bukan menumpuk saat deadline.
+# Buffer hanya milik proses yang menerima autosave, jadi setiap autosave juga ditulis ke cache
+# bersama (satu key per soal). Saat submit, jawaban dibaca dari database + cache tersebut,
+# sehingga autosave yang diterima worker lain ikut dinilai walaupun belum di-flush.
+
+FLUSH_INTERVAL = getattr(settings, 'QUIZ_AUTOSAVE_FLUSH_SECONDS', 5)
+AUTOSAVE_TIMEOUT = getattr(settings, 'QUIZ_AUTOSAVE_CACHE_SECONDS', 60 * 60 * 24)
+# Toleransi keterlambatan jaringan setelah waktu habis
+GRACE_PERIOD = timedelta(seconds=getattr(settings, 'QUIZ_SESSION_GRACE_SECONDS', 30))
+
+
+def write_answers(pending):
+    """Gabungkan jawaban yang ter-buffer ke QuizSession.answers dengan satu bulk_update."""
+    now = timezone.now()
+    with transaction.atomic():
+        sessions = list(
+            QuizSession.objects.select_for_update()
+            .filter(id__in=list(pending.keys()), status=QuizSession.STATUS_ACTIVE)
+            .only('id', 'answers', 'last_saved_at')
+        )
+        for session in sessions:
+            session.answers.update(pending[session.id])
+            session.last_saved_at = now
+        QuizSession.objects.bulk_update(sessions, ['answers', 'last_saved_at'])
+    return len(sessions)
+
+
+class AutosaveBuffer:
+    def __init__(self, interval):
+        self.interval = interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add(self, session_id, answers):
+        with self._lock:
+            self._pending.setdefault(session_id, {}).update(answers)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='quiz-autosave', daemon=True)
+                self._thread.start()
+
+    def pop(self, session_id):
+        with self._lock:
+            return self._pending.pop(session_id, {})
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if pending:
+            try:
+                write_answers(pending)
+            except Exception:
+                logger.exception("Gagal menulis autosave, %s sesi dikembalikan ke buffer", len(pending))
+                with self._lock:
+                    for session_id, answers in pending.items():
+                        answers.update(self._pending.get(session_id, {}))
+                        self._pending[session_id] = answers
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+
+autosave_buffer = AutosaveBuffer(FLUSH_INTERVAL)
+atexit.register(autosave_buffer.flush)
+
+
+def _autosave_key(session_id, question_id):
+    return f"quiz-autosave:{session_id}:{question_id}"
+
+
+def autosave(session, answers):
+    """Simpan jawaban sementara ke cache bersama dan buffer write-behind proses ini."""
+    cache.set_many({_autosave_key(session.id, q_id): text for q_id, text in answers.items()}, AUTOSAVE_TIMEOUT)
+    autosave_buffer.add(session.id, answers)
+
+
+def saved_answers(session, buffered=None):
+    """
+    Jawaban tersimpan sebuah sesi: database + buffer proses ini + autosave di cache bersama
+    yang belum di-flush (dari proses mana pun, paling baru sehingga diutamakan).
+    """
+    question_ids = get_quiz_snapshot(session.quiz)['answer_key'].keys()
+    keys = {_autosave_key(session.id, q_id): q_id for q_id in question_ids}
+    answers = dict(session.answers)
+    answers.update(buffered or {})
+    answers.update({keys[key]: text for key, text in cache.get_many(keys).items()})
+    return answers
+
+
+def compute_expires_at(quiz, started_at):
+    expires_at = None
+    if quiz.duration_minutes:
+        expires_at = started_at + timedelta(minutes=quiz.duration_minutes)
+    if quiz.deadline and (expires_at is None or quiz.deadline < expires_at):
+        expires_at = quiz.deadline
+    return expires_at
+
+
+def is_expired(session, now=None):
+    """Waktu habis (sudah termasuk toleransi GRACE_PERIOD)."""
+    if session.expires_at is None:
+        return False
+    return (now or timezone.now()) > session.expires_at + GRACE_PERIOD
+
+
+def normalize_answers(answers_data):
+    """[{question_id, answer_text}, ...] -> {question_id: answer_text}; ValueError jika payload tidak valid."""
+    return {item['question_id']: item['answer_text'] for item in clean_answers(answers_data)}
+
+
+def collect_answers(session, final_answers=None):
+    """
+    Jawaban akhir sebuah sesi: yang sudah tersimpan (lihat saved_answers)
+    + jawaban yang dikirim saat submit (diabaikan jika waktu sudah habis).
+    """
+    # Sesi berhenti aktif setelah submit, jadi buffer-nya tidak perlu di-flush lagi
+    answers = saved_answers(session, autosave_buffer.pop(session.id))
+    if final_answers and not is_expired(session):
+        answers.update(final_answers)
+    return [{'question_id': q_id, 'answer_text': text} for q_id, text in answers.items()]
@@ -0,0 +1,87 @@
+import threading
+
+from cachetools import LRUCache
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Question
+
+# Snapshot kuis yang sudah dikompilasi, disimpan di dua lapis:
+# 1. LRU lokal per proses (tanpa network / pickle sama sekali)
+# 2. Cache bersama (settings.CACHES) agar worker lain tidak perlu membangun ulang
+# Versi snapshot = Quiz.updated_at, jadi setiap penyimpanan kuis otomatis
+# membuat snapshot lama tidak terpakai lagi.
+
+SNAPSHOT_TIMEOUT = getattr(settings, 'QUIZ_SNAPSHOT_TIMEOUT', 60 * 60 * 24)
+
+_local = LRUCache(maxsize=getattr(settings, 'QUIZ_SNAPSHOT_LRU_SIZE', 256))
+_local_lock = threading.Lock()
+
+
+def snapshot_version(quiz):
+    return int(quiz.updated_at.timestamp() * 1_000_000)
+
+
+def _cache_key(quiz_id, version):
+    return f"quiz-snapshot:{quiz_id}:{version}"
+
+
+def build_snapshot(quiz):
+    """
+    Bangun snapshot kuis dari tabel Question dalam satu query.
+    - questions: payload soal untuk siswa (tanpa kunci jawaban), urut sesuai 'order'
+    - answer_key: {question_id: (jawaban ternormalisasi, points)}
+    """
+    from .grading import normalize_answer
+
+    rows = Question.objects.filter(quiz=quiz).order_by('order').values(
+        'id', 'text', 'order', 'points', 'options', 'answer'
+    )
+    questions = []
+    answer_key = {}
+    for row in rows:
+        q_id = str(row['id'])
+        questions.append({
+            'id': q_id,
+            'text': row['text'],
+            'order': row['order'],
+            'points': row['points'],
+            'options': row['options'],
+        })
+        answer_key[q_id] = (normalize_answer(row['answer']), row['points'])
+
+    return {
+        'version': snapshot_version(quiz),
+        'questions': questions,
+        'answer_key': answer_key,
+    }
+
+
+def _remember(quiz_id, snapshot):
+    with _local_lock:
+        _local[quiz_id] = snapshot
+
+
+def publish_snapshot(quiz):
+    """Bangun ulang snapshot setelah kuis disimpan dan simpan ke kedua lapis cache."""
+    snapshot = build_snapshot(quiz)
+    cache.set(_cache_key(quiz.id, snapshot['version']), snapshot, SNAPSHOT_TIMEOUT)
+    _remember(quiz.id, snapshot)
+    return snapshot
+
+
+def get_quiz_snapshot(quiz):
+    """Ambil snapshot versi terbaru kuis: LRU lokal -> cache bersama -> database."""
+    version = snapshot_version(quiz)
+
+    with _local_lock:
+        snapshot = _local.get(quiz.id)
+    if snapshot is not None and snapshot['version'] == version:
+        return snapshot
+
+    snapshot = cache.get(_cache_key(quiz.id, version))
+    if snapshot is None:
+        return publish_snapshot(quiz)
+
+    _remember(quiz.id, snapshot)
+    return snapshot
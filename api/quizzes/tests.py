@@ -1,3 +1,515 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import timedelta
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.chatbot.llm_client import FakeProvider, LLMClient, set_llm_client
+from api.classes.models import Class
+from api.jobs.models import Job
+from api.jobs.worker import claim_jobs, run_job
+from api.users.models import User
+from . import snapshot as snapshot_cache
+from .analytics import get_item_analysis, rebuild_stats
+from .grading import grade_answers, is_attempt_number_conflict
+from .ingest import claim_batch, process_batch
+from .idempotency import KEY_TTL, purge_expired_keys
+from .leaderboard import rebuild_quiz_board
+from .models import (
+    ClassTotalScore, PendingSubmission, Question, Quiz, QuizAttempt, QuizBestScore, QuizSession, QuizStats,
+    SubmissionIdempotencyKey, UserAnswer,
+)
+from .regrade import compute_scores
+from .serializers import QuizAdminSerializer
+from .sessions import autosave, autosave_buffer
+from .snapshot import get_quiz_snapshot, publish_snapshot
+
+
+class QuizTestMixin:
+    def setUp(self):
+        self.teacher = User.objects.create_user(email='guru@example.com', full_name='Guru', role='teacher', password='pw')
+        self.student = User.objects.create_user(email='siswa@example.com', full_name='Siswa', password='pw')
+        self.class_obj = Class.objects.create(name='Kelas', teacher=self.teacher)
+        self.class_obj.students.add(self.student)
+        self.quiz = self.make_quiz()
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def make_quiz(self, question_count=2, **fields):
+        quiz = Quiz.objects.create(
+            title='Kuis', class_obj=self.class_obj, created_by=self.teacher,
+            duration_minutes=fields.pop('duration_minutes', 10), max_attempts=fields.pop('max_attempts', 0), **fields
+        )
+        self.questions = [
+            Question.objects.create(quiz=quiz, text=f'Soal {i}', order=i, points=5, options=['a', 'b'], answer='a')
+            for i in range(question_count)
+        ]
+        return quiz
+
+    def answers(self, *texts):
+        return [{'question_id': str(q.id), 'answer_text': text} for q, text in zip(self.questions, texts)]
+
+    def submit(self, *texts, **headers):
+        return self.client.post(
+            f'/api/quizzes/student/{self.quiz.id}/submit/', {'answers': self.answers(*texts)}, format='json', headers=headers
+        )
+
+
+class GradingTests(QuizTestMixin, TestCase):
+    def test_grade_answers(self):
+        key = {'q1': ('a', 5.0), 'q2': ('b', 3.0)}
+        score, graded = grade_answers(key, [
+            {'question_id': 'q1', 'answer_text': ' a '},
+            {'question_id': 'q1', 'answer_text': 'b'},  # soal yang sama hanya dinilai sekali
+            {'question_id': 'q2', 'answer_text': 'a'},
+            {'question_id': 'q9', 'answer_text': 'a'},  # bukan soal kuis ini
+        ])
+        self.assertEqual(score, 5.0)
+        self.assertEqual(graded, [('q1', ' a ', True), ('q2', 'a', False)])
+
+    def test_submit_query_count_does_not_grow_with_questions(self):
+        counts = []
+        for size in (2, 30):
+            self.quiz = self.make_quiz(question_count=size)
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.submit(*['a'] * size)
+            self.assertEqual(response.data['score'], 5 * size)
+            counts.append(len(ctx.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(UserAnswer.objects.count(), 32)
+
+
+class SnapshotTests(QuizTestMixin, TestCase):
+    def test_snapshot_hides_answers_and_is_served_from_cache(self):
+        snapshot = get_quiz_snapshot(self.quiz)
+        self.assertEqual([q['id'] for q in snapshot['questions']], [str(q.id) for q in self.questions])
+        self.assertNotIn('answer', snapshot['questions'][0])
+        self.assertEqual(snapshot['answer_key'][str(self.questions[0].id)], ('a', 5))
+
+        with self.assertNumQueries(0):
+            self.assertIs(get_quiz_snapshot(self.quiz), snapshot)
+        # Worker lain: LRU lokal kosong, snapshot diambil dari cache bersama
+        snapshot_cache._local.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_quiz_snapshot(self.quiz), snapshot)
+
+    def test_saving_quiz_publishes_new_version(self):
+        old = get_quiz_snapshot(self.quiz)
+        Question.objects.filter(id=self.questions[0].id).update(answer=' b ')
+        self.quiz.save()
+
+        snapshot = get_quiz_snapshot(self.quiz)
+        self.assertGreater(snapshot['version'], old['version'])
+        self.assertEqual(snapshot['answer_key'][str(self.questions[0].id)], ('b', 5))
+        self.assertEqual(self.submit('b', 'a').data['score'], 10)
+
+
+class AttemptRosterTests(QuizTestMixin, TestCase):
+    def roster(self, **params):
+        self.client.force_authenticate(self.teacher)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f'/api/quizzes/manage/{self.quiz.id}/attempts/', params)
+        self.client.force_authenticate(self.student)
+        return response, len(ctx.captured_queries)
+
+    def test_attempt_numbers_and_pagination(self):
+        other = User.objects.create_user(email='lain@example.com', full_name='Lain', password='pw')
+        self.class_obj.students.add(other)
+        self.submit('a', 'a')
+        self.submit('a', 'b')
+        self.client.force_authenticate(other)
+        self.submit('b', 'b')
+        self.client.force_authenticate(self.student)
+
+        response, _ = self.roster(page_size=2)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+        self.client.force_authenticate(self.teacher)
+        rows = response.data['results'] + self.client.get(response.data['next']).data['results']
+        self.assertEqual(
+            [(row['student_name'], row['attempt_number'], row['score']) for row in rows],
+            [('Lain', 1, 0), ('Siswa', 2, 5), ('Siswa', 1, 10)],
+        )
+
+    def test_query_count_does_not_grow_with_attempts(self):
+        self.submit('a', 'a')
+        _, few = self.roster()
+        for _ in range(5):
+            self.submit('a', 'b')
+        response, many = self.roster()
+        self.assertEqual(len(response.data['results']), 6)
+        self.assertEqual(few, many)
+
+
+class StudentQuizListTests(QuizTestMixin, TestCase):
+    def test_list_is_light_and_annotated(self):
+        self.submit('a', 'b')
+        self.submit('a', 'a')
+        response = self.client.get('/api/quizzes/student/')
+        item = response.data[0]
+        self.assertNotIn('questions', item)
+        self.assertEqual((item['user_attempts_count'], item['latest_score']), (2, 10))
+
+        detail = self.client.get(f'/api/quizzes/student/{self.quiz.id}/').data
+        self.assertEqual(len(detail['questions']), 2)
+        self.assertEqual(detail['user_attempts_count'], 2)
+
+    def test_query_count_does_not_grow_with_quizzes(self):
+        with CaptureQueriesContext(connection) as few:
+            self.client.get('/api/quizzes/student/')
+        for _ in range(5):
+            self.quiz = self.make_quiz()
+            self.submit('a', 'a')
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get('/api/quizzes/student/')
+        self.assertEqual(len(response.data), 6)
+        self.assertEqual(len(few.captured_queries), len(many.captured_queries))
+
+
+class ItemAnalysisTests(QuizTestMixin, TestCase):
+    def test_submit_does_not_touch_stats_on_request_path(self):
+        rebuild_stats(self.quiz)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.submit('a', 'b').status_code, 201)
+        self.assertEqual(QuizStats.objects.get(quiz=self.quiz).attempts_count, 0)
+        self.assertTrue(QuizAttempt.objects.get(quiz=self.quiz).stats_pending)
+
+    def test_pending_attempts_are_folded_once(self):
+        self.submit('a', 'b')
+        analysis = get_item_analysis(self.quiz)
+        self.assertEqual(analysis['attempts_count'], 1)
+
+        self.submit('a', 'a')
+        self.submit('b', 'b')
+        analysis = get_item_analysis(self.quiz)
+        self.assertEqual(analysis['attempts_count'], 3)
+        self.assertEqual(analysis['questions'][0]['correct'], 2)
+        self.assertEqual(analysis['questions'][1]['answered'], 3)
+
+        # Dibuka lagi tanpa submit baru: tidak ada yang terhitung dua kali
+        self.assertEqual(get_item_analysis(self.quiz)['attempts_count'], 3)
+        self.assertEqual(get_item_analysis(self.quiz, rebuild=True)['mean_score'], analysis['mean_score'])
+
+
+@override_settings(QUIZ_SUBMISSION_MODE='queued')
+class QueuedSubmissionTests(QuizTestMixin, TestCase):
+    def test_submission_queued_before_rebuild_is_counted(self):
+        self.assertEqual(self.submit('a', 'b').status_code, 202)
+        # Analitik dibangun ulang sebelum worker menilai antrian
+        self.assertEqual(rebuild_stats(self.quiz).attempts_count, 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(process_batch(claim_batch(10)), 1)
+
+        self.assertEqual(QuizStats.objects.get(quiz=self.quiz).attempts_count, 1)
+        self.assertEqual(get_item_analysis(self.quiz)['attempts_count'], 1)
+
+    def test_session_submit_on_timed_quiz_is_queued(self):
+        self.assertEqual(self.quiz.duration_minutes, 10)
+        response = self.client.post(f'/api/quizzes/student/{self.quiz.id}/start/')
+        session_id = response.data['id']
+        autosave(QuizSession.objects.get(id=session_id), {str(self.questions[0].id): 'a'})
+
+        response = self.client.post(
+            f'/api/quizzes/sessions/{session_id}/submit/', {'answers': self.answers('a', 'a')[1:]}, format='json'
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(QuizAttempt.objects.exists())
+        self.assertEqual(self.client.post(f'/api/quizzes/sessions/{session_id}/submit/').status_code, 409)
+
+        self.assertEqual(process_batch(claim_batch(10)), 1)
+        session = QuizSession.objects.select_related('attempt').get(id=session_id)
+        self.assertEqual(session.status, QuizSession.STATUS_SUBMITTED)
+        self.assertEqual(session.attempt_id, session.submission_id)
+        self.assertEqual(session.attempt.score, 10)
+
+
+class LeaderboardTests(QuizTestMixin, TestCase):
+    def test_submit_refreshes_board(self):
+        url = f'/api/quizzes/student/{self.quiz.id}/leaderboard/'
+        self.assertEqual(self.client.get(url).data['total_participants'], 0)
+
+        self.submit('a', 'b')
+        data = self.client.get(url).data
+        self.assertEqual(data['total_participants'], 1)
+        self.assertEqual(data['me'], {'rank': 1, 'score': 5})
+
+        # Hanya skor terbaik yang masuk papan, dan diperbarui per attempt tanpa rebuild
+        self.submit('a', 'a')
+        self.submit('b', 'b')
+        self.assertEqual(self.client.get(url).data['me'], {'rank': 1, 'score': 10})
+        self.assertEqual(QuizBestScore.objects.get(quiz=self.quiz, user=self.student).score, 10)
+        self.assertEqual(ClassTotalScore.objects.get(class_obj=self.class_obj, user=self.student).score, 10)
+
+    def test_ranks_ties_and_class_totals(self):
+        other = User.objects.create_user(email='lain@example.com', full_name='Lain', password='pw')
+        third = User.objects.create_user(email='tiga@example.com', full_name='Tiga', password='pw')
+        self.class_obj.students.add(other, third)
+        self.submit('a', 'a')
+        self.quiz = self.make_quiz()
+
+        self.submit('a', 'b')
+        for user, texts in ((other, ('a', 'b')), (third, ('a', 'a'))):
+            self.client.force_authenticate(user)
+            self.submit(*texts)
+        self.client.force_authenticate(self.student)
+
+        data = self.client.get(f'/api/quizzes/student/{self.quiz.id}/leaderboard/').data
+        self.assertEqual([entry['rank'] for entry in data['top']], [1, 2, 2])
+        self.assertEqual(data['me'], {'rank': 2, 'score': 5})
+
+        data = self.client.get(f'/api/classes/{self.class_obj.id}/leaderboard/').data
+        self.assertEqual(data['total_participants'], 3)
+        self.assertEqual(data['me'], {'rank': 1, 'score': 15})
+
+    def test_queued_submission_updates_board(self):
+        with override_settings(QUIZ_SUBMISSION_MODE='queued'):
+            self.assertEqual(self.submit('a', 'a').status_code, 202)
+        self.assertFalse(QuizBestScore.objects.exists())
+        process_batch(claim_batch(10))
+        self.assertEqual(QuizBestScore.objects.get(quiz=self.quiz, user=self.student).score, 10)
+
+    def test_rebuild_repairs_board(self):
+        self.submit('a', 'a')
+        QuizBestScore.objects.all().update(score=1)
+        ClassTotalScore.objects.all().delete()
+
+        rebuild_quiz_board(self.quiz.id)
+        self.assertEqual(QuizBestScore.objects.get(quiz=self.quiz, user=self.student).score, 10)
+        self.assertEqual(ClassTotalScore.objects.get(class_obj=self.class_obj, user=self.student).score, 10)
+
+    def test_deleted_quiz_leaves_class_board(self):
+        self.submit('a', 'a')
+        self.client.force_authenticate(self.teacher)
+        self.assertEqual(self.client.delete(f'/api/quizzes/manage/{self.quiz.id}/').status_code, 204)
+        self.assertFalse(ClassTotalScore.objects.filter(class_obj=self.class_obj).exists())
+
+    def test_non_numeric_limit_is_rejected(self):
+        self.assertEqual(self.client.get(f'/api/quizzes/student/{self.quiz.id}/leaderboard/?limit=abc').status_code, 400)
+        self.assertEqual(self.client.get(f'/api/classes/{self.class_obj.id}/leaderboard/?limit=abc').status_code, 400)
+
+
+class FailingProvider(FakeProvider):
+    def generate(self, profile, contents, history, timeout, usage):
+        raise ValueError("kuota habis")
+
+
+class QuestionSyncTests(QuizTestMixin, TestCase):
+    def question_data(self, question, **changes):
+        data = {'id': str(question.id), 'text': question.text, 'order': question.order,
+                'points': question.points, 'options': question.options, 'answer': question.answer}
+        data.update(changes)
+        return data
+
+    def update_questions(self, questions):
+        serializer = QuizAdminSerializer(self.quiz, data={'questions': questions}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as ctx:
+            serializer.save()
+        return len(ctx.captured_queries)
+
+    def test_edit_keeps_ids_and_student_answers(self):
+        self.submit('a', 'b')
+        kept, removed = self.questions
+        self.update_questions([
+            self.question_data(kept, text='Soal 0 (revisi)'),
+            {'text': 'Soal baru', 'order': 2, 'points': 3, 'options': ['x', 'y'], 'answer': 'y'},
+        ])
+
+        self.quiz.refresh_from_db()
+        questions = list(self.quiz.questions.order_by('order'))
+        self.assertEqual(questions[0].id, kept.id)
+        self.assertEqual(questions[0].text, 'Soal 0 (revisi)')
+        self.assertEqual(questions[1].text, 'Soal baru')
+        self.assertFalse(Question.objects.filter(id=removed.id).exists())
+        self.assertEqual(list(UserAnswer.objects.values_list('question_id', flat=True)), [kept.id])
+        self.assertEqual((self.quiz.total_questions, self.quiz.max_score), (2, 8))
+
+    def test_query_count_does_not_grow_with_questions(self):
+        counts = []
+        for size in (2, 20):
+            self.quiz.questions.all().delete()
+            questions = Question.objects.bulk_create([
+                Question(quiz=self.quiz, text=f'Soal {i}', order=i, points=1, options=['a', 'b'], answer='a')
+                for i in range(size)
+            ])
+            counts.append(self.update_questions([self.question_data(q, text=f'{q.text} (revisi)') for q in questions]))
+        self.assertEqual(counts[0], counts[1])
+
+
+class RegradeTests(QuizTestMixin, TestCase):
+    def test_compute_scores(self):
+        key = {'q1': ('a', 5.0), 'q2': ('b', 3.0)}
+        rows = [
+            ('t1', 'q1', 'a'), ('t1', 'q2', ' b '),
+            ('t2', 'q1', 'b'), ('t2', 'q2', 'b'), ('t2', 'q2', 'a'),  # jawaban ganda: yang pertama dihitung
+            ('t3', 'q9', 'a'),  # soal bukan milik kuis diabaikan
+        ]
+        self.assertEqual(compute_scores(key, ['t1', 't2', 't3', 't4'], rows).tolist(), [8.0, 3.0, 0.0, 0.0])
+
+    def test_changed_answer_key_updates_only_affected_attempts(self):
+        # Attempt terakhir tidak menjawab soal yang kuncinya diubah
+        attempts = {texts: self.submit(*texts).data['id'] for texts in (('a', 'a'), ('a', 'b'), ('a',))}
+
+        Question.objects.filter(id=self.questions[1].id).update(answer='b')
+        publish_snapshot(self.quiz)
+        self.client.force_authenticate(self.teacher)
+        response = self.client.post(f'/api/quizzes/manage/{self.quiz.id}/regrade/')
+        self.assertEqual(response.data, {'attempts': 3, 'answers': 5, 'changed': 2})
+
+        regraded = {str(pk): score for pk, score in QuizAttempt.objects.values_list('id', 'score')}
+        self.assertEqual(
+            [regraded[attempts[texts]] for texts in (('a', 'a'), ('a', 'b'), ('a',))],
+            [5.0, 10.0, 5.0],
+        )
+        self.assertEqual(QuizBestScore.objects.get(quiz=self.quiz, user=self.student).score, 10)
+
+
+class GenerateQuizJobTests(QuizTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        set_llm_client(LLMClient(FailingProvider(latency=0)))
+        self.addCleanup(set_llm_client, None)
+        self.client.force_authenticate(self.teacher)
+
+    def test_llm_error_marks_job_failed(self):
+        response = self.client.post('/api/quizzes/manage/generate_from_file_async/', {
+            'file': SimpleUploadedFile('soal.pdf', b'%PDF-1.4 soal', content_type='application/pdf'),
+        })
+        self.assertEqual(response.status_code, 202)
+        for job_id in claim_jobs(10):
+            run_job(job_id)
+
+        job = Job.objects.get(id=response.data['job_id'])
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        self.assertIn('kuota habis', job.error)
+
+        response = self.client.get(f"/api/jobs/{job.id}/result/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'status': Job.STATUS_FAILED, 'error': job.error})
+
+
+class QuizSessionTests(QuizTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.quiz = self.make_quiz(duration_minutes=10)
+
+    def start(self):
+        response = self.client.post(f'/api/quizzes/student/{self.quiz.id}/start/')
+        self.assertEqual(response.status_code, 201)
+        return QuizSession.objects.get(id=response.data['id'])
+
+    def test_autosave_from_another_worker_is_graded(self):
+        session = self.start()
+        # Autosave diterima proses lain: hanya ada di cache bersama, tidak di buffer proses ini
+        autosave(session, {str(q.id): 'a' for q in self.questions})
+        autosave_buffer.pop(session.id)
+
+        response = self.client.post(f'/api/quizzes/sessions/{session.id}/submit/', {'answers': []}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['score'], 10)
+
+    def test_answers_sent_after_expiry_are_ignored(self):
+        session = self.start()
+        autosave(session, {str(self.questions[0].id): 'a'})
+        QuizSession.objects.filter(id=session.id).update(expires_at=timezone.now() - timedelta(minutes=5))
+
+        response = self.client.post(
+            f'/api/quizzes/sessions/{session.id}/submit/', {'answers': self.answers('a', 'a')}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['score'], 5)
+
+    def test_legacy_submit_without_session(self):
+        response = self.submit('a', 'a')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['score'], 10)
+        self.assertFalse(QuizSession.objects.exists())
+
+    def test_legacy_submit_goes_through_active_session(self):
+        session = self.start()
+        QuizSession.objects.filter(id=session.id).update(expires_at=timezone.now() - timedelta(minutes=5))
+
+        # Waktu sesi sudah habis: jawaban di body tidak boleh dinilai lewat endpoint lama
+        response = self.submit('a', 'a')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['score'], 0)
+        session.refresh_from_db()
+        self.assertEqual(session.status, QuizSession.STATUS_SUBMITTED)
+
+
+class IdempotentSubmitTests(QuizTestMixin, TestCase):
+    def test_retry_replays_response_without_new_attempt(self):
+        first = self.submit('a', 'b', **{'Idempotency-Key': 'k1'})
+        retry = self.submit('a', 'b', **{'Idempotency-Key': 'k1'})
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.data['id'], str(first.data['id']))
+        self.assertEqual(QuizAttempt.objects.count(), 1)
+
+        self.assertEqual(self.submit('b', 'b', **{'Idempotency-Key': 'k1'}).status_code, 422)
+
+    def test_expired_key_can_be_reused_and_is_purged(self):
+        self.submit('a', 'b', **{'Idempotency-Key': 'k1'})
+        SubmissionIdempotencyKey.objects.update(created_at=timezone.now() - KEY_TTL - timedelta(minutes=1))
+
+        response = self.submit('a', 'b', **{'Idempotency-Key': 'k1'})
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(list(QuizAttempt.objects.values_list('attempt_number', flat=True).order_by('attempt_number')), [1, 2])
+
+        SubmissionIdempotencyKey.objects.create(
+            user=self.student, quiz=self.quiz, key='lama', fingerprint='x',
+        )
+        SubmissionIdempotencyKey.objects.filter(key='lama').update(created_at=timezone.now() - KEY_TTL - timedelta(minutes=1))
+        self.assertEqual(purge_expired_keys(), 1)
+        self.assertEqual(SubmissionIdempotencyKey.objects.count(), 1)
+
+
+class HistoryTests(QuizTestMixin, TestCase):
+    def test_class_filter(self):
+        self.submit('a', 'a')
+        url = '/api/quizzes/student/history/'
+        self.assertEqual(len(self.client.get(url, {'class_id': str(self.class_obj.id)}).data['results']), 1)
+        self.assertEqual(self.client.get(url, {'class_id': 'bukan-uuid'}).status_code, 400)
+
+
+class AnswerValidationTests(QuizTestMixin, TestCase):
+    def test_null_answer_is_a_validation_error(self):
+        payload = {'answers': [{'question_id': str(self.questions[0].id), 'answer_text': None}]}
+        response = self.client.post(f'/api/quizzes/student/{self.quiz.id}/submit/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('answer_text harus berupa teks', str(response.data['answers']))
+        self.assertFalse(QuizAttempt.objects.exists())
+
+        session_id = self.client.post(f'/api/quizzes/student/{self.quiz.id}/start/').data['id']
+        response = self.client.post(f'/api/quizzes/sessions/{session_id}/autosave/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(f'/api/quizzes/sessions/{session_id}/submit/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_only_attempt_number_collisions_count_as_conflicts(self):
+        QuizAttempt.objects.create(quiz=self.quiz, user=self.student, score=0, attempt_number=1)
+        with self.assertRaises(IntegrityError) as ctx, transaction.atomic():
+            QuizAttempt.objects.create(quiz=self.quiz, user=self.student, score=0, attempt_number=1)
+        self.assertTrue(is_attempt_number_conflict(ctx.exception))
+
+    def test_queued_submission_with_invalid_data_fails_with_its_own_message(self):
+        submission = PendingSubmission.objects.create(
+            quiz=self.quiz, user=self.student, answers=[{'question_id': str(self.questions[0].id), 'answer_text': None}],
+        )
+        self.assertEqual(process_batch(claim_batch(10)), 0)
+        submission.refresh_from_db()
+        self.assertEqual(submission.status, PendingSubmission.STATUS_FAILED)
+        self.assertNotIn('bersamaan', submission.error)
@@ -8,6 +8,8 @@ router.register(r'manage', views.QuizManageViewSet, basename='quiz-manage')
 
 router.register(r'student', views.QuizStudentViewSet, basename='quiz-student')
 
+router.register(r'sessions', views.QuizSessionViewSet, basename='quiz-session')
+
 urlpatterns = [
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,13 +1,31 @@
 
-from rest_framework import viewsets, permissions, status
+from rest_framework import viewsets, permissions, status, mixins
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from .models import Quiz, QuizAttempt 
-from .serializers import QuizAdminSerializer, QuizDetailSerializer, QuizAttemptSerializer
+from .models import PendingSubmission, Quiz, QuizAttempt, QuizSession
+from .serializers import QuizAdminSerializer, QuizDetailSerializer, QuizStudentListSerializer, QuizAttemptSerializer, QuizSessionSerializer, PendingSubmissionSerializer
+from .ingest import enqueue_submission
+from .idempotency import begin_submission, finish_submission, replay_submission, submission_fingerprint
+from .sessions import autosave, collect_answers, compute_expires_at, is_expired, normalize_answers
+from django.conf import settings
+from django.db import transaction
 from .gemini_utils import generate_quiz_from_file
+from .pagination import AttemptCursorPagination
+from .analytics import get_item_analysis
+from .regrade import regrade_quiz
+from .leaderboard import get_quiz_board, leaderboard_payload, parse_limit, rebuild_class_board
+from api.jobs.worker import enqueue
+from api.chatbot.rate_limit import LLMGenerationThrottle
+from api.chatbot.instrumentation import resolve_class_id
+from django.db.models import Count, F, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import datetime, time, timedelta
 from rest_framework.parsers import MultiPartParser, FormParser
 import tempfile
 import os
+import uuid
 
 class IsTeacherOrAdmin(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -38,7 +56,14 @@ class QuizManageViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
-    @action(detail=False, methods=['post'], parser_classes=[MultiPartParser, FormParser]) 
+    def perform_destroy(self, instance):
+        # Skor kuis yang dihapus tidak boleh tersisa di leaderboard kelas
+        with transaction.atomic():
+            class_id = instance.class_obj_id
+            instance.delete()
+            rebuild_class_board(class_id)
+
+    @action(detail=False, methods=['post'], parser_classes=[MultiPartParser, FormParser], throttle_classes=[LLMGenerationThrottle])
     def generate_from_file(self, request):
         if 'file' not in request.FILES:
             return Response({"error": "No file provided"}, status=status.HTTP_400_BAD_REQUEST)
@@ -56,7 +81,9 @@ class QuizManageViewSet(viewsets.ModelViewSet):
             # Determine mime type (basic check or rely on file extension)
             mime_type = uploaded_file.content_type or 'application/pdf'
             
-            questions = generate_quiz_from_file(tmp_path, mime_type, num_questions)
+            # class_id opsional, hanya untuk metrik pemakaian AI per kelas
+            class_id = resolve_class_id(request.data.get('class_id'))
+            questions = generate_quiz_from_file(tmp_path, mime_type, num_questions, class_id=class_id)
             
             return Response(questions, status=status.HTTP_200_OK)
             
@@ -67,38 +94,317 @@ class QuizManageViewSet(viewsets.ModelViewSet):
             if os.path.exists(tmp_path):
                 os.remove(tmp_path)
 
+    @action(detail=False, methods=['post'], parser_classes=[MultiPartParser, FormParser], throttle_classes=[LLMGenerationThrottle])
+    def generate_from_file_async(self, request):
+        """
+        Versi non-blocking dari generate_from_file: file disimpan ke job dan langsung
+        dikembalikan job_id. Hasil diambil lewat /api/jobs/<job_id>/result/.
+        """
+        if 'file' not in request.FILES:
+            return Response({"error": "No file provided"}, status=status.HTTP_400_BAD_REQUEST)
+
+        uploaded_file = request.FILES['file']
+        class_id = resolve_class_id(request.data.get('class_id'))
+        job = enqueue(
+            'quiz.generate_from_file',
+            payload={
+                'num_questions': int(request.data.get('num_questions', 5)),
+                'mime_type': uploaded_file.content_type or 'application/pdf',
+                'class_id': str(class_id) if class_id else None,
+            },
+            file=uploaded_file,
+            user=request.user,
+        )
+        return Response({"job_id": job.id, "status": job.status}, status=status.HTTP_202_ACCEPTED)
+
     @action(detail=True, methods=['get'])
     def attempts(self, request, pk=None):
         quiz = self.get_object()
-        attempts = QuizAttempt.objects.filter(quiz=quiz).order_by('-submitted_at')
-        serializer = QuizAttemptSerializer(attempts, many=True)
-        return Response(serializer.data)
+        attempts = QuizAttempt.objects.filter(quiz=quiz).select_related('user', 'quiz')
+
+        paginator = AttemptCursorPagination()
+        # attempt_number tersimpan di setiap attempt (unique per quiz+user), jadi cukup satu query halaman
+        page = paginator.paginate_queryset(attempts, request, view=self)
+
+        serializer = QuizAttemptSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['get'])
+    def analytics(self, request, pk=None):
+        """Analisis butir soal: persentase benar, daya beda, distribusi opsi, histogram & persentil skor."""
+        quiz = self.get_object()
+        rebuild = request.query_params.get('rebuild') in ('1', 'true')
+        return Response(get_item_analysis(quiz, rebuild=rebuild))
+
+    @action(detail=True, methods=['get'])
+    def leaderboard(self, request, pk=None):
+        quiz = self.get_object()
+        try:
+            limit = parse_limit(request.query_params.get('limit'))
+        except ValueError:
+            return Response({"error": "limit harus berupa angka"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(leaderboard_payload(get_quiz_board(quiz.id), request.user, limit))
+
+    @action(detail=True, methods=['post'])
+    def regrade(self, request, pk=None):
+        """Nilai ulang semua attempt dengan kunci jawaban terbaru (mis. setelah kunci diperbaiki)."""
+        quiz = self.get_object()
+        return Response(regrade_quiz(quiz), status=status.HTTP_200_OK)
+
+def submit_session(request, session, final_answers=None):
+    """
+    Nilai sesi dengan jawaban yang terkumpul, lalu tandai sesi sebagai submitted.
+    Pada QUIZ_SUBMISSION_MODE='queued' jawaban masuk antrian dan attempt diisi worker.
+    """
+    answers = collect_answers(session, final_answers)
+    serializer = QuizAttemptSerializer(data={'answers': answers}, context={'request': request})
+    serializer.is_valid(raise_exception=True)
+
+    if settings.QUIZ_SUBMISSION_MODE == 'queued':
+        try:
+            submission = enqueue_submission(session.quiz, session.user, serializer.validated_data['answers'])
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        session.status = QuizSession.STATUS_SUBMITTED
+        session.submission = submission
+        session.save(update_fields=['status', 'submission'])
+        return Response(PendingSubmissionSerializer(submission).data, status=status.HTTP_202_ACCEPTED)
+
+    attempt = serializer.save(quiz=session.quiz)
+    session.status = QuizSession.STATUS_SUBMITTED
+    session.attempt = attempt
+    session.save(update_fields=['status', 'attempt'])
+    return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 class QuizStudentViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         user = self.request.user
         # Filter quizzes where the class has the user in its students list
-        return Quiz.objects.filter(class_obj__students=user, is_active=True).distinct()
+        queryset = Quiz.objects.filter(class_obj__students=user, is_active=True).distinct()
+
+        # Jumlah attempt & skor terakhir siswa dihitung di query yang sama (subquery)
+        user_attempts = QuizAttempt.objects.filter(quiz=OuterRef('pk'), user=user)
+        return queryset.select_related('class_obj').annotate(
+            user_attempts_count=Coalesce(
+                Subquery(user_attempts.order_by().values('quiz').annotate(c=Count('id')).values('c')),
+                Value(0),
+            ),
+            latest_score=Subquery(user_attempts.order_by('-submitted_at').values('score')[:1]),
+        )
+
+    def get_serializer_class(self):
+        # List tidak membawa soal; payload soal lengkap hanya di retrieve
+        if self.action == 'list':
+            return QuizStudentListSerializer
+        return QuizDetailSerializer
+
     serializer_class = QuizDetailSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     @action(detail=True, methods=['post'], serializer_class=QuizAttemptSerializer)
     def submit(self, request, pk=None):
+        """
+        Submit jawaban. Dengan header Idempotency-Key, request ulang (retry client)
+        mengembalikan respons yang tersimpan tanpa menilai ulang.
+        """
         quiz = self.get_object()
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return self._grade_submission(request, quiz)
+        if len(key) > 100:
+            return Response({"error": "Idempotency-Key maksimal 100 karakter."}, status=status.HTTP_400_BAD_REQUEST)
+
+        fingerprint = submission_fingerprint(quiz, request.data)
+        record, created = begin_submission(request.user, quiz, key, fingerprint)
+        if not created:
+            return replay_submission(record, fingerprint)
+
+        try:
+            response = self._grade_submission(request, quiz)
+        except Exception:
+            # Gagal sebelum ada respons: kunci dilepas agar client bisa mencoba lagi
+            record.delete()
+            raise
+        finish_submission(record, response)
+        return response
+
+    def _grade_submission(self, request, quiz):
+        # Siswa yang sedang punya sesi aktif dinilai lewat sesinya, agar batas waktu server berlaku
+        response = self._submit_active_session(request, quiz)
+        if response is not None:
+            return response
+
         serializer = QuizAttemptSerializer(data=request.data, context={'request': request})
         
-        if serializer.is_valid():
-            serializer.save(quiz=quiz)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        if settings.QUIZ_SUBMISSION_MODE == 'queued':
+            # Dinilai nanti oleh worker; client memantau lewat endpoint status submit
+            try:
+                submission = enqueue_submission(quiz, request.user, serializer.validated_data['answers'])
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response(PendingSubmissionSerializer(submission).data, status=status.HTTP_202_ACCEPTED)
+
+        serializer.save(quiz=quiz)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def _submit_active_session(self, request, quiz):
+        """Submit sesi aktif siswa untuk kuis ini, atau None jika siswa tidak sedang dalam sesi."""
+        with transaction.atomic():
+            session = QuizSession.objects.select_for_update().filter(
+                quiz=quiz, user=request.user, status=QuizSession.STATUS_ACTIVE
+            ).first()
+            if session is None:
+                return None
+            try:
+                answers = normalize_answers(request.data.get('answers', []))
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            return submit_session(request, session, answers)
+
+    @action(detail=True, methods=['get'])
+    def leaderboard(self, request, pk=None):
+        quiz = self.get_object()
+        try:
+            limit = parse_limit(request.query_params.get('limit'))
+        except ValueError:
+            return Response({"error": "limit harus berupa angka"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(leaderboard_payload(get_quiz_board(quiz.id), request.user, limit))
+
+    @action(detail=True, methods=['post'])
+    def start(self, request, pk=None):
+        """
+        Mulai (atau lanjutkan) sesi pengerjaan dengan waktu mulai dari server.
+        Sesi aktif yang waktunya sudah habis otomatis di-submit dengan jawaban yang tersimpan.
+        """
+        quiz = self.get_object()
+
+        with transaction.atomic():
+            session = QuizSession.objects.select_for_update().filter(
+                quiz=quiz, user=request.user, status=QuizSession.STATUS_ACTIVE
+            ).first()
+            if session is not None and not is_expired(session):
+                return Response(QuizSessionSerializer(session).data, status=status.HTTP_200_OK)
+            if session is not None:
+                response = submit_session(request, session)
+                if response.status_code >= 400:
+                    return response
+
+            if quiz.max_attempts > 0:
+                count = QuizAttempt.objects.filter(quiz=quiz, user=request.user).count()
+                if count >= quiz.max_attempts:
+                    return Response(
+                        {"error": "Anda telah mencapai batas maksimal percobaan untuk kuis ini."},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+
+            session = QuizSession.objects.create(
+                quiz=quiz, user=request.user, expires_at=compute_expires_at(quiz, timezone.now())
+            )
+        return Response(QuizSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'], url_path=r'submissions/(?P<submission_id>[0-9a-f-]+)')
+    def submission_status(self, request, submission_id=None):
+        """Status submit yang masuk antrian (mode QUIZ_SUBMISSION_MODE='queued')."""
+        submission = PendingSubmission.objects.filter(id=submission_id, user=request.user).first()
+        if submission is None:
+            return Response({"error": "Submit tidak ditemukan."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(PendingSubmissionSerializer(submission).data)
 
     @action(detail=False, methods=['get'])
     def history(self, request):
-        attempts = QuizAttempt.objects.filter(user=request.user).order_by('-submitted_at')
+        """
+        Riwayat attempt siswa (cursor pagination, terbaru dulu).
+        Filter opsional: class_id, date_from, date_to (YYYY-MM-DD, inklusif).
+        Halaman pertama juga membawa ringkasan per kuis (skor terbaik & jumlah attempt) dari database.
+        """
+        attempts = QuizAttempt.objects.filter(user=request.user)
+
+        class_id = request.query_params.get('class_id')
+        if class_id:
+            try:
+                class_id = uuid.UUID(class_id)
+            except ValueError:
+                return Response({"error": "Format class_id tidak valid"}, status=status.HTTP_400_BAD_REQUEST)
+            attempts = attempts.filter(quiz__class_obj_id=class_id)
+
+        for param, lookup, offset in (('date_from', 'submitted_at__gte', 0), ('date_to', 'submitted_at__lt', 1)):
+            value = request.query_params.get(param)
+            if not value:
+                continue
+            day = parse_date(value)
+            if day is None:
+                return Response({"error": f"Format {param} harus YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
+            boundary = timezone.make_aware(datetime.combine(day + timedelta(days=offset), time.min))
+            attempts = attempts.filter(**{lookup: boundary})
+
+        paginator = AttemptCursorPagination()
+        page = paginator.paginate_queryset(
+            attempts.select_related('quiz').only('id', 'score', 'submitted_at', 'quiz__id', 'quiz__title', 'quiz__class_obj_id'),
+            request, view=self,
+        )
         data = [{
+            "id": a.id,
+            "quiz_id": a.quiz_id,
             "quiz_title": a.quiz.title,
+            "class_id": a.quiz.class_obj_id,
             "score": a.score,
             "submitted_at": a.submitted_at
-        } for a in attempts]
-        return Response(data)
\ No newline at end of file
+        } for a in page]
+        response = paginator.get_paginated_response(data)
+
+        if not request.query_params.get(paginator.cursor_query_param):
+            response.data['summaries'] = list(
+                attempts.values('quiz_id', quiz_title=F('quiz__title'))
+                .annotate(best_score=Max('score'), attempts_count=Count('id'), last_submitted_at=Max('submitted_at'))
+                .order_by('-last_submitted_at')
+            )
+        return response
+
+
+class QuizSessionViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    serializer_class = QuizSessionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return QuizSession.objects.filter(user=self.request.user)
+
+    @action(detail=True, methods=['post'])
+    def autosave(self, request, pk=None):
+        """Simpan jawaban sementara; masuk buffer write-behind, bukan langsung ke database."""
+        session = self.get_object()
+        if session.status != QuizSession.STATUS_ACTIVE:
+            return Response({"error": "Sesi kuis sudah di-submit."}, status=status.HTTP_409_CONFLICT)
+        if is_expired(session):
+            return Response({"error": "Waktu pengerjaan kuis sudah habis."}, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            answers = normalize_answers(request.data.get('answers', []))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        autosave(session, answers)
+        return Response({"buffered": len(answers), "expires_at": session.expires_at}, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['post'])
+    def submit(self, request, pk=None):
+        """
+        Submit sesi. Jawaban di body melengkapi/menimpa autosave, kecuali waktu sudah habis:
+        yang dinilai hanya jawaban yang tersimpan sebelum batas waktu.
+        """
+        with transaction.atomic():
+            session = QuizSession.objects.select_for_update().filter(pk=pk, user=request.user).first()
+            if session is None:
+                return Response({"error": "Sesi tidak ditemukan."}, status=status.HTTP_404_NOT_FOUND)
+            if session.status != QuizSession.STATUS_ACTIVE:
+                return Response(
+                    {"error": "Sesi kuis sudah di-submit.", "attempt": session.attempt_id, "submission": session.submission_id},
+                    status=status.HTTP_409_CONFLICT,
+                )
+
+            try:
+                answers = normalize_answers(request.data.get('answers', []))
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            return submit_session(request, session, answers)
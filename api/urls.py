@@ -5,6 +5,7 @@ urlpatterns = [
     path('classes/', include('api.classes.urls')),
     path('materials/', include('api.materials.urls')),
     path('quizzes/', include('api.quizzes.urls')),
+    path('jobs/', include('api.jobs.urls')),
 
     path('chatbot/', include('api.chatbot.urls')),
     path('admin/', include('api.admin_panel.urls')),
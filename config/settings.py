@@ -51,6 +51,7 @@ INSTALLED_APPS = [
     'api.classes',
     'api.materials',
     'api.quizzes',
+    'api.jobs',
 ]
 
 MIDDLEWARE = [
@@ -98,6 +99,16 @@ DATABASES = {
     }
 }
 
+# Cache bersama antar worker (mis. CACHE_URL=redis://127.0.0.1:6379/1).
+# Default LocMem hanya berlaku per proses.
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# 'sync': submit kuis dinilai langsung di request.
+# 'queued': submit disimpan ke antrian dan dinilai per batch oleh `manage.py process_submissions`.
+QUIZ_SUBMISSION_MODE = env('QUIZ_SUBMISSION_MODE', default='sync')
+
 AUTH_USER_MODEL = 'users.User'
 
 AUTHENTICATION_BACKENDS = [
@@ -173,4 +184,10 @@ SIMPLE_JWT = {
 
 load_dotenv()
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
\ No newline at end of file
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+
+# 'gemini' atau 'fake' (jawaban deterministik tanpa jaringan untuk load test/CI), lihat api/chatbot/llm_client.py
+LLM_PROVIDER = env('LLM_PROVIDER', default='gemini')
+
+# True jika dijalankan lewat server ASGI (config/asgi.py): endpoint chatbot memakai view async
+CHATBOT_ASYNC_VIEWS = env.bool('CHATBOT_ASYNC_VIEWS', default=False)
\ No newline at end of file